@@ -0,0 +1,361 @@
+# async_main.py - Альтернативный asyncio-движок бота (RUNTIME = 'asyncio' в config.py)
+#
+# Вместо трех потоков (polling, слушатель GUI, проверка мутов) все работает задачами
+# в одном цикле событий на AsyncTeleBot: каждое обновление - отдельная задача,
+# а все запросы к Bot API идут через один общий пул соединений aiohttp.
+# Запросы проходят через AsyncRateLimitedBot (те же лимиты и объединение уведомлений,
+# что у RateLimitedBot в main.py), удаления копятся в AsyncDeletionBatcher.
+# Хранилище, антифлуд, поиск рейдов и правила модерации берутся из main.py; это
+# синхронный код (SQLite, регулярные выражения), поэтому он выполняется в пуле
+# потоков workers и не останавливает цикл событий.
+# Команды GUI и массовые действия (синхронный код main.py) тоже выполняются в потоках,
+# а их запросы к Telegram через BlockingBot возвращаются в этот цикл событий: у движка
+# один HTTP-клиент и одно состояние ограничителя частоты.
+
+import asyncio
+import concurrent.futures
+import datetime
+import functools
+import time
+
+from telebot import apihelper, asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+import event_log
+import ipc_channel
+import main as core
+import metrics
+from bulk_actions import split_leading_ids
+from config import TOKEN, SEND_GUI_CONFIRMATIONS_TO_CHAT
+from config import UPDATE_MODE, ASYNC_MAX_CONNECTIONS, ASYNC_WORKER_THREADS, DISPATCHER_STATS_INTERVAL
+from config import RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_CHAT_PER_MINUTE, RATE_LIMIT_CHAT_BURST, RATE_LIMIT_MAX_RETRIES, NOTICE_COALESCE_WINDOW_SECONDS
+from config import DELETE_BATCH_WINDOW_SECONDS
+from delete_batcher import AsyncDeletionBatcher
+from metrics import timed
+from mute_scheduler import AsyncMuteScheduler
+from rate_limiter import AsyncRateLimitedBot
+
+logger = core.logger
+
+# Один пул соединений aiohttp на все запросы к Bot API
+asyncio_helper.REQUEST_LIMIT = ASYNC_MAX_CONNECTIONS
+abot = AsyncTeleBot(TOKEN)
+
+_process_new_updates = abot.process_new_updates
+
+async def process_new_updates(updates):
+    # Кэш username -> ID пополняется из всех обновлений, как и в main.py
+    metrics.UPDATES.inc(amount=len(updates))
+    if core.update_recorder:
+        core.update_recorder.record(updates)
+    core.remember_users(updates)
+    await _process_new_updates(updates)
+
+abot.process_new_updates = process_new_updates
+
+# Все исходящие запросы идут через ограничитель частоты; регистрация обработчиков и polling передаются abot как есть
+bot = AsyncRateLimitedBot(abot, RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_CHAT_PER_MINUTE, RATE_LIMIT_CHAT_BURST,
+                          RATE_LIMIT_MAX_RETRIES, NOTICE_COALESCE_WINDOW_SECONDS, DISPATCHER_STATS_INTERVAL)
+
+# Удаляемые сообщения копятся коротким окном и удаляются одним запросом на чат
+deletion_batcher = AsyncDeletionBatcher(bot, DELETE_BATCH_WINDOW_SECONDS, DISPATCHER_STATS_INTERVAL)
+
+# Пул потоков для синхронного кода main.py: хранилище, проверки сообщений, перезагрузка настроек
+workers = concurrent.futures.ThreadPoolExecutor(ASYNC_WORKER_THREADS, thread_name_prefix="async-worker")
+
+async def blocking(func, *args):
+    """Выполняет синхронную функцию в пуле workers, не останавливая цикл событий."""
+    return await asyncio.get_running_loop().run_in_executor(workers, functools.partial(func, *args))
+
+
+class BlockingBot:
+    """
+    Синхронный интерфейс к bot для кода main.py, работающего в потоках (команды GUI, массовые действия):
+    каждый вызов выполняется в цикле событий loop, а поток ждет результат.
+    Ошибки Telegram приходят как telebot.apihelper.ApiTelegramException - их и ловит main.py.
+    """
+
+    def __init__(self, bot, loop):
+        self._bot = bot
+        self._loop = loop
+
+    def __getattr__(self, name):
+        method = getattr(self._bot, name)
+
+        def call(*args, **kwargs):
+            future = asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self._loop)
+            try:
+                return future.result()
+            except asyncio_helper.ApiTelegramException as e:
+                raise apihelper.ApiTelegramException(e.function_name, e.result, e.result_json) from e
+        return call
+
+
+# --- Снятие мутов ---
+@timed(metrics.HANDLER_SECONDS, 'check_mutes', errors=metrics.HANDLER_ERRORS)
+async def check_mutes(mutes_to_clear):
+    """Асинхронный аналог main.check_mutes: снимает истекшие муты (chat_id, user_id) пачкой с одной записью в хранилище."""
+    unmuted = []
+    for chat_id, user_id in mutes_to_clear:
+        try:
+            await bot.restrict_chat_member(chat_id, user_id, can_send_messages=True, can_add_web_page_previews=True,
+                                           can_send_media_messages=True, can_send_other_messages=True)
+            unmuted.append((chat_id, user_id))
+        except Exception as e:
+            logger.error(f"Ошибка при автоматическом размучивании пользователя {user_id} в чате {chat_id}: {e}")
+            mute_scheduler.schedule((chat_id, user_id), time.time() + core.UNMUTE_RETRY_SECONDS)
+
+    if not unmuted:
+        return
+    await blocking(core.store.clear_mutes, unmuted)
+    for chat_id, user_id in unmuted:
+        logger.info(f"Пользователь {user_id} размучен автоматически в чате {chat_id}.")
+        core.events.record(event_log.UNMUTE, chat_id, user_id, source="auto")
+        try:
+            await bot.send_message(chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> был размучен автоматически.", parse_mode='HTML')
+        except Exception as e:
+            logger.error(f"Не удалось сообщить о размуте пользователя {user_id} в чате {chat_id}: {e}")
+
+mute_scheduler = AsyncMuteScheduler(check_mutes)
+# Команды GUI выполняются кодом main.py - подменяем в нем планировщик, чтобы муты из GUI попадали в этот цикл событий
+core.mute_scheduler = mute_scheduler
+
+
+async def escalate_warns(chat_id, user_id, warn_count, settings):
+    """Асинхронный аналог main.escalate_warns: решение принимает main.auto_mute_due."""
+    duration_minutes = await blocking(core.auto_mute_due, chat_id, user_id, warn_count, settings)
+    if duration_minutes is not None:
+        await mute_user_id(user_id, duration_minutes, core.AUTO_MUTE_REASON, chat_id)
+
+
+async def punish_near_duplicates(chat_id, duplicates, settings):
+    """Асинхронный аналог main.punish_near_duplicates: удаления объединяются в пакеты, уведомления - в сводку."""
+    for user_id, message_id in duplicates:
+        await deletion_batcher.delete(chat_id, message_id)
+        core.events.record(event_log.DELETE, chat_id, user_id, message_id=message_id, reason="near_duplicate")
+    logger.info(f"[ID: {chat_id}] - Удалено одинаковых сообщений (рейд): {len(duplicates)}")
+    for user_id in dict.fromkeys(user_id for user_id, _ in duplicates):
+        try:
+            warn_count = await blocking(core.store.add_warn, chat_id, user_id)
+            core.events.record(event_log.WARN, chat_id, user_id, reason="near_duplicate", count=warn_count)
+            user_link = f"<a href='tg://user?id={user_id}'>{user_id}</a>"
+            await bot.send_coalesced(chat_id, 'near_duplicates',
+                                     core.NEAR_DUP_NOTICE.format(user=user_link, count=warn_count, limit=settings.auto_mute_warn_count),
+                                     user_link, core.NEAR_DUP_SUMMARY)
+            await escalate_warns(chat_id, user_id, warn_count, settings)
+        except Exception as e:
+            logger.error(f"Ошибка при предупреждении пользователя {user_id} за рейд: {e}", exc_info=True)
+
+
+async def apply_rule(message, settings, hit):
+    """Асинхронный аналог main.apply_rule: действия сработавшего правила по порядку."""
+    rule = hit.rule
+    chat_id = message.chat.id
+    user = message.from_user
+    user_link = f"<a href='tg://user?id={user.id}'>{user.first_name}</a>"
+    details = core.log_rule_hit(message, hit)
+    for action in rule.actions:
+        try:
+            if action == 'delete':
+                await deletion_batcher.delete(chat_id, message.message_id)
+                core.events.record(event_log.DELETE, chat_id, user.id, message_id=message.message_id, reason=rule.name, **details)
+            elif action == 'notify':
+                await bot.send_coalesced(chat_id, f"rule:{rule.name}", rule.notice.format(user=user_link), user_link, rule.notice_summary)
+            elif action == 'warn':
+                warn_count = await blocking(core.store.add_warn, chat_id, user.id)
+                core.events.record(event_log.WARN, chat_id, user.id, reason=rule.name, count=warn_count)
+                await bot.send_coalesced(chat_id, f"rule:{rule.name}",
+                                         f"{rule.notice.format(user=user_link)} Предупреждение {warn_count}/{settings.auto_mute_warn_count}.",
+                                         user_link, rule.notice_summary)
+                await escalate_warns(chat_id, user.id, warn_count, settings)
+            elif action == 'mute':
+                await mute_user_id(user.id, rule.mute_minutes, rule.reason, chat_id)
+            elif action == 'ban':
+                await bot.ban_chat_member(chat_id, user.id)
+                core.events.record(event_log.BAN, chat_id, user.id, reason=rule.reason, source="rule")
+        except Exception as e:
+            logger.error(f"Правило '{rule.name}': ошибка действия {action} для пользователя {user.id}: {e}", exc_info=True)
+
+
+async def mute_user_id(user_id, duration_minutes, reason, chat_id):
+    try:
+        mute_end_time = datetime.datetime.now() + datetime.timedelta(minutes=duration_minutes)
+        await bot.restrict_chat_member(chat_id, user_id, can_send_messages=False, until_date=int(mute_end_time.timestamp()))
+        await blocking(core.store.set_mute, chat_id, user_id, mute_end_time.timestamp(), reason, chat_id)
+        mute_scheduler.schedule((chat_id, user_id), mute_end_time.timestamp())
+        logger.info(f"Пользователь {user_id} замучен на {duration_minutes} минут. Причина: {reason}")
+        core.events.record(event_log.MUTE, chat_id, user_id, duration_minutes=duration_minutes, reason=reason, source="chat")
+        if SEND_GUI_CONFIRMATIONS_TO_CHAT:
+            await bot.send_message(chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> замучен на {duration_minutes} минут. Причина: {reason}", parse_mode='HTML')
+    except Exception as e:
+        logger.error(f"Ошибка при мутировании пользователя {user_id}: {e}", exc_info=True)
+
+
+# --- Обработчики команд и сообщений ---
+@bot.message_handler(commands=['start'])
+@timed(metrics.HANDLER_SECONDS, 'send_welcome', errors=metrics.HANDLER_ERRORS)
+async def send_welcome(message):
+    await bot.reply_to(message, "Привет! Я твой бот-модератор. Используй /rules, чтобы ознакомиться с правилами.")
+    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Пользователь {message.from_user.first_name} (ID: {message.from_user.id}) использовал /start")
+
+@bot.message_handler(commands=['rules'])
+@timed(metrics.HANDLER_SECONDS, 'send_rules', errors=metrics.HANDLER_ERRORS)
+async def send_rules(message):
+    await bot.send_message(message.chat.id, core.chat_configs.get(message.chat.id).rules, parse_mode='HTML')
+    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Пользователь {message.from_user.first_name} (ID: {message.from_user.id}) использовал /rules")
+
+@bot.message_handler(commands=['reload_words'])
+@timed(metrics.HANDLER_SECONDS, 'reload_words_command', errors=metrics.HANDLER_ERRORS)
+async def reload_words_command(message):
+    if not core.is_admin(message.from_user.id):
+        await bot.reply_to(message, "У вас нет прав для использования этой команды.")
+        return
+    try:
+        words_count = await blocking(core.reload_bad_words)
+        await bot.reply_to(message, f"Список плохих слов перезагружен ({words_count} слов).")
+    except Exception as e:
+        logger.error(f"Ошибка при перезагрузке списка плохих слов: {e}", exc_info=True)
+        await bot.reply_to(message, "Не удалось перезагрузить список плохих слов. Подробности в логах.")
+
+@bot.message_handler(commands=['warn'])
+@timed(metrics.HANDLER_SECONDS, 'warn_user', errors=metrics.HANDLER_ERRORS)
+async def warn_user(message):
+    if not core.is_admin(message.from_user.id):
+        await bot.reply_to(message, "У вас нет прав для использования этой команды.")
+        return
+    try:
+        if not message.reply_to_message:
+            await bot.reply_to(message, "Эта команда должна быть использована в ответ на сообщение пользователя.")
+            return
+        target = message.reply_to_message.from_user
+        settings = core.chat_configs.get(message.chat.id)
+        warn_count = await blocking(core.store.add_warn, message.chat.id, target.id)
+        await bot.reply_to(message.reply_to_message,
+                           f"<a href='tg://user?id={target.id}'>{target.first_name}</a>, вам выдано предупреждение ({warn_count}/{settings.auto_mute_warn_count}).",
+                           parse_mode='HTML')
+        logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Администратор {message.from_user.id} предупредил {target.id} (@{target.username}). Предупреждений: {warn_count}")
+        core.events.record(event_log.WARN, message.chat.id, target.id, admin_id=message.from_user.id, count=warn_count)
+        await escalate_warns(message.chat.id, target.id, warn_count, settings)
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении команды /warn: {e}", exc_info=True)
+        await bot.reply_to(message, "Произошла ошибка при обработке команды /warn.")
+
+@bot.message_handler(commands=['ban_ids'])
+@timed(metrics.HANDLER_SECONDS, 'ban_ids_command', errors=metrics.HANDLER_ERRORS)
+async def ban_ids_command(message):
+    """Асинхронный аналог main.ban_ids_command: массовый бан выполняет main.run_bulk_action в потоке через BlockingBot."""
+    if not core.is_admin(message.from_user.id):
+        await bot.reply_to(message, "У вас нет прав для использования этой команды.")
+        return
+    args = message.text.split(maxsplit=1)
+    user_ids, reason = split_leading_ids(args[1] if len(args) > 1 else '')
+    reason = reason or "Без причины"
+    if not user_ids:
+        await bot.reply_to(message, "Использование: /ban_ids 111111 222222 333333 [причина]")
+        return
+    try:
+        status = await bot.reply_to(message, f"Бан: 0/{len(user_ids)}...")
+        thread_bot = BlockingBot(bot, asyncio.get_running_loop())
+
+        def on_progress(done, total):
+            if done < total:
+                thread_bot.edit_message_text(f"Бан: {done}/{total}...", message.chat.id, status.message_id)
+
+        result = await asyncio.to_thread(core.run_bulk_action, 'ban', message.chat.id, user_ids, reason, source="chat",
+                                         on_progress=on_progress, bot_instance=thread_bot)
+        await bot.edit_message_text(result.summary(max_errors=20), message.chat.id, status.message_id)
+        logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Администратор {message.from_user.id} выполнил /ban_ids: "
+                    f"забанено {len(result.succeeded)} из {len(user_ids)}")
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении команды /ban_ids: {e}", exc_info=True)
+        await bot.reply_to(message, "Произошла ошибка при обработке команды /ban_ids.")
+
+@bot.message_handler(func=lambda message: True, content_types=['text'])
+@timed(metrics.HANDLER_SECONDS, 'handle_text', errors=metrics.HANDLER_ERRORS)
+async def handle_text(message):
+    if core.message_log.should_log():
+        full_name_or_empty = ((message.from_user.first_name or '') + ' ' + (message.from_user.last_name or '')).strip()
+        core.message_log.log("[%s (ID: %s) (Type: %s)] - [%s (ID: %s) (Username: @%s)]: %s",
+                             message.chat.title, message.chat.id, message.chat.type,
+                             full_name_or_empty, message.from_user.id, message.from_user.username or '', message.text)
+    if core.EVENT_LOG_MESSAGES:
+        core.events.record(event_log.MESSAGE, message.chat.id, message.from_user.id, message_id=message.message_id,
+                           username=message.from_user.username, text=message.text)
+
+    if message.chat.type in ['group', 'supergroup']:
+        settings = core.chat_configs.get(message.chat.id)
+        verdict = await blocking(core.check_message, message, settings)
+        if verdict is None:
+            return
+        kind, detail = verdict
+        if kind == 'flood':
+            await deletion_batcher.delete(message.chat.id, message.message_id)
+            logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Антифлуд ({detail}): пользователь {message.from_user.id}")
+            core.events.record(event_log.DELETE, message.chat.id, message.from_user.id, message_id=message.message_id, reason=detail)
+            await mute_user_id(message.from_user.id, settings.flood_mute_minutes, core.FLOOD_REASONS[detail], message.chat.id)
+        elif kind == 'near_duplicates':
+            await punish_near_duplicates(message.chat.id, detail, settings)
+        else:
+            await apply_rule(message, settings, detail)
+
+
+# --- Канал команд GUI ---
+async def execute_gui_command(command, progress):
+    """
+    Команды GUI выполняет синхронный main.process_gui_command в отдельном потоке (массовые действия идут долго
+    и не должны занимать workers), а его запросы к Telegram идут через общий bot.
+    """
+    return await asyncio.to_thread(core.run_gui_command, command, BlockingBot(bot, asyncio.get_running_loop()), progress)
+
+
+async def run_async_bot(command_channel):
+    if UPDATE_MODE != 'polling':
+        raise ValueError("asyncio-движок поддерживает только UPDATE_MODE = 'polling'.")
+    core.events.start()
+    core.username_cache.start()
+    if core.update_recorder:
+        core.update_recorder.start()
+    metrics_server = core.start_metrics_server()
+    mute_scheduler.schedule_many(core.scheduled_mutes())
+    polling = asyncio.create_task(abot.polling(non_stop=True, interval=0, timeout=20), name="polling")
+    tasks = [
+        polling,
+        asyncio.create_task(mute_scheduler.run(), name="mute-scheduler"),
+    ]
+    if command_channel is not None:
+        # SHUTDOWN подтверждается и отменяет задачу polling (у AsyncTeleBot нет stop_polling); остальные задачи отменяются ниже
+        tasks.append(asyncio.create_task(ipc_channel.serve_commands_async(command_channel, execute_gui_command, polling.cancel),
+                                         name="gui-commands"))
+        logger.info("GUI command listener task started.")
+    try:
+        logger.info("Бот (asyncio) запущен и готов к работе!")
+        await asyncio.wait([polling])
+        if not polling.cancelled():
+            polling.result() # Ошибка polling передается в run_async_bot_process
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Удаления и уведомления, которые еще ждут своего окна, отправляются до закрытия сессии, как в main.stop_services
+        await deletion_batcher.flush_all()
+        await bot.flush_notices()
+        await abot.close_session()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+
+
+def run_async_bot_process(command_channel):
+    """Точка входа asyncio-движка, аналог main.run_main_bot_process."""
+    logger.info("Бот-процесс (asyncio) запущен.")
+    try:
+        asyncio.run(run_async_bot(command_channel))
+    except Exception as e:
+        logger.error(f"Произошла критическая ошибка бота: {e}", exc_info=True)
+    finally:
+        workers.shutdown()
+        if core.update_recorder:
+            core.update_recorder.stop()
+        core.events.stop()
+        core.username_cache.stop()
+        core.store.close()
+        logger.info("Бот остановлен.")
@@ -0,0 +1,103 @@
+# bench_flood_detector.py - Нагрузочный тест FloodDetector
+#
+# Прогоняет поток сообщений от множества пользователей (среди них несколько
+# флудеров и спамеров одинаковым текстом) с заданной скоростью по "виртуальным"
+# часам и проверяет, что:
+#   - все флудеры и спамеры обнаружены (ложные срабатывания на обычных
+#     пользователях, случайно написавших часто, выводятся в отчете);
+#   - число отслеживаемых пользователей не превышает --max-users;
+#   - стоимость проверки одного сообщения не растет с числом пользователей.
+#
+# Запуск: python benchmarks/bench_flood_detector.py [--rate 5000] [--seconds 60] [--users 50000 1000000]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flood_detector import DUPLICATES, FLOOD, FloodDetector # noqa: E402
+
+CHAT_ID = -1001
+MAX_MESSAGES, WINDOW_SECONDS = 7, 10
+MAX_DUPLICATES, DUPLICATE_WINDOW_SECONDS = 3, 60
+
+
+def make_stream(rng, users, rate, seconds, flooders, spammers):
+    """Список (время, user_id, текст). Обычные пользователи пишут редко, флудеры - 2 сообщения в секунду, спамеры - один текст раз в 5 с."""
+    stream = []
+    total = rate * seconds
+    for i in range(total):
+        stream.append((i / rate, rng.randrange(1000, 1000 + users), f"сообщение {rng.random()}"))
+    for user_id in range(flooders):
+        for k in range(seconds * 2):
+            stream.append((k / 2 + user_id * 0.001, user_id, f"флуд {k}"))
+    for user_id in range(flooders, flooders + spammers):
+        for k in range(seconds // 5):
+            stream.append((k * 5.0 + user_id * 0.001, user_id, "Купите наш курс!!!"))
+    stream.sort(key=lambda item: item[0])
+    return stream
+
+
+def run(stream, max_users):
+    detector = FloodDetector(max_users=max_users, stats_interval=0)
+    detected = {}
+    peak_tracked = 0
+    started = time.perf_counter()
+    for i, (ts, user_id, text) in enumerate(stream):
+        kind = detector.check(CHAT_ID, user_id, text, MAX_MESSAGES, WINDOW_SECONDS, MAX_DUPLICATES, DUPLICATE_WINDOW_SECONDS, now=ts + 1.0)
+        if kind:
+            detected.setdefault(user_id, kind)
+        if i % 1024 == 0:
+            peak_tracked = max(peak_tracked, len(detector))
+    elapsed = time.perf_counter() - started
+    return detected, elapsed, max(peak_tracked, len(detector)), detector.stats()
+
+
+def baseline(stream):
+    """Нижняя граница: только перебор потока и вызов функции без работы."""
+    def noop(chat_id, user_id, text, *args, now=None):
+        return None
+    started = time.perf_counter()
+    for ts, user_id, text in stream:
+        noop(CHAT_ID, user_id, text, MAX_MESSAGES, WINDOW_SECONDS, MAX_DUPLICATES, DUPLICATE_WINDOW_SECONDS, now=ts)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест антифлуда")
+    parser.add_argument('--rate', type=int, default=5000, help="Сообщений в секунду (по виртуальным часам)")
+    parser.add_argument('--seconds', type=int, default=60, help="Длительность потока в виртуальных секундах")
+    parser.add_argument('--users', type=int, nargs='+', default=[50000, 200000, 1000000], help="Количество обычных пользователей")
+    parser.add_argument('--max-users', type=int, default=50000, help="FLOOD_TRACKED_USERS")
+    parser.add_argument('--flooders', type=int, default=20)
+    parser.add_argument('--spammers', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'пользователей':>13} | {'сообщений':>9} | {'мкс/сообщ.':>10} | {'без проверки':>12} | {'сообщ./с':>9} | "
+          f"{'пик в памяти':>12} | {'вытеснено':>9} | найдено")
+    for users in args.users:
+        stream = make_stream(rng, users, args.rate, args.seconds, args.flooders, args.spammers)
+        detected, elapsed, peak, stats = run(stream, args.max_users)
+        base = baseline(stream)
+
+        bad_users = set(range(args.flooders + args.spammers))
+        missed = bad_users - set(detected)
+        false_positives = set(detected) - bad_users
+        assert not missed, f"не обнаружены: {sorted(missed)}"
+        assert all(detected[u] == FLOOD for u in range(args.flooders)), "флудеры должны ловиться по частоте"
+        assert all(detected[u] == DUPLICATES for u in range(args.flooders, args.flooders + args.spammers)), "спамеры - по повторам"
+        assert peak <= args.max_users, f"в памяти {peak} пользователей при лимите {args.max_users}"
+
+        per_message = elapsed / len(stream) * 1e6
+        print(f"{users:>13} | {len(stream):>9} | {per_message:>10.2f} | {base / len(stream) * 1e6:>12.2f} | "
+              f"{len(stream) / elapsed:>9.0f} | {peak:>12} | {stats['evicted']:>9} | "
+              f"{len(detected) - len(false_positives)}/{len(bad_users)}, ложных {len(false_positives)}")
+
+
+if __name__ == '__main__':
+    main()
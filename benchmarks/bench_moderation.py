@@ -0,0 +1,252 @@
+# bench_moderation.py - Нагрузочный стенд бота без доступа к Telegram
+#
+# Загружает настоящий main.py (обработчики, диспетчер, ограничитель частоты,
+# хранилище, планировщик мутов), но все запросы к Bot API уходят на локальный
+# FakeBotApi. Токен из config.py не используется, данные (база, журнал событий,
+# лог) пишутся во временный каталог.
+#
+# Сценарии:
+#   chatter     - обычная переписка: пропускная способность handle_text;
+#   bad_words   - всплеск сообщений с плохими словами: задержка от получения
+#                 обновления до запроса на удаление;
+#   warn_storm  - администратор выдает /warn подряд: запись предупреждений,
+#                 ответы в чат и авто-муты;
+#   mass_mutes  - массовый мут (как из GUI) на несколько секунд: скорость мута
+#                 и опоздание автоматического размута (check_mutes).
+# Для каждого сценария: обновлений в секунду, задержки p50/p99, время
+# обработчиков (метрики main.py), прирост памяти процесса.
+#
+# Запуск: python benchmarks/bench_moderation.py [--scenario all] [--updates 5000] [--api-latency-ms 0]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import psutil
+except ImportError: # Без psutil память процесса не показывается, только tracemalloc
+    psutil = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotApi # noqa: E402
+from update_generator import UpdateGenerator, DEFAULT_CHAT_ID # noqa: E402
+
+ADMIN = {"id": 777000, "is_bot": False, "first_name": "Admin", "username": "bench_admin"}
+SCENARIOS = ('chatter', 'bad_words', 'warn_storm', 'mass_mutes')
+SUBMIT_BATCH = 100 # Обновлений в одной пачке (как ответ getUpdates)
+
+
+def load_bot(api_url, args, overrides=None):
+    """
+    Импортирует main.py с настройками стенда; overrides - {имя: значение} поверх config.py.
+    Консольный лог бота пишется в bench_console.log рабочего каталога.
+    """
+    import telebot
+    import config
+    telebot.apihelper.API_URL = api_url
+    config.TOKEN = '123456:BENCHMARK'
+    config.DISPATCHER_WORKERS = args.workers
+    config.DISPATCHER_STATS_INTERVAL = 0
+    config.METRICS_ENABLED = False
+    config.RECORD_UPDATES = False
+    if not args.real_rate_limits:
+        # Ограничитель частоты остается в цепочке, но не тормозит: измеряется сам бот, а не лимиты Telegram
+        config.RATE_LIMIT_GLOBAL_PER_SECOND = 10 ** 6
+        config.RATE_LIMIT_CHAT_PER_MINUTE = 10 ** 8
+        config.RATE_LIMIT_CHAT_BURST = 10 ** 6
+    for name, value in (overrides or {}).items():
+        setattr(config, name, value)
+
+    stderr = sys.stderr
+    sys.stderr = open('bench_console.log', 'a', encoding='utf-8')
+    try:
+        import main
+    finally:
+        sys.stderr = stderr
+    import metrics
+    metrics.enable() # Время обработчиков - из гистограмм main.py, без HTTP-сервера
+    return main
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def format_latencies(title, latencies):
+    if not latencies:
+        return f"{title}: нет данных"
+    return (f"{title}, мс: p50={percentile(latencies, 0.5) * 1000:.1f} p99={percentile(latencies, 0.99) * 1000:.1f} "
+            f"макс.={max(latencies) * 1000:.1f}")
+
+
+def submit(core, updates):
+    """Передает обновления в бот пачками, как polling. Возвращает {message_id: время передачи}."""
+    from telebot import types
+    submitted_at = {}
+    for start in range(0, len(updates), SUBMIT_BATCH):
+        batch = updates[start:start + SUBMIT_BATCH]
+        now = time.time()
+        for update in batch:
+            submitted_at[update["message"]["message_id"]] = now
+        core.raw_bot.process_new_updates([types.Update.de_json(update) for update in batch])
+    return submitted_at
+
+
+def wait_processed(core, expected, timeout):
+    """Ждет, пока диспетчер обработает expected обновлений."""
+    deadline = time.time() + timeout
+    while core.dispatcher.stats()["processed"] < expected and time.time() < deadline:
+        time.sleep(0.002)
+
+
+def handler_report(before):
+    """Время обработчиков за сценарий (разница снимков гистограммы bot_handler_seconds)."""
+    import metrics
+    lines = []
+    for handler, histogram in metrics.HANDLER_SECONDS.snapshot().items():
+        count = histogram["count"] - before.get(handler, {}).get("count", 0)
+        if count:
+            # Процентили считаются по всем вызовам с начала запуска
+            lines.append(f"  {handler}: {count} вызовов, p50={histogram['p50'] * 1000:.2f} мс, p99={histogram['p99'] * 1000:.2f} мс")
+    return lines
+
+
+def scenario_chatter(core, api, generator, args):
+    updates = list(generator.normal_chatter(args.updates))
+    processed_before = core.dispatcher.stats()["processed"]
+    started = time.perf_counter()
+    submit(core, updates)
+    wait_processed(core, processed_before + len(updates), args.timeout)
+    elapsed = time.perf_counter() - started
+    return [f"Обработано {len(updates)} обновлений за {elapsed:.2f} с -> {len(updates) / elapsed:.0f} обновлений/с"]
+
+
+def scenario_bad_words(core, api, generator, args):
+    updates = list(generator.bad_word_burst(args.updates))
+    chat_id = generator.chat_id
+    started = time.perf_counter()
+    submitted_at = submit(core, updates)
+    submitted = time.perf_counter() - started
+    seen = api.wait_for([('delete', chat_id, message_id) for message_id in submitted_at], args.timeout)
+    latencies = [seen[('delete', chat_id, message_id)] - at for message_id, at in submitted_at.items()
+                 if ('delete', chat_id, message_id) in seen]
+    return [
+        f"Передано {len(updates)} обновлений за {submitted:.2f} с -> {len(updates) / submitted:.0f} обновлений/с",
+        f"Удалено {len(latencies)}/{len(updates)} сообщений",
+        format_latencies("Задержка до запроса на удаление", latencies),
+    ]
+
+
+def scenario_warn_storm(core, api, generator, args):
+    targets = max(1, args.updates // 10)
+    updates = list(generator.warn_storm(args.updates, ADMIN, targets))
+    chat_id = generator.chat_id
+    replies = {update["message"]["message_id"]: update["message"]["reply_to_message"]["message_id"] for update in updates}
+    started = time.perf_counter()
+    submitted_at = submit(core, updates)
+    submitted = time.perf_counter() - started
+    seen = api.wait_for([('reply', chat_id, target) for target in replies.values()], args.timeout)
+    latencies = [seen[('reply', chat_id, replies[message_id])] - at for message_id, at in submitted_at.items()
+                 if ('reply', chat_id, replies[message_id]) in seen]
+    target_ids = {user["id"] for user in generator.users[:targets]}
+    muted = api.wait_for([('mute', chat_id, user_id) for user_id in target_ids], 1.0)
+    return [
+        f"Передано {len(updates)} команд /warn ({targets} пользователей) за {submitted:.2f} с -> {len(updates) / submitted:.0f} обновлений/с",
+        f"Ответов с предупреждением: {len(latencies)}/{len(updates)}, авто-мутов: {len(muted)}/{len(target_ids)}",
+        format_latencies("Задержка до ответа в чат", latencies),
+    ]
+
+
+def scenario_mass_mutes(core, api, generator, args):
+    chat_id = generator.chat_id
+    user_ids = [user["id"] for user in generator.users[:args.mutes]]
+    started = time.perf_counter()
+    result = core.run_bulk_action('mute', chat_id, user_ids, reason="Нагрузочный тест",
+                                  duration_minutes=args.mute_seconds / 60, source="benchmark")
+    elapsed = time.perf_counter() - started
+    end_times = {user_id: core.store.get_mute(chat_id, user_id)["end_time"] for user_id in result.succeeded}
+    seen = api.wait_for([('unmute', chat_id, user_id) for user_id in end_times], args.mute_seconds + args.timeout)
+    lateness = [seen[('unmute', chat_id, user_id)] - end_time for user_id, end_time in end_times.items()
+                if ('unmute', chat_id, user_id) in seen]
+    return [
+        f"Замучено {len(result.succeeded)}/{len(user_ids)} за {elapsed:.2f} с -> {len(user_ids) / elapsed:.0f} мутов/с",
+        f"Размучено автоматически: {len(lateness)}/{len(end_times)}",
+        format_latencies("Опоздание размута относительно срока", lateness),
+    ]
+
+
+def memory_usage():
+    return psutil.Process().memory_info().rss if psutil else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный стенд бота с поддельным Bot API")
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--updates', type=int, default=5000, help="Обновлений в сценариях chatter, bad_words, warn_storm")
+    parser.add_argument('--mutes', type=int, default=1000, help="Пользователей в сценарии mass_mutes")
+    parser.add_argument('--mute-seconds', type=float, default=3.0, help="Длительность мута в сценарии mass_mutes")
+    parser.add_argument('--workers', type=int, default=4, help="DISPATCHER_WORKERS (не меньше 1)")
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help="Задержка ответа поддельного Bot API")
+    parser.add_argument('--api-error-rate', type=float, default=0.0, help="Доля ответов 429 от поддельного Bot API")
+    parser.add_argument('--real-rate-limits', action='store_true', help="Не снимать ограничения RATE_LIMIT_* из config.py")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Сколько ждать завершения сценария, секунд")
+    parser.add_argument('--tracemalloc', action='store_true', help="Пиковая память Python-объектов (замедляет работу)")
+    parser.add_argument('--keep-dir', action='store_true', help="Не удалять рабочий каталог (база, журнал, лог)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        # Без диспетчера TeleBot обрабатывает обновления в своем пуле потоков, и стенд не видит, когда они обработаны
+        parser.error("--workers должен быть не меньше 1")
+
+    work_dir = tempfile.mkdtemp(prefix='bot-bench-')
+    os.chdir(work_dir)
+    api = FakeBotApi(args.api_latency_ms / 1000, args.api_error_rate)
+    core = load_bot(api.start(), args, {"MAIN_CHAT_ID": DEFAULT_CHAT_ID, "ADMIN_USER_IDS": [ADMIN["id"]], "CHAT_SETTINGS": {}})
+    core.start_services()
+    print(f"Рабочий каталог: {work_dir}; диспетчер: {args.workers} потоков; "
+          f"лимиты частоты: {'из config.py' if args.real_rate_limits else 'сняты'}")
+
+    import metrics
+    users = max(20000, args.mutes)
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+    try:
+        for index, name in enumerate(scenarios):
+            # У каждого сценария свой чат: счетчики антифлуда и предупреждений не пересекаются
+            generator = UpdateGenerator(chat_id=DEFAULT_CHAT_ID - index, users_count=users, seed=index,
+                                        bad_words=core.config.BAD_WORDS)
+            handlers_before = metrics.HANDLER_SECONDS.snapshot()
+            calls_before = api.total_calls()
+            memory_before = memory_usage()
+            if args.tracemalloc:
+                tracemalloc.start()
+            lines = globals()[f"scenario_{name}"](core, api, generator, args)
+            if args.tracemalloc:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                lines.append(f"Пик памяти Python-объектов: {peak / 1024 / 1024:.1f} МБ")
+            memory_after = memory_usage()
+            if memory_after is not None:
+                lines.append(f"Память процесса: {memory_after / 1024 / 1024:.1f} МБ "
+                             f"(+{(memory_after - memory_before) / 1024 / 1024:.1f} МБ за сценарий)")
+            lines.append(f"Запросов к Bot API: {api.total_calls() - calls_before}")
+            lines.extend(handler_report(handlers_before))
+            print(f"\n== {name} ==")
+            print('\n'.join(lines))
+    finally:
+        core.stop_services()
+        api.shutdown()
+        print(f"\nВызовы Bot API: {dict(sorted(api.calls.items()))}, ответов 429: {api.errors_injected}")
+        if not args.keep_dir:
+            os.chdir(REPO_DIR)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
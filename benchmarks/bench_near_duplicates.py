@@ -0,0 +1,155 @@
+# bench_near_duplicates.py - Офлайн-бенчмарк обнаружения рейдов (NearDuplicateIndex)
+#
+# Синтетический корпус: обычная переписка (случайные фразы из словаря) и рейды -
+# один рекламный текст с мелкими правками (эмодзи, числа, замененные буквы,
+# приписки) от множества разных аккаунтов. Сообщения идут по виртуальным часам с
+# заданной скоростью. Отчет:
+#   - время обработки одного сообщения (нормализация + MinHash + поиск в индексе);
+#   - задержка обнаружения: сколько копий рейда и сколько секунд прошло от первой
+#     копии до срабатывания;
+#   - доля удаленных копий рейдов и ложные срабатывания на обычных сообщениях;
+#   - память индекса на тысячу сообщений (tracemalloc, отдельным проходом - он замедляет работу).
+#
+# Запуск: python benchmarks/bench_near_duplicates.py [--messages 100000] [--raids 20] [--copies 5]
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spam_fingerprint import NearDuplicateIndex # noqa: E402
+
+CHAT_ID = -1001
+
+COMMON_WORDS = ("привет как дела кто идет сегодня вечером встреча парк мяч погода дождь солнце работа учеба экзамен "
+                "кино фильм смотрел вчера отличный скучный думаю согласен нет да может завтра утром кофе чай обед "
+                "ужин машина сломалась ремонт дорого дешево купил продал новый старый телефон ноутбук игра команда").split()
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+RAID_TEMPLATES = [
+    "Заработай {n} рублей в день без вложений! Пиши в личку, подробности по ссылке t.me/easy_money",
+    "Крипто сигналы бесплатно, вступай в наш канал и получай прибыль {n}% каждый день",
+    "Срочно нужны люди на удаленную работу, оплата {n} ежедневно, пишите в лс",
+    "Интим знакомства рядом с тобой, {n} анкет онлайн, переходи по ссылке в профиле",
+    "Продам аккаунты и подписчиков недорого, {n} штук в наличии, скидки оптом",
+]
+
+
+def make_vocabulary(rng, size):
+    """Частые слова и редкие случайные "слова": в живой переписке словарь намного больше сотни слов."""
+    rare = [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+    return COMMON_WORDS, rare
+
+
+def normal_message(rng, vocabulary):
+    common, rare = vocabulary
+    return ' '.join(rng.choice(common) if rng.random() < 0.4 else rng.choice(rare) for _ in range(rng.randint(3, 14)))
+
+
+def mutate(rng, template):
+    text = template.format(n=rng.choice([500, 1000, 3000, 5000, 10000]))
+    for _ in range(rng.randint(0, 2)):
+        kind = rng.randrange(5)
+        if kind == 0:
+            text += ' ' + rng.choice("🔥💰✅🚀💎")
+        elif kind == 1:
+            text = re.sub(r'\d+', str(rng.randint(100, 99999)), text, count=1)
+        elif kind == 2:
+            i = rng.randrange(len(text))
+            text = text[:i] + rng.choice("абвгдеж") + text[i + 1:]
+        elif kind == 3:
+            text = text.upper() if rng.random() < 0.5 else text + ' ' + rng.choice(["пиши!", "жми", "го", "успей"])
+        else:
+            text = rng.choice(["!!! ", "➡️ ", "Внимание! "]) + text
+    return text
+
+
+def make_corpus(rng, messages, rate, raids, copies_per_raid, raid_seconds):
+    """Список (время, user_id, текст, номер рейда или None)."""
+    seconds = messages / rate
+    vocabulary = make_vocabulary(rng, 20000)
+    corpus = [(i / rate, rng.randrange(1, 10 ** 6), normal_message(rng, vocabulary), None) for i in range(messages)]
+    for raid in range(raids):
+        # Свой хвост у каждого рейда: рейды с одним шаблоном не должны сливаться в одну группу
+        template = RAID_TEMPLATES[raid % len(RAID_TEMPLATES)] + ' ' + ' '.join(rng.choice(vocabulary[1]) for _ in range(8))
+        start = rng.uniform(0, max(0.0, seconds - raid_seconds))
+        for _ in range(copies_per_raid):
+            corpus.append((start + rng.uniform(0, raid_seconds), 10 ** 7 + rng.randrange(10 ** 6), mutate(rng, template), raid))
+    corpus.sort(key=lambda item: item[0])
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк обнаружения рейдов")
+    parser.add_argument('--messages', type=int, default=100000, help="Обычных сообщений")
+    parser.add_argument('--rate', type=int, default=500, help="Обычных сообщений в секунду (по виртуальным часам)")
+    parser.add_argument('--raids', type=int, default=20)
+    parser.add_argument('--raid-size', type=int, default=200, help="Копий в одном рейде")
+    parser.add_argument('--raid-seconds', type=float, default=60.0, help="За сколько секунд рассылаются копии одного рейда")
+    parser.add_argument('--copies', type=int, default=5, help="NEAR_DUP_COPIES")
+    parser.add_argument('--window', type=float, default=600.0, help="NEAR_DUP_WINDOW_SECONDS")
+    parser.add_argument('--max-messages', type=int, default=50000, help="NEAR_DUP_MAX_MESSAGES")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = make_corpus(rng, args.messages, args.rate, args.raids, args.raid_size, args.raid_seconds)
+
+    index = NearDuplicateIndex(args.window, args.max_messages, stats_interval=0)
+    first_seen = {}       # рейд -> (время первой копии, номер копии)
+    raid_copies_seen = {} # рейд -> сколько копий пришло
+    detected = {}         # рейд -> (копий до срабатывания, секунд до срабатывания)
+    deleted_raid = 0
+    false_positives = 0
+    peak_entries = 0
+    started = time.perf_counter()
+    for message_id, (ts, user_id, text, raid) in enumerate(corpus):
+        if raid is not None:
+            first_seen.setdefault(raid, ts)
+            raid_copies_seen[raid] = raid_copies_seen.get(raid, 0) + 1
+        flagged = index.add(CHAT_ID, user_id, message_id, text, args.copies, now=ts + 1.0)
+        if flagged:
+            for _, flagged_id in flagged:
+                if corpus[flagged_id][3] is None:
+                    false_positives += 1
+                else:
+                    deleted_raid += 1
+            if raid is not None and raid not in detected:
+                detected[raid] = (raid_copies_seen[raid], ts - first_seen[raid])
+        if message_id % 1024 == 0:
+            peak_entries = max(peak_entries, len(index))
+    elapsed = time.perf_counter() - started
+    stats = index.stats()
+    del index
+
+    tracemalloc.start()
+    memory_index = NearDuplicateIndex(args.window, args.max_messages, stats_interval=0)
+    for message_id, (ts, user_id, text, _) in enumerate(corpus[:args.max_messages]):
+        memory_index.add(CHAT_ID, user_id, message_id, text, args.copies, now=ts + 1.0)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_raid = args.raids * args.raid_size
+    print(f"Сообщений: {len(corpus)} (обычных {args.messages}, копий рейдов {total_raid}), порог {args.copies} копий")
+    print(f"Обработка: {elapsed / len(corpus) * 1e6:.1f} мкс/сообщ. ({len(corpus) / elapsed:.0f} сообщ./с), "
+          f"кандидатов на сообщение: {stats['candidates_checked'] / max(1, stats['indexed']):.2f}")
+    if detected:
+        copies = sorted(c for c, _ in detected.values())
+        delays = sorted(d for _, d in detected.values())
+        print(f"Рейдов обнаружено: {len(detected)}/{args.raids}; копий до срабатывания: медиана {copies[len(copies) // 2]}, "
+              f"макс. {copies[-1]}; секунд до срабатывания: медиана {delays[len(delays) // 2]:.2f}, макс. {delays[-1]:.2f}")
+    else:
+        print(f"Рейдов обнаружено: 0/{args.raids}")
+    print(f"Удалено копий рейдов: {deleted_raid}/{total_raid} ({deleted_raid / max(1, total_raid):.1%}), "
+          f"ложных срабатываний: {false_positives}")
+    print(f"Индекс: до {peak_entries} сообщений, память {memory / 1024 / 1024:.1f} МБ "
+          f"({memory / max(1, len(memory_index)) * 1000 / 1024:.0f} КБ на 1000 сообщений)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# bench_regex_rules.py - Сравнение PatternSet с отдельным re.search на каждый шаблон
+#
+# Шаблоны - слова-маркеры спама и несколько "настоящих" (ссылки, приглашения,
+# телефоны). В корпусе большинство сообщений ничего не содержит, как в жизни.
+# Выводится и движок, выбранный regex_filter (re2 или regex; без них PatternSet
+# не создается). Выигрыш дает только re2 (объединенное выражение); с regex шаблоны
+# ищутся по одному, и PatternSet добавляет к ним лишь проверку бюджета времени.
+#
+# Запуск: python benchmarks/bench_regex_rules.py [--patterns 10 100 500] [--messages 2000]
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_filter import PatternSet, available_engines # noqa: E402
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+BASE_PATTERNS = {
+    'invite': r'(?:t\.me|telegram\.me)/(?:\+|joinchat/)[\w-]{10,}',
+    'link': r'\b(?:https?://|www\.)\S+',
+    'phone': r'(?:\+7|\b8)[\s(-]*9\d{2}[\s)-]*\d{3}[\s-]*\d{2}[\s-]*\d{2}\b',
+}
+SPAM_SNIPPETS = ["https://t.me/+AbCdEfGhIjKlM", "звоните 8 912 345-67-89", "www.example.com"]
+
+
+def random_word(rng, min_len=4, max_len=10):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_patterns(rng, count):
+    patterns = dict(BASE_PATTERNS)
+    while len(patterns) < count:
+        patterns[f"w{len(patterns)}"] = rf"\b{random_word(rng)}\w*\s+{random_word(rng, 3, 6)}"
+    return patterns
+
+
+def make_corpus(rng, messages_count, bad_ratio=0.05):
+    messages = []
+    for _ in range(messages_count):
+        parts = [random_word(rng, 2, 9) for _ in range(rng.randint(3, 25))]
+        if rng.random() < bad_ratio:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(SPAM_SNIPPETS))
+        messages.append(' '.join(parts))
+    return messages
+
+
+def measure(func, messages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in messages:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микро-бенчмарк правил 'regex'")
+    parser.add_argument('--patterns', type=int, nargs='+', default=[3, 10, 100, 500], help="Количество шаблонов")
+    parser.add_argument('--messages', type=int, default=2000, help="Количество сообщений в корпусе")
+    parser.add_argument('--repeat', type=int, default=3, help="Количество повторов (берется лучшее время)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not available_engines():
+        sys.exit("Установите google-re2 или regex: без них правила 'regex' не загружаются")
+    rng = random.Random(args.seed)
+    messages = make_corpus(rng, args.messages)
+    print(f"{'шаблонов':>8} | {'re.search по одному, мкс/сообщ.':>31} | {'PatternSet, мкс/сообщ.':>22} | {'ускорение':>9} | движки")
+    for patterns_count in args.patterns:
+        patterns = make_patterns(rng, patterns_count)
+        separate = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in patterns.items()]
+        pattern_set = PatternSet(patterns, time_budget=1.0) # Бюджет не должен влиять на результат
+
+        def search_separately(text):
+            return [name for name, compiled in separate if compiled.search(text)]
+
+        # Найденные шаблоны должны совпадать
+        for text in messages:
+            names, over_budget = pattern_set.search(text)
+            assert not over_budget and sorted(names) == sorted(search_separately(text)), text
+
+        old_time = measure(search_separately, messages, args.repeat)
+        new_time = measure(pattern_set.search, messages, args.repeat)
+        print(f"{patterns_count:>8} | {old_time / len(messages) * 1e6:>31.1f} | {new_time / len(messages) * 1e6:>22.1f} | "
+              f"{old_time / new_time:>8.1f}x | {', '.join(pattern_set.engines)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# bench_word_filter.py - Сравнение BadWordMatcher со старым циклом "word in text.lower()"
+#
+# Отдельно измеряется стоимость нормализации текста (text_normalizer): для новых
+# сообщений (промах кэша) и для повторяющихся (попадание в кэш).
+#
+# Запуск: python benchmarks/bench_word_filter.py [--words 5000] [--messages 2000]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import text_normalizer # noqa: E402
+from word_filter import BadWordMatcher # noqa: E402
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+
+def random_word(rng, min_len=4, max_len=10):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(min_len, max_len)))
+
+
+def make_corpus(rng, words, messages_count, bad_ratio=0.05):
+    messages = []
+    for _ in range(messages_count):
+        parts = [random_word(rng, 2, 9) for _ in range(rng.randint(3, 25))]
+        if rng.random() < bad_ratio:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(words).upper())
+        messages.append(' '.join(parts))
+    return messages
+
+
+def old_loop(words, text):
+    """Старая проверка из handle_text: один поиск подстроки на каждое слово."""
+    for word in words:
+        if word in text.lower():
+            return word
+    return None
+
+
+def measure(func, messages, repeat, before_each=None):
+    best = float('inf')
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        for text in messages:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микро-бенчмарк поиска плохих слов")
+    parser.add_argument('--words', type=int, nargs='+', default=[5, 100, 1000, 5000], help="Размеры списка BAD_WORDS")
+    parser.add_argument('--messages', type=int, default=2000, help="Количество сообщений в корпусе")
+    parser.add_argument('--repeat', type=int, default=3, help="Количество повторов (берется лучшее время)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'слов':>6} | {'старый цикл, мкс/сообщ.':>24} | {'автомат, мкс/сообщ.':>20} | {'ускорение':>9} | "
+          f"{'+нормализация':>13} | {'+нормализация (кэш)':>19}")
+    for words_count in args.words:
+        words = [random_word(rng) for _ in range(words_count)]
+        messages = make_corpus(rng, words, args.messages)
+
+        build_started = time.perf_counter()
+        matcher = BadWordMatcher(words)
+        build_time = time.perf_counter() - build_started
+
+        # Результаты обоих способов должны совпадать
+        for text in messages:
+            assert (old_loop(words, text) is None) == (matcher.find_first(text) is None), text
+
+        old_time = measure(lambda text: old_loop(words, text), messages, args.repeat)
+        new_time = measure(matcher.find_all, messages, args.repeat)
+        normalized_matcher = BadWordMatcher(words, normalize=text_normalizer.normalize)
+        normalized_time = measure(normalized_matcher.find_all, messages, args.repeat, text_normalizer.cache_clear)
+        cached_time = measure(normalized_matcher.find_all, messages, args.repeat)
+        per_old = old_time / len(messages) * 1e6
+        per_new = new_time / len(messages) * 1e6
+        print(f"{words_count:>6} | {per_old:>24.2f} | {per_new:>20.2f} | {old_time / new_time:>8.1f}x | "
+              f"{normalized_time / len(messages) * 1e6:>13.2f} | {cached_time / len(messages) * 1e6:>19.2f}"
+              f"   (построение автомата: {build_time * 1000:.1f} мс)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# fake_bot_api.py - Локальный "поддельный" Bot API для нагрузочных тестов
+#
+# HTTP-сервер отвечает на запросы TeleBot так же, как api.telegram.org, но
+# ничего не отправляет: запоминает, какие методы вызывались, и время первого
+# действия над каждым сообщением или пользователем (удаление, ответ, мут, размут,
+# бан). По этим отметкам стенд считает задержку модерации от получения
+# обновления до запроса к Telegram.
+#
+# Задержку ответа и долю ответов 429 (Too Many Requests) можно задать, чтобы
+# проверить поведение ограничителя частоты под нагрузкой.
+#
+# Подключение: telebot.apihelper.API_URL = FakeBotApi(...).start()
+
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Benchmark bot", "username": "benchmark_bot"}
+
+
+def _params(handler):
+    """Параметры запроса TeleBot: из строки запроса и тела (form-urlencoded или JSON)."""
+    url = urllib.parse.urlsplit(handler.path)
+    params = dict(urllib.parse.parse_qsl(url.query))
+    length = int(handler.headers.get('Content-Length') or 0)
+    if length:
+        body = handler.rfile.read(length).decode('utf-8')
+        if handler.headers.get('Content-Type', '').startswith('application/json'):
+            params.update(json.loads(body))
+        else:
+            params.update(urllib.parse.parse_qsl(body))
+    return url.path.rsplit('/', 1)[-1], params
+
+
+def _json_param(params, name, default=None):
+    value = params.get(name)
+    if value is None:
+        return default
+    return json.loads(value) if isinstance(value, str) else value
+
+
+class FakeBotApi:
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        """latency - задержка каждого ответа, секунд; error_rate - доля запросов, на которые отвечаем 429."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._message_ids = itertools.count(1000000)
+        self._lock = threading.Lock()
+        self.calls = {}      # метод -> число запросов
+        self.first_seen = {} # (действие, chat_id, id) -> time.time() первого такого запроса
+        self.errors_injected = 0
+        self._server = None
+
+    def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер в фоновом потоке и возвращает шаблон адреса для telebot.apihelper.API_URL."""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api._handle(self)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, name="fake-bot-api")
+        thread.daemon = True
+        thread.start()
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _handle(self, handler):
+        method, params = _params(handler)
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            inject_error = self.error_rate and self._rng.random() < self.error_rate
+            if inject_error:
+                self.errors_injected += 1
+        if inject_error:
+            self._reply(handler, 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                                       "parameters": {"retry_after": 1}})
+            return
+        self._record(method, params)
+        self._reply(handler, 200, {"ok": True, "result": self._result(method, params)})
+
+    def _record(self, method, params):
+        now = time.time()
+        chat_id = int(params.get('chat_id', 0))
+        if method == 'deleteMessage':
+            keys = [('delete', chat_id, int(params['message_id']))]
+        elif method == 'deleteMessages':
+            keys = [('delete', chat_id, message_id) for message_id in _json_param(params, 'message_ids', [])]
+        elif method == 'sendMessage':
+            # Старые версии TeleBot передают reply_to_message_id, новые - reply_parameters
+            reply_to = params.get('reply_to_message_id') or _json_param(params, 'reply_parameters', {}).get('message_id')
+            keys = [('reply', chat_id, int(reply_to))] if reply_to else []
+        elif method == 'restrictChatMember':
+            can_send = _json_param(params, 'permissions', {}).get('can_send_messages')
+            keys = [('unmute' if can_send else 'mute', chat_id, int(params['user_id']))]
+        elif method in ('banChatMember', 'kickChatMember'):
+            keys = [('ban', chat_id, int(params['user_id']))]
+        elif method == 'unbanChatMember':
+            keys = [('unban', chat_id, int(params['user_id']))]
+        else:
+            keys = []
+        with self._lock:
+            for key in keys:
+                self.first_seen.setdefault(key, now)
+
+    def _result(self, method, params):
+        if method == 'getMe':
+            return BOT_USER
+        if method in ('sendMessage', 'editMessageText'):
+            return {
+                "message_id": int(params.get('message_id') or next(self._message_ids)),
+                "from": BOT_USER,
+                "chat": {"id": int(params.get('chat_id', 0)), "type": "supergroup"},
+                "date": int(time.time()),
+                "text": params.get('text', ''),
+            }
+        if method == 'getUpdates':
+            return []
+        return True # deleteMessage(s), restrictChatMember, banChatMember и т.д.
+
+    @staticmethod
+    def _reply(handler, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def wait_for(self, keys, timeout):
+        """Ждет, пока для всех keys придут запросы (или истечет timeout). Возвращает {ключ: время первого запроса}."""
+        deadline = time.time() + timeout
+        keys = list(keys)
+        while True:
+            with self._lock:
+                seen = {key: self.first_seen[key] for key in keys if key in self.first_seen}
+            if len(seen) == len(keys) or time.time() >= deadline:
+                return seen
+            time.sleep(0.01)
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
@@ -0,0 +1,154 @@
+# replay_updates.py - Воспроизведение записанных обновлений через обработчики бота
+#
+# Читает запись RECORD_UPDATES (update_recorder.py) и передает обновления в
+# настоящий main.py с той же скоростью, что и при записи, или быстрее (--speed).
+# Все запросы к Bot API уходят на локальный FakeBotApi, база и журнал событий -
+# во временном каталоге, поэтому запись можно гонять сколько угодно раз.
+#
+# Сравнение настроек модерации на одной и той же записи:
+#   python benchmarks/replay_updates.py recorded_updates --speed 0 --set FLOOD_MAX_MESSAGES=5
+#   python benchmarks/replay_updates.py recorded_updates --speed 0 --set NEAR_DUP_COPIES=3
+# Отчет: скорость обработки, отставание от исходного темпа, ожидание в очередях
+# диспетчера, действия бота (удаления, муты, ответы), время обработчиков.
+#
+# --profile: обновления обрабатываются в основном потоке (без диспетчера), и
+# выводятся самые затратные функции по данным cProfile.
+
+import argparse
+import ast
+import cProfile
+import itertools
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_moderation import REPO_DIR, SUBMIT_BATCH, handler_report, load_bot, memory_usage # noqa: E402
+from fake_bot_api import FakeBotApi # noqa: E402
+from update_recorder import read_updates # noqa: E402
+
+ACTION_NAMES = {'delete': "удалено сообщений", 'mute': "мутов", 'unmute': "размутов", 'ban': "банов",
+                'unban': "разбанов", 'reply': "ответов на сообщения"}
+
+
+def parse_override(text):
+    """NAME=VALUE для --set; значение - литерал Python (число, список, словарь), иначе строка."""
+    name, sep, value = text.partition('=')
+    if not sep or not name.isidentifier():
+        raise argparse.ArgumentTypeError(f"ожидается ИМЯ=ЗНАЧЕНИЕ, получено {text!r}")
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return name, value
+
+
+def replay(records, handle, speed):
+    """Передает (ts, update) в handle пачками; при speed > 0 выдерживает исходные интервалы. Возвращает (число, отставание)."""
+    from telebot import types
+    count = 0
+    max_lag = 0.0
+    first_ts = None
+    started = time.monotonic()
+    batch = []
+    for ts, raw in records:
+        if speed:
+            if first_ts is None:
+                first_ts = ts
+            delay = started + (ts - first_ts) / speed - time.monotonic()
+            if delay > 0:
+                if batch:
+                    handle(batch)
+                    batch = []
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+        batch.append(types.Update.de_json(raw))
+        count += 1
+        if len(batch) >= SUBMIT_BATCH:
+            handle(batch)
+            batch = []
+    if batch:
+        handle(batch)
+    return count, max_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных обновлений с поддельным Bot API")
+    parser.add_argument('path', help="Каталог записи (RECORD_UPDATES_DIR) или один файл updates.*.jsonl.gz")
+    parser.add_argument('--speed', type=float, default=1.0, help="Во сколько раз быстрее исходного темпа (0 - без пауз)")
+    parser.add_argument('--limit', type=int, default=0, help="Воспроизвести только первые N обновлений")
+    parser.add_argument('--set', dest='overrides', type=parse_override, action='append', default=[],
+                        metavar='ИМЯ=ЗНАЧЕНИЕ', help="Переопределить настройку config.py (можно несколько раз)")
+    parser.add_argument('--workers', type=int, default=4, help="DISPATCHER_WORKERS (не меньше 1)")
+    parser.add_argument('--api-latency-ms', type=float, default=0.0, help="Задержка ответа поддельного Bot API")
+    parser.add_argument('--api-error-rate', type=float, default=0.0, help="Доля ответов 429 от поддельного Bot API")
+    parser.add_argument('--real-rate-limits', action='store_true', help="Не снимать ограничения RATE_LIMIT_* из config.py")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Сколько ждать обработки после воспроизведения, секунд")
+    parser.add_argument('--profile', type=int, default=0, metavar='N', help="Показать N самых затратных функций (cProfile)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers должен быть не меньше 1")
+
+    path = os.path.abspath(args.path)
+    work_dir = tempfile.mkdtemp(prefix='bot-replay-')
+    os.chdir(work_dir)
+    api = FakeBotApi(args.api_latency_ms / 1000, args.api_error_rate)
+    core = load_bot(api.start(), args, dict(args.overrides))
+    core.start_services()
+    print(f"Запись: {path}; скорость: {'без пауз' if not args.speed else f'x{args.speed:g}'}; "
+          f"переопределено: {dict(args.overrides) or 'ничего'}")
+
+    records = read_updates(path)
+    if args.limit:
+        records = itertools.islice(records, args.limit)
+    memory_before = memory_usage()
+    profiler = None
+    started = time.perf_counter()
+    try:
+        if args.profile:
+            # cProfile видит только свой поток: обрабатываем в основном потоке тем же кодом, что и рабочие потоки диспетчера
+            profiler = cProfile.Profile()
+            profiler.enable()
+            count, max_lag = replay(records, core.process_new_updates, args.speed)
+            profiler.disable()
+        else:
+            count, max_lag = replay(records, core.raw_bot.process_new_updates, args.speed)
+            deadline = time.time() + args.timeout
+            while core.dispatcher.stats()["processed"] < count and time.time() < deadline:
+                time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+        dispatcher_stats = core.dispatcher.stats()
+    finally:
+        core.stop_services() # Заодно отправляет удаления, накопленные DeletionBatcher
+        api.shutdown()
+    memory_after = memory_usage()
+
+    print(f"Обновлений: {count} за {elapsed:.2f} с -> {count / max(elapsed, 1e-9):.0f} обновлений/с")
+    if args.speed:
+        print(f"Макс. отставание от исходного темпа: {max_lag:.2f} с")
+    if not args.profile:
+        print(f"Очереди диспетчера: макс. {dispatcher_stats['max_queue_depth']}, ожидание ср. {dispatcher_stats['avg_wait_ms']:.1f} мс / "
+              f"макс. {dispatcher_stats['max_wait_ms']:.1f} мс, ошибок обработки {dispatcher_stats['failed']}")
+    actions = {}
+    for action, _, _ in api.first_seen:
+        actions[action] = actions.get(action, 0) + 1
+    print("Действия бота: " + (", ".join(f"{ACTION_NAMES[action]} - {n}" for action, n in sorted(actions.items())) or "нет"))
+    print(f"Вызовы Bot API: {dict(sorted(api.calls.items()))}, ответов 429: {api.errors_injected}")
+    if memory_after is not None:
+        print(f"Память процесса: {memory_after / 1024 / 1024:.1f} МБ (+{(memory_after - memory_before) / 1024 / 1024:.1f} МБ)")
+    print("Время обработчиков:")
+    print('\n'.join(handler_report({})))
+    if profiler is not None:
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(args.profile)
+
+    os.chdir(REPO_DIR)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# update_generator.py - Генератор синтетических обновлений Telegram (в формате Bot API JSON)
+
+import itertools
+import random
+import time
+
+ALPHABET = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+DEFAULT_CHAT_ID = -1001000000001
+
+
+class UpdateGenerator:
+    def __init__(self, chat_id=DEFAULT_CHAT_ID, users_count=200, seed=42, bad_words=None):
+        self.chat_id = chat_id
+        self.rng = random.Random(seed)
+        self.users = [
+            {"id": 100000 + i, "is_bot": False, "first_name": f"User{i}", "username": f"user_{i}"}
+            for i in range(users_count)
+        ]
+        self.bad_words = list(bad_words or ["редискаа", "дурак22"])
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def random_text(self, min_words=3, max_words=20):
+        return ' '.join(
+            ''.join(self.rng.choice(ALPHABET) for _ in range(self.rng.randint(2, 9)))
+            for _ in range(self.rng.randint(min_words, max_words))
+        )
+
+    def message_update(self, text, user=None, chat_id=None, reply_to=None):
+        """Одно обновление с текстовым сообщением в группе."""
+        chat_id = self.chat_id if chat_id is None else chat_id
+        message = {
+            "message_id": next(self._message_ids),
+            "from": user or self.rng.choice(self.users),
+            "chat": {"id": chat_id, "type": "supergroup", "title": "Benchmark chat"},
+            "date": int(time.time()),
+            "text": text,
+        }
+        if text.startswith('/'):
+            command_length = len(text.split(' ', 1)[0])
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": command_length}]
+        if reply_to is not None:
+            message["reply_to_message"] = reply_to
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def normal_chatter(self, count):
+        """Обычная переписка без нарушений."""
+        for _ in range(count):
+            yield self.message_update(self.random_text())
+
+    def bad_word_burst(self, count):
+        """Всплеск сообщений с запрещенными словами."""
+        for _ in range(count):
+            words = self.random_text().split(' ')
+            words.insert(self.rng.randrange(len(words) + 1), self.rng.choice(self.bad_words).upper())
+            yield self.message_update(' '.join(words))
+
+    def warn_storm(self, count, admin, targets_count=50):
+        """Администратор раз за разом отвечает /warn на сообщения targets_count пользователей (доходит до авто-мута)."""
+        targets = self.users[:targets_count]
+        for i in range(count):
+            target_message = self.message_update(self.random_text(), user=targets[i % len(targets)])["message"]
+            yield self.message_update('/warn', user=admin, reply_to=target_message)
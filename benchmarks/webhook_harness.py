@@ -0,0 +1,127 @@
+# webhook_harness.py - Стенд "поддельного Telegram" для webhook-режима
+#
+# Отправляет синтетические обновления POST-запросами на webhook-сервер, как это
+# делает Telegram, и измеряет пропускную способность и задержку без доступа к сети.
+#
+# По умолчанию поднимает WebhookServer в этом же процессе с тестовым ботом,
+# обработчик которого отмечает время получения каждого сообщения.
+# С --url запросы отправляются на уже запущенного бота (UPDATE_MODE = 'webhook'),
+# тогда измеряется только время ответа сервера.
+#
+# Запуск: python benchmarks/webhook_harness.py [--updates 2000] [--concurrency 8]
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from update_generator import UpdateGenerator # noqa: E402
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def post_update(host, port, path, secret, update):
+    body = json.dumps(update, ensure_ascii=False).encode('utf-8')
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request('POST', path, body, {'Content-Type': 'application/json', SECRET_TOKEN_HEADER: secret})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def start_local_server():
+    """Поднимает WebhookServer с тестовым ботом, который запоминает время обработки каждого сообщения."""
+    import telebot
+    from webhook_server import WebhookServer
+
+    handled = {}
+    bot = telebot.TeleBot('123456:HARNESS', threaded=False)
+
+    @bot.message_handler(func=lambda message: True, content_types=['text'])
+    def record(message):
+        handled[message.message_id] = time.perf_counter()
+
+    server = WebhookServer(bot, '127.0.0.1', 0, '/telegram-webhook', 'harness-secret')
+    server.start()
+    return server, handled
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный стенд для webhook-режима")
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--url', help="Адрес запущенного бота, например http://127.0.0.1:8443/telegram-webhook")
+    parser.add_argument('--secret', default='', help="WEBHOOK_SECRET_TOKEN запущенного бота (вместе с --url)")
+    args = parser.parse_args()
+
+    server = None
+    handled = None
+    if args.url:
+        parsed = urllib.parse.urlparse(args.url)
+        host, port, path, secret = parsed.hostname, parsed.port or 80, parsed.path, args.secret
+    else:
+        server, handled = start_local_server()
+        host, port = server.address
+        path, secret = server.path, server.secret_token
+
+    # Запрос с неверным токеном должен быть отклонен
+    generator = UpdateGenerator()
+    status = post_update(host, port, path, secret + 'x', next(generator.normal_chatter(1)))
+    print(f"Проверка секретного токена: неверный токен -> HTTP {status} ({'OK' if status == 403 else 'ОШИБКА'})")
+
+    updates = list(generator.normal_chatter(args.updates))
+    sent_at = {}
+    response_times = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(update):
+        started = time.perf_counter()
+        sent_at[update["message"]["message_id"]] = started
+        code = post_update(host, port, path, secret, update)
+        elapsed = time.perf_counter() - started
+        with lock:
+            response_times.append(elapsed)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send, updates))
+    if handled is not None:
+        deadline = time.time() + 10
+        while len(handled) < len(updates) and time.time() < deadline:
+            time.sleep(0.01)
+    total = time.perf_counter() - started
+
+    print(f"Отправлено обновлений: {len(updates)} за {total:.2f} с -> {len(updates) / total:.0f} обновлений/с")
+    print(f"Ответы сервера: {statuses}")
+    print(f"Время ответа webhook, мс: p50={percentile(response_times, 0.5) * 1000:.2f} "
+          f"p99={percentile(response_times, 0.99) * 1000:.2f} среднее={statistics.mean(response_times) * 1000:.2f}")
+    if handled is not None:
+        latencies = [handled[mid] - sent_at[mid] for mid in handled if mid in sent_at]
+        print(f"Обработано обработчиком: {len(latencies)}/{len(updates)}")
+        if latencies:
+            print(f"Задержка до обработчика, мс: p50={percentile(latencies, 0.5) * 1000:.2f} "
+                  f"p99={percentile(latencies, 0.99) * 1000:.2f}")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
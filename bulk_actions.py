@@ -0,0 +1,107 @@
+# bulk_actions.py - Массовые действия модерации (бан, мут, разбан по списку ID)
+#
+# BulkExecutor выполняет одно и то же действие для списка пользователей в
+# нескольких потоках. Частоту запросов к Telegram ограничивает RateLimitedBot,
+# через который идут вызовы, поэтому потоки просто ждут своей очереди, а не
+# получают 429. По ходу работы вызывается on_progress(done, total), в конце
+# возвращается BulkResult с результатом по каждому ID.
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+_ID_SEPARATORS_RE = re.compile(r'[\s,;]+')
+_LEADING_IDS_RE = re.compile(r'(?:\d+(?:[\s,;]+|$))+')
+
+
+def parse_user_ids(text):
+    """
+    Разбирает список ID (через пробелы, запятые, точки с запятой или переводы строк).
+    Возвращает (ids, invalid): уникальные ID в исходном порядке и токены, которые не являются ID.
+    """
+    ids = []
+    seen = set()
+    invalid = []
+    for token in _ID_SEPARATORS_RE.split(text.strip()):
+        if not token:
+            continue
+        if not token.isdigit():
+            invalid.append(token)
+            continue
+        user_id = int(token)
+        if user_id not in seen:
+            seen.add(user_id)
+            ids.append(user_id)
+    return ids, invalid
+
+
+def split_leading_ids(text):
+    """
+    Отделяет список ID в начале строки от остального текста: "111,222 333 спам" -> ([111, 222, 333], "спам").
+    Используется командами вида /ban_ids ID... [причина].
+    """
+    text = text.strip()
+    match = _LEADING_IDS_RE.match(text)
+    if not match:
+        return [], text
+    ids, _ = parse_user_ids(match.group())
+    return ids, text[match.end():].strip()
+
+
+class BulkResult:
+    def __init__(self, action, total):
+        self.action = action
+        self.total = total
+        self.succeeded = []
+        self.failed = {} # user_id -> текст ошибки
+        self.elapsed = 0.0
+
+    def summary(self, max_errors=None):
+        """Итог для человека: сколько выполнено и ошибка по каждому неудачному ID (не больше max_errors строк)."""
+        lines = [f"{self.action}: выполнено {len(self.succeeded)} из {self.total}, ошибок {len(self.failed)} "
+                 f"({self.elapsed:.1f} с)."]
+        errors = list(self.failed.items())
+        if max_errors is not None and len(errors) > max_errors:
+            lines.extend(f"{user_id}: {error}" for user_id, error in errors[:max_errors])
+            lines.append(f"... и еще {len(errors) - max_errors} ошибок (подробности в логах).")
+        else:
+            lines.extend(f"{user_id}: {error}" for user_id, error in errors)
+        return "\n".join(lines)
+
+
+class BulkExecutor:
+    def __init__(self, workers=8, progress_interval=0.5):
+        self._workers = workers
+        self._progress_interval = progress_interval
+
+    def run(self, action, user_ids, func, on_progress=None):
+        """
+        Вызывает func(user_id) для каждого ID. Исключение считается ошибкой этого ID и не прерывает остальные.
+        on_progress(done, total) вызывается не чаще раза в progress_interval секунд и в конце.
+        """
+        result = BulkResult(action, len(user_ids))
+        started = time.monotonic()
+        last_progress = 0.0
+        with ThreadPoolExecutor(max_workers=max(1, min(self._workers, len(user_ids) or 1)), thread_name_prefix="bulk") as pool:
+            futures = {pool.submit(func, user_id): user_id for user_id in user_ids}
+            for done, future in enumerate(as_completed(futures), 1):
+                user_id = futures[future]
+                try:
+                    future.result()
+                    result.succeeded.append(user_id)
+                except Exception as e:
+                    logger.error(f"{action}: ошибка для пользователя {user_id}: {e}")
+                    result.failed[user_id] = str(e)
+                now = time.monotonic()
+                if on_progress and (now - last_progress >= self._progress_interval or done == len(user_ids)):
+                    last_progress = now
+                    try:
+                        on_progress(done, len(user_ids))
+                    except Exception as e:
+                        logger.warning(f"{action}: не удалось сообщить о ходе выполнения: {e}")
+        result.elapsed = time.monotonic() - started
+        logger.info(result.summary(max_errors=0))
+        return result
@@ -0,0 +1,102 @@
+# chat_config.py - Настройки модерации для каждого чата
+#
+# Общие значения берутся из config.py (CHAT_RULES, BAD_WORDS, AUTO_MUTE_*, FLOOD_*, NEAR_DUP_COPIES,
+# MODERATION_RULES, REGEX_TIME_BUDGET_MS), а в CHAT_SETTINGS для отдельного чата можно переопределить любые из них. Автомат
+# поиска плохих слов строится один раз на каждый уникальный список слов: чаты
+# без собственного списка используют общий. Правила модерации компилируются в
+# конвейер для каждого чата при загрузке (moderation_rules.py).
+
+import threading
+
+import text_normalizer
+from moderation_rules import RulePipeline, RuleStatsRegistry
+from word_filter import BadWordMatcher
+
+# Ключи, которые можно переопределить в CHAT_SETTINGS, и соответствующие общие настройки из config.py
+OVERRIDABLE_KEYS = {
+    'rules': 'CHAT_RULES',
+    'bad_words': 'BAD_WORDS',
+    'bad_words_match_mode': 'BAD_WORDS_MATCH_MODE',
+    'bad_words_normalize': 'BAD_WORDS_NORMALIZE',
+    'auto_mute_warn_count': 'AUTO_MUTE_WARN_COUNT',
+    'auto_mute_duration_minutes': 'AUTO_MUTE_DURATION_MINUTES',
+    'flood_max_messages': 'FLOOD_MAX_MESSAGES',
+    'flood_window_seconds': 'FLOOD_WINDOW_SECONDS',
+    'flood_max_duplicates': 'FLOOD_MAX_DUPLICATES',
+    'flood_duplicate_window_seconds': 'FLOOD_DUPLICATE_WINDOW_SECONDS',
+    'flood_mute_minutes': 'FLOOD_MUTE_MINUTES',
+    'near_dup_copies': 'NEAR_DUP_COPIES',
+    'moderation_rules': 'MODERATION_RULES',
+    'regex_time_budget_ms': 'REGEX_TIME_BUDGET_MS',
+}
+
+
+class ChatSettings:
+    """Итоговые настройки одного чата (общие значения + переопределения из CHAT_SETTINGS)."""
+
+    def __init__(self, chat_id, rules, bad_words, bad_words_match_mode, bad_words_normalize, auto_mute_warn_count, auto_mute_duration_minutes,
+                 flood_max_messages, flood_window_seconds, flood_max_duplicates, flood_duplicate_window_seconds, flood_mute_minutes,
+                 near_dup_copies, moderation_rules, regex_time_budget_ms, matcher, stats_registry):
+        self.chat_id = chat_id
+        self.rules = rules
+        self.bad_words = bad_words
+        self.bad_words_match_mode = bad_words_match_mode
+        self.bad_words_normalize = bad_words_normalize
+        self.auto_mute_warn_count = auto_mute_warn_count
+        self.auto_mute_duration_minutes = auto_mute_duration_minutes
+        self.flood_max_messages = flood_max_messages
+        self.flood_window_seconds = flood_window_seconds
+        self.flood_max_duplicates = flood_max_duplicates
+        self.flood_duplicate_window_seconds = flood_duplicate_window_seconds
+        self.flood_mute_minutes = flood_mute_minutes
+        self.near_dup_copies = near_dup_copies
+        self.moderation_rules = moderation_rules
+        self.regex_time_budget_ms = regex_time_budget_ms
+        self.bad_word_matcher = matcher
+        # Создается последним: проверкам нужны готовые bad_word_matcher и regex_time_budget_ms
+        self.rule_pipeline = RulePipeline(moderation_rules, self, stats_registry,
+                                          "MODERATION_RULES" if chat_id is None else f"CHAT_SETTINGS[{chat_id}]['moderation_rules']")
+
+
+class ChatConfigRegistry:
+    def __init__(self, config_module, stats_interval=60):
+        self._lock = threading.Lock()
+        self._settings = {}
+        self._default = None
+        self.rule_stats = RuleStatsRegistry(stats_interval) # Счетчики правил по имени, общие для всех чатов
+        self.load(config_module)
+
+    def load(self, config_module):
+        """Собирает настройки всех чатов из модуля config. Используется и для горячей перезагрузки."""
+        defaults = {key: getattr(config_module, name) for key, name in OVERRIDABLE_KEYS.items()}
+        overrides = getattr(config_module, 'CHAT_SETTINGS', {}) or {}
+        matchers = {}
+
+        def build(chat_id, values):
+            unknown = set(values) - set(OVERRIDABLE_KEYS)
+            if unknown:
+                raise ValueError(f"CHAT_SETTINGS[{chat_id}]: неизвестные ключи {', '.join(sorted(unknown))}")
+            merged = dict(defaults, **values)
+            matcher_key = (tuple(merged['bad_words']), merged['bad_words_match_mode'], bool(merged['bad_words_normalize']))
+            if matcher_key not in matchers:
+                normalize = text_normalizer.normalize if merged['bad_words_normalize'] else None
+                matchers[matcher_key] = BadWordMatcher(merged['bad_words'], merged['bad_words_match_mode'], normalize)
+            return ChatSettings(chat_id, matcher=matchers[matcher_key], stats_registry=self.rule_stats, **merged)
+
+        default = build(None, {})
+        settings = {int(chat_id): build(int(chat_id), values) for chat_id, values in overrides.items()}
+        with self._lock:
+            self._default = default
+            self._settings = settings
+        return len(matchers)
+
+    def get(self, chat_id):
+        """Настройки чата; для чатов без записи в CHAT_SETTINGS - общие настройки."""
+        return self._settings.get(chat_id, self._default)
+
+    @property
+    def default(self):
+        return self._default
+
+    def configured_chat_ids(self):
+        return list(self._settings)
@@ -1,61 +1,236 @@
-# config.py
-
-# !!! ВАЖНО: ЭТО ТВОЙ API-ТОКЕН. НИКОГДА НЕ ДЕЛИСЬ ИМ И НЕ ПУБЛИКУЙ В ОТКРЫТЫХ ИСТОЧНИКАХ !!!
-# Получи его у @BotFather после команды /newbot
-TOKEN = '8032387625:AAHBLYvH1JOfF5ups0zFMppgX7RwJClCJgg'
-# !!! ВАЖНО: ЭТО ID ТВОЕЙ ОСНОВНОЙ БЕСЕДЫ "Универ" !!!
-# Получи его через @userinfobot (добавь бота в свою группу и спроси у него ID).
-# ID групп всегда начинаются с -100
-MAIN_CHAT_ID = -1002751635626
-
-
-# --- Правила для чата (текст, который будет отправлен по команде /rules) ---
-CHAT_RULES = """
-<b>📜 Правила чата:</b>
-Добро пожаловать!
-
-<b>Общие положения:</b>
-* Уважение: Относитесь ко всем участникам с уважением, независимо от их взглядов, статуса или мнения.
-* Конструктивность: Общайтесь позитивно и конструктивно, избегая конфликтов, троллинга и провокаций.
-
-<b>Запрещенные действия:</b>
-* Спам и Флуд: Не отправляйте нежелательную рекламу, повторяющиеся сообщения, бессмысленные наборы символов или чрезмерное количество
-* Ненормативная лексика: Запрещено использование нецензурных выражений.
-* Дискриминация: Любые формы дискриминации, включая расизм, сексизм, эйблизм, гомофобию, трансфобию, ксенофобию и т.п., строго запрещены.
-* Оскорбления и угрозы: Запрещены личные оскорбления, унижения, угрозы или преследования участников чата.
-* Политика и религия: Избегайте обсуждения политических и религиозных тем, если это не соответствует основной тематике чата.
-* Реклама: Запрещена несанкционированная реклама любых товаров, услуг или ресурсов.
-* Распространение ложной информации: Не делитесь фейками или непроверенной информацией, особенно если это может нанести вред другим.
-
-<b>Рекомендации:</b>
-* Помощь: Если вы видите нарушение правил, используйте функцию репорта или обратитесь к администраторам.
-* Вопросы к админам: По личным вопросам или предложениям к администрации используйте личные сообщения или соответствующий раздел в админ-чате (если у вас есть доступ и ранг).
-
-<b>Санкции за нарушения:</b>
-Администрация оставляет за собой право применять меры к нарушителям правил, включая:
-* Предупреждение (<code>/warn</code>)
-* Временное отключение звука (<code>/mute</code>)
-* Бан (<code>/ban_id</code>)
-Строгость наказания зависит от серьезности нарушения и повторных проступков.
-"""
-
-# --- Список плохих слов для модерации (можно расширить) ---
-# Все слова должны быть в нижнем регистре. Бот будет проверять на точное вхождение этих слов.
-BAD_WORDS = ["редискаа", "дурак22", "авававава", "мата1", "мата2"] # <<< ДОБАВЬ СВОИ "ПЛОХИЕ" СЛОВА СЮДА
-
-# Список ID пользователей-админов, которым разрешены админские команды
-# и куда будут приходить репорты.
-# Чтобы узнать свой ID, напиши @userinfobot в Telegram.
-ADMIN_USER_IDS = [910738604] # <<< ВСТАВЬ СВОЙ ID ИЛИ ID ДРУГИХ АДМИНОВ. Например: [123456789, 987654321]
-
-# Настройки для автоматического мута
-AUTO_MUTE_WARN_COUNT = 3  # Количество предупреждений, после которого следует автоматический мут
-AUTO_MUTE_DURATION_MINUTES = 60 # Длительность автоматического мута в минутах
-
-# Файл для сохранения данных о предупреждениях и мутах
-DATA_FILE = 'bot_data.json'
-
-# --- Настройки для GUI ---
-# Отправлять ли подтверждающие сообщения в основной чат Telegram при действиях через GUI.
-# Установите False, если не хотите, чтобы бот сообщал в чат о банах/мутах, сделанных через GUI.
+# config.py
+
+# !!! ВАЖНО: ЭТО ТВОЙ API-ТОКЕН. НИКОГДА НЕ ДЕЛИСЬ ИМ И НЕ ПУБЛИКУЙ В ОТКРЫТЫХ ИСТОЧНИКАХ !!!
+# Получи его у @BotFather после команды /newbot
+TOKEN = '8032387625:AAHBLYvH1JOfF5ups0zFMppgX7RwJClCJgg'
+# !!! ВАЖНО: ЭТО ID ТВОЕЙ ОСНОВНОЙ БЕСЕДЫ "Универ" !!!
+# Получи его через @userinfobot (добавь бота в свою группу и спроси у него ID).
+# ID групп всегда начинаются с -100
+MAIN_CHAT_ID = -1002751635626
+
+
+# --- Правила для чата (текст, который будет отправлен по команде /rules) ---
+CHAT_RULES = """
+<b>📜 Правила чата:</b>
+Добро пожаловать!
+
+<b>Общие положения:</b>
+* Уважение: Относитесь ко всем участникам с уважением, независимо от их взглядов, статуса или мнения.
+* Конструктивность: Общайтесь позитивно и конструктивно, избегая конфликтов, троллинга и провокаций.
+
+<b>Запрещенные действия:</b>
+* Спам и Флуд: Не отправляйте нежелательную рекламу, повторяющиеся сообщения, бессмысленные наборы символов или чрезмерное количество
+* Ненормативная лексика: Запрещено использование нецензурных выражений.
+* Дискриминация: Любые формы дискриминации, включая расизм, сексизм, эйблизм, гомофобию, трансфобию, ксенофобию и т.п., строго запрещены.
+* Оскорбления и угрозы: Запрещены личные оскорбления, унижения, угрозы или преследования участников чата.
+* Политика и религия: Избегайте обсуждения политических и религиозных тем, если это не соответствует основной тематике чата.
+* Реклама: Запрещена несанкционированная реклама любых товаров, услуг или ресурсов.
+* Распространение ложной информации: Не делитесь фейками или непроверенной информацией, особенно если это может нанести вред другим.
+
+<b>Рекомендации:</b>
+* Помощь: Если вы видите нарушение правил, используйте функцию репорта или обратитесь к администраторам.
+* Вопросы к админам: По личным вопросам или предложениям к администрации используйте личные сообщения или соответствующий раздел в админ-чате (если у вас есть доступ и ранг).
+
+<b>Санкции за нарушения:</b>
+Администрация оставляет за собой право применять меры к нарушителям правил, включая:
+* Предупреждение (<code>/warn</code>)
+* Временное отключение звука (<code>/mute</code>)
+* Бан (<code>/ban_id</code>)
+Строгость наказания зависит от серьезности нарушения и повторных проступков.
+"""
+
+# --- Список плохих слов для модерации (можно расширить) ---
+# Все слова должны быть в нижнем регистре. Бот будет проверять на точное вхождение этих слов.
+BAD_WORDS = ["редискаа", "дурак22", "авававава", "мата1", "мата2"] # <<< ДОБАВЬ СВОИ "ПЛОХИЕ" СЛОВА СЮДА
+# Режим поиска плохих слов:
+# 'substring'  - слово ищется как подстрока (например, "мата1" найдется и в "мата123")
+# 'whole_word' - слово должно стоять отдельно (по краям пробелы, знаки препинания или начало/конец текста)
+BAD_WORDS_MATCH_MODE = 'substring'
+# Нормализация перед поиском: ловит обходы фильтра вроде "ДУРАК", "дурaк" (латинская a), "д у р а к", "д.у.р.а.к",
+# "ду*рак", "рассссылка" (повторы букв от трех сокращаются до двух) и невидимые символы внутри слова. Слова из списка нормализуются так же.
+# False - сравнивать как раньше, только без учета регистра.
+BAD_WORDS_NORMALIZE = True
+
+# --- Правила модерации сообщений ---
+# Каждое правило: если проверка 'match' срабатывает 'count' раз за 'window_seconds' секунд у одного пользователя
+# (по умолчанию - 1 раз), выполняются действия 'actions' по порядку:
+#   'delete' - удалить сообщение, 'notify' - уведомление в чат (текст 'notice', {user} - ссылка на автора;
+#   при наплыве - одна сводка 'notice_summary'), 'warn' - предупреждение с таким же уведомлением и счетчиком
+#   предупреждений (авто-мут по AUTO_MUTE_*), 'mute' - мут на 'mute_minutes' минут, 'ban' - бан. 'reason' - причина для журнала и мута.
+# Проверки ('match'):
+#   'links'     - в сообщении есть ссылка;         'mentions' - есть упоминание пользователя;
+#   'length'    - длиннее 'max_length' символов;    'caps'     - заглавными: 'ratio' букв из не меньше 'min_length';
+#   'bad_words' - плохие слова чата (BAD_WORDS);    'regex'    - регулярное выражение 'pattern' или несколько
+#   выражений 'patterns' (словарь имя -> выражение); с google-re2 все выражения правила проверяются за один проход.
+# Правила проверяются от дешевых проверок к дорогим (в порядке списка выше; при равной стоимости - в порядке
+# MODERATION_RULES), срабатывает первое. Число проверок и время каждого правила пишутся в лог
+# раз в DISPATCHER_STATS_INTERVAL секунд. Антифлуд и рейды (ниже) проверяются до правил.
+# Для 'regex' в лог пишутся и срабатывания каждого выражения. Правила 'regex' требуют google-re2 (pip install google-re2)
+# или regex (pip install regex): без них настройки не загружаются, потому что поиск стандартного re нельзя прервать,
+# а выражение вроде (a|aa)+$ на длинном сообщении практически не завершается. Поиск прекращается через
+# REGEX_TIME_BUDGET_MS мс на сообщение (для правила - 'time_budget_ms'): уже найденные совпадения учитываются,
+# а сообщение не задерживает очередь.
+REGEX_TIME_BUDGET_MS = 20
+MODERATION_RULES = [
+    {'name': 'bad_words', 'match': 'bad_words', 'actions': ['delete', 'notify'], 'reason': "Плохие слова",
+     'notice': "{user}, ваше сообщение удалено за нарушение правил (обнаружено запрещенное слово).",
+     'notice_summary': "Удалено сообщений за нарушение правил (запрещенные слова): {count}. Нарушители: {items}."},
+    # {'name': 'links', 'match': 'links', 'count': 3, 'window_seconds': 600, 'actions': ['delete', 'warn']},
+    # {'name': 'caps', 'match': 'caps', 'min_length': 20, 'ratio': 0.8, 'actions': ['delete', 'notify']},
+    # {'name': 'casino', 'match': 'regex', 'pattern': r'казино|ставк[иа] на спорт', 'count': 2, 'window_seconds': 3600,
+    #  'actions': ['delete', 'mute'], 'mute_minutes': 120, 'reason': "Реклама казино"},
+    # {'name': 'scam', 'match': 'regex', 'actions': ['delete', 'warn'], 'reason': "Спам и мошенничество", 'patterns': {
+    #     'invite': r'(?:t\.me|telegram\.me)/(?:\+|joinchat/)[\w-]{10,}',
+    #     'link': r'\b(?:https?://|www\.)\S+',
+    #     'phone': r'(?:\+7|\b8)[\s(-]*9\d{2}[\s)-]*\d{3}[\s-]*\d{2}[\s-]*\d{2}\b',
+    #     'crypto': r'(?:удво|умнож|x[2-9]).{0,30}(?:usdt|btc|крипт)|(?:usdt|btc)\W{0,3}(?:раздач|airdrop)',
+    # }},
+]
+
+# --- Настройки для отдельных чатов ---
+# Бот может модерировать несколько групп. Для каждой группы можно переопределить любые из настроек:
+# 'rules' (вместо CHAT_RULES), 'bad_words' (вместо BAD_WORDS), 'bad_words_match_mode' (вместо BAD_WORDS_MATCH_MODE),
+# 'bad_words_normalize' (вместо BAD_WORDS_NORMALIZE),
+# 'auto_mute_warn_count' (вместо AUTO_MUTE_WARN_COUNT), 'auto_mute_duration_minutes' (вместо AUTO_MUTE_DURATION_MINUTES),
+# 'flood_max_messages', 'flood_window_seconds', 'flood_max_duplicates', 'flood_duplicate_window_seconds',
+# 'flood_mute_minutes' (вместо соответствующих FLOOD_*), 'near_dup_copies' (вместо NEAR_DUP_COPIES),
+# 'moderation_rules' (вместо MODERATION_RULES), 'regex_time_budget_ms' (вместо REGEX_TIME_BUDGET_MS).
+# Чаты, которых здесь нет, используют общие настройки. Пример:
+# CHAT_SETTINGS = {
+#     -1001234567890: {
+#         'bad_words': ["спам", "реклама"],
+#         'auto_mute_warn_count': 2,
+#         'auto_mute_duration_minutes': 30,
+#     },
+# }
+CHAT_SETTINGS = {}
+
+# Список ID пользователей-админов, которым разрешены админские команды
+# и куда будут приходить репорты.
+# Чтобы узнать свой ID, напиши @userinfobot в Telegram.
+ADMIN_USER_IDS = [910738604] # <<< ВСТАВЬ СВОЙ ID ИЛИ ID ДРУГИХ АДМИНОВ. Например: [123456789, 987654321]
+
+# Настройки для автоматического мута
+AUTO_MUTE_WARN_COUNT = 3  # Количество предупреждений, после которого следует автоматический мут
+AUTO_MUTE_DURATION_MINUTES = 60 # Длительность автоматического мута в минутах
+
+# --- Антифлуд ---
+# Пользователь, написавший FLOOD_MAX_MESSAGES сообщений за FLOOD_WINDOW_SECONDS секунд или один и тот же текст
+# FLOOD_MAX_DUPLICATES раз за FLOOD_DUPLICATE_WINDOW_SECONDS секунд, автоматически мутится на FLOOD_MUTE_MINUTES минут.
+# 0 в FLOOD_MAX_MESSAGES или FLOOD_MAX_DUPLICATES отключает соответствующую проверку. Админов проверка не касается.
+# Окна должны быть не длиннее 10 минут: счетчики пользователей, молчащих дольше, удаляются из памяти.
+FLOOD_MAX_MESSAGES = 7
+FLOOD_WINDOW_SECONDS = 10
+FLOOD_MAX_DUPLICATES = 3
+FLOOD_DUPLICATE_WINDOW_SECONDS = 60
+FLOOD_MUTE_MINUTES = 30
+FLOOD_TRACKED_USERS = 50000 # Сколько пользователей (во всех чатах) отслеживать одновременно
+
+# --- Рейды: одинаковые и почти одинаковые сообщения от разных аккаунтов ---
+# Когда в чате за NEAR_DUP_WINDOW_SECONDS секунд набирается NEAR_DUP_COPIES копий одного текста (в том числе слегка
+# измененного: другие эмодзи, номера, пара букв), все копии удаляются, а их авторы получают предупреждение.
+# 0 в NEAR_DUP_COPIES отключает проверку. Сообщения короче NEAR_DUP_MIN_LENGTH символов ("всем привет!", "+1") не учитываются.
+NEAR_DUP_COPIES = 5
+NEAR_DUP_WINDOW_SECONDS = 600
+NEAR_DUP_MIN_LENGTH = 30
+NEAR_DUP_MAX_MESSAGES = 50000 # Сколько последних сообщений (во всех чатах) держать в индексе
+
+# База данных SQLite с предупреждениями и мутами
+DB_FILE = 'bot_data.sqlite3'
+# Старый файл данных (JSON + журнал DATA_FILE + '.journal'). При первом запуске его содержимое
+# один раз переносится в DB_FILE, а сами файлы переименовываются в *.migrated.
+DATA_FILE = 'bot_data.json'
+
+# --- Получение обновлений от Telegram ---
+# 'polling' - бот сам опрашивает Telegram (bot.polling), ничего настраивать не нужно.
+# 'webhook' - Telegram сам присылает обновления на встроенный HTTP-сервер бота. Обновления приходят сразу,
+#             без пауз между циклами опроса, но нужен публичный HTTPS-адрес (например, nginx перед ботом).
+UPDATE_MODE = 'polling'
+WEBHOOK_URL = ''                 # Публичный HTTPS-адрес, который получит Telegram, например 'https://bot.example.com/telegram-webhook'
+WEBHOOK_LISTEN = '127.0.0.1'     # Адрес, на котором слушает встроенный сервер (за обратным прокси)
+WEBHOOK_PORT = 8443              # Порт встроенного сервера
+WEBHOOK_PATH = '/telegram-webhook' # Путь, на который прокси пересылает запросы Telegram
+# Секрет, который Telegram присылает в заголовке X-Telegram-Bot-Api-Secret-Token (символы A-Z, a-z, 0-9, _ и -).
+# Если оставить пустым, при каждом запуске будет сгенерирован случайный.
+WEBHOOK_SECRET_TOKEN = ''
+
+# --- Обработка обновлений ---
+# Движок бота:
+# 'threads' - синхронный TeleBot, отдельные потоки для приема обновлений, команд GUI и мутов.
+# 'asyncio' - AsyncTeleBot (async_main.py): все задачи в одном цикле событий и общий пул соединений к Bot API.
+#             Требует пакет aiohttp и поддерживает только UPDATE_MODE = 'polling'.
+RUNTIME = 'threads'
+ASYNC_MAX_CONNECTIONS = 50       # Размер общего пула соединений aiohttp для asyncio-движка
+# Потоки asyncio-движка для синхронной работы вне цикла событий: хранилище SQLite, антифлуд, отпечатки рейдов,
+# и правила модерации (в том числе регулярные выражения)
+ASYNC_WORKER_THREADS = 4
+# Количество рабочих потоков, по которым распределяются обновления. Сообщения одного чата всегда
+# обрабатываются одним потоком по порядку, поэтому медленный запрос к Telegram не задерживает другие чаты.
+# 0 - отключить диспетчер (обновления обрабатывает встроенный пул потоков TeleBot).
+DISPATCHER_WORKERS = 4
+DISPATCHER_QUEUE_SIZE = 1000     # Максимум ожидающих обновлений на поток; при переполнении прием обновлений притормаживается
+DISPATCHER_STATS_INTERVAL = 60   # Как часто (в секундах) писать в лог метрики очередей. 0 - не писать
+
+# --- Ограничение частоты запросов к Telegram ---
+# Telegram разрешает боту около 30 сообщений в секунду всего и около 20 сообщений в минуту в одну группу.
+# Запросы сверх лимита не теряются, а немного ждут своей очереди.
+RATE_LIMIT_GLOBAL_PER_SECOND = 30  # Все запросы бота (сообщения, удаления, муты, баны)
+RATE_LIMIT_CHAT_PER_MINUTE = 20    # Сообщения бота в один чат
+RATE_LIMIT_CHAT_BURST = 5          # Сколько сообщений в чат можно отправить подряд без ожидания
+RATE_LIMIT_MAX_RETRIES = 3         # Сколько раз повторять запрос после ответа 429 (с ожиданием retry_after)
+# Однотипные уведомления (например, "ваше сообщение удалено") в один чат за это окно объединяются в одну сводку.
+# 0 - отправлять каждое уведомление сразу.
+NOTICE_COALESCE_WINDOW_SECONDS = 3
+# Сообщения с нарушениями копятся в течение этого окна и удаляются одним запросом deleteMessages (до 100 за раз).
+# 0 - удалять каждое сообщение сразу отдельным запросом.
+DELETE_BATCH_WINDOW_SECONDS = 0.5
+
+# --- Настройки логирования ---
+# Записи лога пишутся в файл и консоль отдельным потоком через очередь такого размера.
+# Если очередь заполнена (например, диск не успевает), лишние записи отбрасываются, а их число пишется в лог.
+LOG_QUEUE_SIZE = 10000
+# Уровень, на котором логируется текст каждого сообщения (логгер "messages").
+# "DEBUG" - не писать тексты сообщений в лог (общий уровень лога - INFO), "INFO" - писать.
+MESSAGE_LOG_LEVEL = "INFO"
+# Доля сообщений, текст которых попадает в лог: 1.0 - все, 0.1 - примерно каждое десятое.
+MESSAGE_LOG_SAMPLE_RATE = 1.0
+
+# --- Журнал событий ---
+# Сообщения, удаления, предупреждения, муты, баны и команды GUI пишутся в JSONL-файлы
+# bot_events.000001.jsonl, ... с индексом bot_events.index.db для быстрого поиска по пользователю и времени.
+# Поиск из командной строки: python event_log.py --user 123456789 --days 7
+EVENT_LOG_FILE = "bot_events.jsonl"
+EVENT_LOG_SEGMENT_MB = 20       # Размер одного файла-сегмента, МБ
+EVENT_LOG_KEEP_SEGMENTS = 0     # Сколько последних сегментов хранить (0 - все)
+EVENT_LOG_MESSAGES = True       # Записывать ли в журнал каждое сообщение (с текстом)
+
+# --- Массовые действия ---
+# Сколько запросов к Telegram выполняется одновременно при массовом бане/муте/разбане
+# (GUI "Массовые действия" и команда /ban_ids). Общую частоту все равно ограничивает RATE_LIMIT_GLOBAL_PER_SECOND.
+BULK_ACTION_WORKERS = 8
+
+# --- Кэш username -> ID ---
+# Бот запоминает username и ID всех пользователей, которых видит, чтобы команды вида /ban_id @username работали без поиска ID.
+USERNAME_CACHE_SIZE = 100000    # Сколько пар держать в памяти (самые давно не встречавшиеся вытесняются)
+USERNAME_CACHE_TTL_DAYS = 30    # Через сколько дней без сообщений пользователя запись считается устаревшей
+
+# --- Метрики ---
+# Счетчики и задержки обработчиков, запросов к Bot API, записи в хранилище и команд GUI.
+# При METRICS_ENABLED = True бот отдает их на http://METRICS_HOST:METRICS_PORT/metrics (формат Prometheus)
+# и /metrics.json (кнопка "Метрики" в GUI). Выключенные метрики почти не тратят время.
+METRICS_ENABLED = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# --- Запись обновлений для воспроизведения ---
+# При RECORD_UPDATES = True все входящие обновления пишутся в сжатые файлы RECORD_UPDATES_DIR/updates.000001.jsonl.gz, ...
+# Воспроизвести запись (например, рейд) через обработчики бота без Telegram:
+#   python benchmarks/replay_updates.py recorded_updates --speed 10
+RECORD_UPDATES = False
+RECORD_UPDATES_DIR = "recorded_updates"
+RECORD_SEGMENT_MB = 50          # Несжатых данных в одном файле, МБ
+
+# --- Настройки для GUI ---
+# Отправлять ли подтверждающие сообщения в основной чат Telegram при действиях через GUI.
+# Установите False, если не хотите, чтобы бот сообщал в чат о банах/мутах, сделанных через GUI.
 SEND_GUI_CONFIRMATIONS_TO_CHAT = False # <<< ИЗМЕНИТЕ НА True, ЕСЛИ ХОТИТЕ ВИДЕТЬ СООБЩЕНИЯ В ЧАТЕ
\ No newline at end of file
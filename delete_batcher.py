@@ -0,0 +1,199 @@
+# delete_batcher.py - Пакетное удаление сообщений
+#
+# Во время рейда каждое удаление было отдельным HTTP-запросом. DeletionBatcher
+# копит id удаляемых сообщений каждого чата в течение короткого окна и удаляет
+# их одним вызовом Bot API deleteMessages (до 100 сообщений за раз). Если метод
+# недоступен (старая версия pyTelegramBotAPI) или вернул ошибку, сообщения
+# удаляются по одному через delete_message.
+#
+# AsyncDeletionBatcher - то же для asyncio-движка: пачки копятся так же, а
+# отправляются задачами цикла событий по его таймеру.
+
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 100 # Ограничение Bot API для deleteMessages
+
+
+class DeletionBatcher:
+    def __init__(self, bot, window=0.5, stats_interval=60):
+        self._bot = bot
+        self._window = window
+        self._lock = threading.Lock()
+        self._pending = {} # chat_id -> [message_id, ...]
+        # Метрики
+        self.requested = 0     # Сколько сообщений поставлено на удаление
+        self.deleted = 0       # Сколько удалено успешно
+        self.failed = 0
+        self.api_calls = 0     # Сколько запросов к API на это ушло
+        self.fallbacks = 0     # Сколько раз пришлось удалять по одному
+        self._stats_reset_at = time.monotonic()
+        self._deleted_since_reset = 0
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="delete-batcher-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def delete(self, chat_id, message_id):
+        """Ставит сообщение в очередь на удаление. Удаление произойдет не позже чем через window секунд."""
+        ready, new_batch = self._add(chat_id, message_id)
+        if new_batch is not None:
+            timer = threading.Timer(self._window, self._flush, args=(chat_id, new_batch))
+            timer.daemon = True
+            timer.start()
+        if ready is not None:
+            self._delete_batch(chat_id, ready)
+
+    def _add(self, chat_id, message_id):
+        """
+        Добавляет сообщение в пачку чата. Возвращает (пачка, которую пора удалить, или None;
+        только что начатая пачка, для которой нужен таймер, или None).
+        """
+        with self._lock:
+            self.requested += 1
+            if not self._window:
+                return [message_id], None
+            new_batch = None
+            batch = self._pending.get(chat_id)
+            if batch is None:
+                batch = new_batch = self._pending[chat_id] = []
+            batch.append(message_id)
+            if len(batch) >= MAX_BATCH_SIZE:
+                self._pending.pop(chat_id)
+                return batch, new_batch
+            return None, new_batch
+
+    def _take(self, chat_id, batch):
+        # Таймер относится к своей пачке: если она уже отправлена по размеру или flush_all,
+        # следующая пачка этого чата остается ждать своего таймера
+        with self._lock:
+            if self._pending.get(chat_id) is not batch:
+                return False
+            del self._pending[chat_id]
+            return True
+
+    def _take_all(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _flush(self, chat_id, batch):
+        if self._take(chat_id, batch):
+            self._delete_batch(chat_id, batch)
+
+    def flush_all(self):
+        """Немедленно удаляет все накопленные сообщения (например, при остановке бота)."""
+        for chat_id, batch in self._take_all().items():
+            self._delete_batch(chat_id, batch)
+
+    def _delete_batch(self, chat_id, message_ids):
+        if len(message_ids) > 1:
+            try:
+                self._bot.delete_messages(chat_id, message_ids)
+                self._record(len(message_ids), 0, 1)
+                logger.info(f"Удалено сообщений одним запросом в чате {chat_id}: {len(message_ids)}")
+                return
+            except AttributeError:
+                pass # В этой версии pyTelegramBotAPI нет deleteMessages
+            except Exception as e:
+                logger.warning(f"deleteMessages в чате {chat_id} не удался ({e}), удаляю сообщения по одному.")
+            with self._lock:
+                self.fallbacks += 1
+        deleted = failed = 0
+        for message_id in message_ids:
+            try:
+                self._bot.delete_message(chat_id, message_id)
+                deleted += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Не удалось удалить сообщение {message_id} в чате {chat_id}: {e}. Возможно, у бота нет прав администратора.")
+        self._record(deleted, failed, len(message_ids))
+
+    def _record(self, deleted, failed, api_calls):
+        with self._lock:
+            self.deleted += deleted
+            self.failed += failed
+            self.api_calls += api_calls
+            self._deleted_since_reset += deleted
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._stats_reset_at
+            return {
+                "requested": self.requested,
+                "deleted": self.deleted,
+                "failed": self.failed,
+                "api_calls": self.api_calls,
+                "fallbacks": self.fallbacks,
+                "pending": sum(len(batch) for batch in self._pending.values()),
+                "deletions_per_second": self._deleted_since_reset / elapsed if elapsed > 0 else 0.0,
+                "messages_per_call": self.deleted / self.api_calls if self.api_calls else 0.0,
+            }
+
+    def _stats_reporter(self, interval):
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            with self._lock:
+                self._stats_reset_at = time.monotonic()
+                self._deleted_since_reset = 0
+            if stats["deletions_per_second"]:
+                logger.info(f"Удаление сообщений: {stats['deletions_per_second']:.1f} удалений/с, "
+                            f"всего {stats['deleted']} за {stats['api_calls']} запросов "
+                            f"({stats['messages_per_call']:.1f} сообщ./запрос), ошибок {stats['failed']}")
+
+
+class AsyncDeletionBatcher(DeletionBatcher):
+    """DeletionBatcher для asyncio-движка: bot - AsyncRateLimitedBot, пачки удаляются по таймеру цикла событий."""
+
+    def __init__(self, bot, window=0.5, stats_interval=60):
+        super().__init__(bot, window, stats_interval)
+        self._tasks = set() # Удаления по таймеру (ссылки держим, чтобы задачи не собрал сборщик мусора)
+
+    async def delete(self, chat_id, message_id):
+        """Ставит сообщение в очередь на удаление. Удаление произойдет не позже чем через window секунд."""
+        ready, new_batch = self._add(chat_id, message_id)
+        if new_batch is not None:
+            asyncio.get_running_loop().call_later(self._window, self._start_flush, chat_id, new_batch)
+        if ready is not None:
+            await self._delete_batch(chat_id, ready)
+
+    def _start_flush(self, chat_id, batch):
+        if self._take(chat_id, batch):
+            task = asyncio.ensure_future(self._delete_batch(chat_id, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush_all(self):
+        """Немедленно удаляет все накопленные сообщения и дожидается уже начатых удалений."""
+        for chat_id, batch in self._take_all().items():
+            await self._delete_batch(chat_id, batch)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _delete_batch(self, chat_id, message_ids):
+        if len(message_ids) > 1:
+            try:
+                await self._bot.delete_messages(chat_id, message_ids)
+                self._record(len(message_ids), 0, 1)
+                logger.info(f"Удалено сообщений одним запросом в чате {chat_id}: {len(message_ids)}")
+                return
+            except AttributeError:
+                pass # В этой версии pyTelegramBotAPI нет deleteMessages
+            except Exception as e:
+                logger.warning(f"deleteMessages в чате {chat_id} не удался ({e}), удаляю сообщения по одному.")
+            with self._lock:
+                self.fallbacks += 1
+        deleted = failed = 0
+        for message_id in message_ids:
+            try:
+                await self._bot.delete_message(chat_id, message_id)
+                deleted += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"Не удалось удалить сообщение {message_id} в чате {chat_id}: {e}. Возможно, у бота нет прав администратора.")
+        self._record(deleted, failed, len(message_ids))
@@ -0,0 +1,141 @@
+# dispatcher.py - Распределение обновлений по пулу рабочих потоков
+#
+# Обновления раскладываются по ограниченным очередям рабочих потоков по хешу chat_id:
+# сообщения одного чата всегда обрабатываются одним потоком и по порядку, а медленный
+# запрос к API Telegram в одном чате не задерживает остальные чаты. Если очереди
+# переполнены, поток получения обновлений (polling/webhook) ждет - это и есть
+# обратное давление: новые обновления остаются на стороне Telegram.
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def update_chat_id(update):
+    """chat_id обновления (или id пользователя, если чата нет) - ключ для выбора рабочего потока."""
+    for field in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        message = getattr(update, field, None)
+        if message is not None:
+            return message.chat.id
+    for field in ('my_chat_member', 'chat_member', 'chat_join_request'):
+        event = getattr(update, field, None)
+        if event is not None:
+            return event.chat.id
+    callback_query = getattr(update, 'callback_query', None)
+    if callback_query is not None:
+        if callback_query.message is not None:
+            return callback_query.message.chat.id
+        return callback_query.from_user.id
+    return 0
+
+
+class UpdateDispatcher:
+    def __init__(self, process_updates, workers=4, queue_size=1000, stats_interval=60):
+        """process_updates - исходный bot.process_new_updates (бот должен быть создан с threaded=False)."""
+        self._process_updates = process_updates
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._stats_interval = stats_interval
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        # Метрики обратного давления
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.blocked_submits = 0     # Сколько раз поток получения обновлений ждал свободного места
+        self.blocked_time = 0.0      # Сколько времени он ждал в сумме
+        self.wait_time_total = 0.0   # Суммарное время ожидания обновлений в очередях
+        self.wait_time_max = 0.0
+        self.max_queue_depth = 0
+
+    def submit(self, updates):
+        """Замена bot.process_new_updates: раскладывает обновления по очередям рабочих потоков."""
+        for update in updates:
+            worker_queue = self._queues[hash(update_chat_id(update)) % len(self._queues)]
+            item = (time.monotonic(), update)
+            try:
+                worker_queue.put_nowait(item)
+            except queue.Full:
+                started = time.monotonic()
+                worker_queue.put(item) # Ждем, пока рабочий поток освободит место
+                with self._lock:
+                    self.blocked_submits += 1
+                    self.blocked_time += time.monotonic() - started
+            depth = worker_queue.qsize()
+            with self._lock:
+                self.submitted += 1
+                if depth > self.max_queue_depth:
+                    self.max_queue_depth = depth
+
+    def _worker(self, worker_queue):
+        while True:
+            item = worker_queue.get()
+            if item is _STOP:
+                return
+            enqueued_at, update = item
+            wait_time = time.monotonic() - enqueued_at
+            try:
+                self._process_updates([update])
+                failed = 0
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновления {update.update_id}: {e}", exc_info=True)
+                failed = 1
+            with self._lock:
+                self.processed += 1
+                self.failed += failed
+                self.wait_time_total += wait_time
+                if wait_time > self.wait_time_max:
+                    self.wait_time_max = wait_time
+
+    def stats(self):
+        """Снимок метрик: глубина очередей, время ожидания, ожидание потока получения обновлений."""
+        depths = [q.qsize() for q in self._queues]
+        with self._lock:
+            return {
+                "workers": len(self._queues),
+                "queue_depth": sum(depths),
+                "queue_depths": depths,
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "failed": self.failed,
+                "avg_wait_ms": self.wait_time_total / self.processed * 1000 if self.processed else 0.0,
+                "max_wait_ms": self.wait_time_max * 1000,
+                "blocked_submits": self.blocked_submits,
+                "blocked_time_s": self.blocked_time,
+            }
+
+    def _stats_reporter(self):
+        while not self._stopped.wait(self._stats_interval):
+            stats = self.stats()
+            if stats["submitted"]:
+                logger.info(f"Диспетчер: в очередях {stats['queue_depth']} (макс. {stats['max_queue_depth']}), "
+                            f"обработано {stats['processed']}, ошибок {stats['failed']}, "
+                            f"ожидание ср. {stats['avg_wait_ms']:.1f} мс / макс. {stats['max_wait_ms']:.1f} мс, "
+                            f"ожиданий места в очереди {stats['blocked_submits']} ({stats['blocked_time_s']:.1f} с)")
+
+    def start(self):
+        for index, worker_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._worker, args=(worker_queue,), name=f"update-worker-{index}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        if self._stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, name="dispatcher-stats")
+            reporter.daemon = True
+            reporter.start()
+        logger.info(f"Диспетчер обновлений запущен: {len(self._queues)} рабочих потоков.")
+
+    def stop(self, timeout=5):
+        """Дообрабатывает уже принятые обновления и останавливает рабочие потоки."""
+        self._stopped.set()
+        for worker_queue in self._queues:
+            worker_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
@@ -0,0 +1,314 @@
+# event_log.py - Структурированный журнал событий модерации
+#
+# Сообщения, удаления, предупреждения, муты, баны и команды GUI пишутся по одному
+# JSON-объекту на строку в файлы-сегменты bot_events.000001.jsonl, ... Рядом лежит
+# индекс на SQLite: для каждого события - время, чат, пользователь, тип и позиция
+# строки в сегменте. Запрос "все действия против пользователя X за неделю" идет по
+# индексу (user_id, ts) и читает с диска только найденные строки.
+#
+# Запись выполняет отдельный поток: обработчики обновлений только кладут событие
+# в ограниченную очередь (при переполнении событие отбрасывается и учитывается).
+#
+# Запросы из командной строки:
+#   python event_log.py --user 123456789 --days 7
+#   python event_log.py --chat -1001234567890 --type mute --type ban --since 2025-01-01
+
+import argparse
+import datetime
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Типы событий
+MESSAGE = 'message'
+DELETE = 'delete'
+WARN = 'warn'
+MUTE = 'mute'
+UNMUTE = 'unmute'
+BAN = 'ban'
+UNBAN = 'unban'
+GUI_COMMAND = 'gui_command'
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts      REAL NOT NULL,
+    type    TEXT NOT NULL,
+    chat_id INTEGER,
+    user_id INTEGER,
+    segment INTEGER NOT NULL,
+    offset  INTEGER NOT NULL,
+    length  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_user_ts ON events(user_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_chat_ts ON events(chat_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events(ts);
+"""
+
+WRITE_BATCH_SIZE = 500 # Сколько событий поток записи забирает из очереди за один раз
+
+
+def _segment_path(base_path, segment):
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{segment:06d}{ext}"
+
+
+def _list_segments(base_path):
+    root, ext = os.path.splitext(base_path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r'\.(\d{6})' + re.escape(ext) + '$')
+    segments = []
+    for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            segments.append(int(match.group(1)))
+    return sorted(segments)
+
+
+def _index_path(base_path):
+    return os.path.splitext(base_path)[0] + '.index.db'
+
+
+def _create_index(conn):
+    for statement in INDEX_SCHEMA.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+class EventLog:
+    """Запись событий: record() из любого потока, запись на диск и в индекс - в потоке event-log-writer."""
+
+    def __init__(self, base_path, max_segment_bytes=20 * 1024 * 1024, keep_segments=0, queue_size=10000):
+        """keep_segments - сколько последних сегментов хранить (0 - все); старые удаляются вместе с записями индекса."""
+        self.base_path = base_path
+        self.index_path = _index_path(base_path)
+        self._max_segment_bytes = max_segment_bytes
+        self._keep_segments = keep_segments
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self._thread = None
+        self._file = None
+
+    def record(self, event_type, chat_id=None, user_id=None, **fields):
+        """Ставит событие в очередь на запись. Никогда не блокирует."""
+        event = {"ts": time.time(), "type": event_type, "chat_id": chat_id, "user_id": user_id}
+        event.update(fields)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.recorded += 1
+
+    # --- Поток записи ---
+    def _open_segment(self, conn):
+        """Открывает последний сегмент на дозапись и дописывает в индекс строки, не попавшие в него (после сбоя)."""
+        segments = _list_segments(self.base_path)
+        self._segment = segments[-1] if segments else 1
+        path = _segment_path(self.base_path, self._segment)
+        row = conn.execute("SELECT MAX(offset + length) FROM events WHERE segment = ?", (self._segment,)).fetchone()
+        indexed_end = row[0] or 0
+        rows = []
+        with open(path, 'ab+') as f:
+            f.seek(indexed_end)
+            offset = indexed_end
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break # Недописанная строка после сбоя - отрезаем ниже
+                try:
+                    rows.append(self._index_row(json.loads(line), offset, len(line)))
+                except ValueError:
+                    logger.warning(f"Поврежденная строка в {path} на позиции {offset} пропущена.")
+                offset += len(line)
+            f.truncate(offset)
+        if rows:
+            with conn:
+                conn.executemany("INSERT INTO events (ts, type, chat_id, user_id, segment, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            logger.info(f"Журнал событий: в индекс добавлено {len(rows)} событий, записанных до сбоя.")
+        self._file = open(path, 'ab')
+        self._offset = self._file.tell()
+
+    def _index_row(self, event, offset, length):
+        return (event["ts"], event["type"], event.get("chat_id"), event.get("user_id"), self._segment, offset, length)
+
+    def _rotate(self, conn):
+        self._file.close()
+        self._segment += 1
+        self._file = open(_segment_path(self.base_path, self._segment), 'ab')
+        self._offset = 0
+        if self._keep_segments:
+            old_segments = [s for s in _list_segments(self.base_path) if s <= self._segment - self._keep_segments]
+            if old_segments:
+                with conn:
+                    conn.execute("DELETE FROM events WHERE segment <= ?", (old_segments[-1],))
+                for segment in old_segments:
+                    os.remove(_segment_path(self.base_path, segment))
+
+    def _write_batch(self, conn, events):
+        rows = []
+        chunks = []
+        for event in events:
+            line = (json.dumps(event, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+            rows.append(self._index_row(event, self._offset, len(line)))
+            chunks.append(line)
+            self._offset += len(line)
+        # Сначала данные, потом индекс: после сбоя строки без индекса будут доиндексированы в _open_segment
+        self._file.write(b''.join(chunks))
+        self._file.flush()
+        with conn:
+            conn.executemany("INSERT INTO events (ts, type, chat_id, user_id, segment, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        if self._offset >= self._max_segment_bytes:
+            self._rotate(conn)
+
+    def _run(self):
+        conn = sqlite3.connect(self.index_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            _create_index(conn)
+        self._open_segment(conn)
+        try:
+            stopping = False
+            while not stopping:
+                event = self._queue.get()
+                events = []
+                while event is not None:
+                    events.append(event)
+                    if len(events) >= WRITE_BATCH_SIZE:
+                        break
+                    try:
+                        event = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if event is None:
+                    stopping = True
+                if events:
+                    try:
+                        self._write_batch(conn, events)
+                    except Exception as e:
+                        logger.error(f"Не удалось записать {len(events)} событий в журнал: {e}", exc_info=True)
+        finally:
+            self._file.close()
+            conn.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-log-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Дописывает события из очереди и останавливает поток записи."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {"recorded": self.recorded, "dropped": self.dropped, "backlog": self._queue.qsize()}
+
+    def query(self, **kwargs):
+        return query_events(self.base_path, **kwargs)
+
+
+def query_events(base_path, user_id=None, chat_id=None, since=None, until=None, types=None, limit=None):
+    """
+    Возвращает события (словари) по возрастанию времени.
+    since/until - Unix-время или datetime; types - список типов событий.
+    Подходящие события ищутся по индексу, с диска читаются только их строки.
+    """
+    index_path = _index_path(base_path)
+    if not os.path.exists(index_path):
+        return []
+    conditions = []
+    params = []
+    for column, value in (("user_id", user_id), ("chat_id", chat_id)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    for op, value in ((">=", since), ("<", until)):
+        if value is not None:
+            conditions.append(f"ts {op} ?")
+            params.append(value.timestamp() if isinstance(value, datetime.datetime) else value)
+    if types:
+        conditions.append(f"type IN ({', '.join('?' * len(types))})")
+        params.extend(types)
+    sql = "SELECT segment, offset, length FROM events"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY ts"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        locations = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    events = []
+    files = {}
+    try:
+        for segment, offset, length in locations:
+            f = files.get(segment)
+            if f is None:
+                path = _segment_path(base_path, segment)
+                if not os.path.exists(path):
+                    continue # Сегмент удален ротацией после выборки из индекса
+                f = files[segment] = open(path, 'rb')
+            f.seek(offset)
+            events.append(json.loads(f.read(length)))
+    finally:
+        for f in files.values():
+            f.close()
+    return events
+
+
+def format_event(event):
+    """Одна строка для человека: время, тип, чат, пользователь и остальные поля."""
+    when = datetime.datetime.fromtimestamp(event["ts"]).strftime('%Y-%m-%d %H:%M:%S')
+    extra = {k: v for k, v in event.items() if k not in ("ts", "type", "chat_id", "user_id")}
+    details = ' '.join(f"{k}={v!r}" for k, v in extra.items())
+    return f"{when} {event['type']:<12} чат {event.get('chat_id')} пользователь {event.get('user_id')} {details}".rstrip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск по журналу событий бота")
+    parser.add_argument('--file', default=None, help="Базовый путь журнала (по умолчанию EVENT_LOG_FILE из config.py)")
+    parser.add_argument('--user', type=int, help="ID пользователя")
+    parser.add_argument('--chat', type=int, help="ID чата")
+    parser.add_argument('--type', action='append', dest='types', help="Тип события (можно указать несколько раз)")
+    parser.add_argument('--days', type=float, help="За сколько последних дней")
+    parser.add_argument('--since', help="С даты/времени (ISO, например 2025-01-31 или 2025-01-31T12:00)")
+    parser.add_argument('--until', help="До даты/времени (ISO)")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--json', action='store_true', help="Выводить события как JSON-строки")
+    args = parser.parse_args()
+
+    base_path = args.file
+    if base_path is None:
+        from config import EVENT_LOG_FILE
+        base_path = EVENT_LOG_FILE
+    since = datetime.datetime.fromisoformat(args.since) if args.since else None
+    if args.days is not None:
+        since = time.time() - args.days * 86400
+    until = datetime.datetime.fromisoformat(args.until) if args.until else None
+
+    for event in query_events(base_path, args.user, args.chat, since, until, args.types, args.limit):
+        print(json.dumps(event, ensure_ascii=False) if args.json else format_event(event))
+
+
+if __name__ == '__main__':
+    main()
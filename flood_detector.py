@@ -0,0 +1,135 @@
+# flood_detector.py - Обнаружение флуда в группах
+#
+# Для каждого пользователя чата хранится скользящее окно времен последних
+# сообщений (не больше max_messages штук) и несколько последних хэшей текста со
+# счетчиками повторов. Флуд - max_messages сообщений за window_seconds секунд;
+# повтор - один и тот же текст max_duplicates раз за duplicate_window_seconds.
+# Проверка одного сообщения - O(1): добавить время в окно, сравнить с самым
+# старым, обновить один счетчик в маленьком словаре.
+#
+# Память ограничена: пользователи хранятся в OrderedDict по времени последнего
+# сообщения, и при каждой проверке с начала вытесняются молчащие дольше
+# idle_seconds (и самые старые, если пользователей больше max_users).
+
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FLOOD = 'flood'           # Слишком много сообщений за окно
+DUPLICATES = 'duplicates' # Один и тот же текст слишком много раз
+
+HASHES_PER_USER = 8       # Сколько разных последних текстов помнить для каждого пользователя
+_EVICT_PER_CHECK = 2      # Сколько молчащих пользователей вытеснять за одну проверку (чтобы не было долгих пауз)
+
+
+class _UserState:
+    __slots__ = ('times', 'hashes', 'last_seen')
+
+    def __init__(self):
+        self.times = collections.deque() # Времена последних сообщений (не больше max_messages)
+        self.hashes = {}                 # хэш текста -> [повторов, время первого повтора]
+        self.last_seen = 0.0
+
+
+class FloodDetector:
+    def __init__(self, max_users=50000, idle_seconds=600, stats_interval=60):
+        self._max_users = max_users
+        self._idle_seconds = idle_seconds
+        self._users = collections.OrderedDict() # (chat_id, user_id) -> _UserState, порядок - по последнему сообщению
+        self._lock = threading.Lock()
+        # Метрики
+        self.checked = 0
+        self.flood_detected = 0
+        self.duplicates_detected = 0
+        self.evicted = 0
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="flood-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def __len__(self):
+        return len(self._users)
+
+    def check(self, chat_id, user_id, text, max_messages, window_seconds, max_duplicates, duplicate_window_seconds, now=None):
+        """
+        Учитывает сообщение и возвращает FLOOD, DUPLICATES или None.
+        Лимит 0 отключает соответствующую проверку. После срабатывания счетчики пользователя сбрасываются,
+        чтобы сообщения, пришедшие до начала мута, не вызывали повторных срабатываний.
+        """
+        now = now or time.monotonic()
+        text_hash = hash(text.strip().lower()) if max_duplicates and text else None
+        key = (chat_id, user_id)
+        with self._lock:
+            self.checked += 1
+            users = self._users
+            state = users.get(key)
+            if state is None:
+                state = users[key] = _UserState()
+            else:
+                users.move_to_end(key)
+            state.last_seen = now
+            self._evict(now)
+
+            if max_messages:
+                times = state.times
+                times.append(now)
+                while len(times) > max_messages:
+                    times.popleft()
+                if len(times) == max_messages and now - times[0] <= window_seconds:
+                    self.flood_detected += 1
+                    del users[key]
+                    return FLOOD
+
+            if text_hash is not None:
+                hashes = state.hashes
+                entry = hashes.get(text_hash)
+                if entry is None or now - entry[1] > duplicate_window_seconds:
+                    hashes.pop(text_hash, None)
+                    if len(hashes) >= HASHES_PER_USER:
+                        del hashes[next(iter(hashes))] # Самый давний текст
+                    hashes[text_hash] = [1, now]
+                else:
+                    entry[0] += 1
+                    if entry[0] >= max_duplicates:
+                        self.duplicates_detected += 1
+                        del users[key]
+                        return DUPLICATES
+        return None
+
+    def _evict(self, now):
+        users = self._users
+        for _ in range(_EVICT_PER_CHECK):
+            if not users:
+                return
+            oldest_key = next(iter(users))
+            if len(users) <= self._max_users and now - users[oldest_key].last_seen <= self._idle_seconds:
+                return
+            del users[oldest_key]
+            self.evicted += 1
+
+    def forget(self, chat_id, user_id):
+        """Сбрасывает счетчики пользователя (например, после ручного размута)."""
+        with self._lock:
+            self._users.pop((chat_id, user_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked_users": len(self._users),
+                "checked": self.checked,
+                "flood_detected": self.flood_detected,
+                "duplicates_detected": self.duplicates_detected,
+                "evicted": self.evicted,
+            }
+
+    def _stats_reporter(self, interval):
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            if stats["checked"]:
+                logger.info(f"Антифлуд: проверено {stats['checked']} сообщений, флуд {stats['flood_detected']}, "
+                            f"повторы {stats['duplicates_detected']}, отслеживается {stats['tracked_users']} пользователей, "
+                            f"вытеснено {stats['evicted']}")
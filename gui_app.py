@@ -1,420 +1,705 @@
-import tkinter as tk
-from tkinter import scrolledtext, messagebox, ttk
-import threading
-import time
-import subprocess
-import os
-import re
-from multiprocessing import Queue 
-import psutil 
-import datetime 
-from PIL import Image, ImageTk 
-import sys # <-- Эта строка очень важна для корректной работы иконки в скомпилированном exe
-
-LOG_FILE = 'bot_activity.log' # Имя файла логов, должно совпадать с main.py
-MAIN_PY_PATH = 'main.py' # Путь к файлу main.py
-ICON_FILENAME = 'bot_logo.png' # Имя PNG файла иконки. Замените на свое, если нужно.
-
-class App:
-    def __init__(self, master):
-        self.master = master
-        master.title("Управление Telegram Ботом")
-        master.geometry("800x700") 
-        master.configure(bg='black') # Темная тема
-
-        # --- Добавление иконки окна ---
-        # Правильный путь для PyInstaller
-        if getattr(sys, 'frozen', False):
-            # Если приложение заморожено (скомпилировано PyInstaller)
-            base_path = sys._MEIPASS
-        else:
-            # Если запускается как обычный скрипт Python
-            base_path = os.path.abspath(".")
-        
-        icon_path_full = os.path.join(base_path, ICON_FILENAME)
-
-        if os.path.exists(icon_path_full):
-            try:
-                # Открываем изображение для иконки
-                icon_image = Image.open(icon_path_full)
-                # Tkinter PhotoImage для иконки окна
-                self.tk_icon = ImageTk.PhotoImage(icon_image)
-                # Устанавливаем иконку окна
-                self.master.iconphoto(True, self.tk_icon) 
-            except Exception as e:
-                messagebox.showwarning("Ошибка загрузки иконки", f"Не удалось загрузить иконку {icon_path_full}: {e}")
-        else:
-            messagebox.showwarning("Иконка не найдена", f"Файл иконки '{ICON_FILENAME}' не найден. Для отображения иконки окна, поместите его в ту же папку, что и gui_app.py, или убедитесь, что он включен в сборку PyInstaller.")
-
-
-        # Переменные для хранения процесса бота и очереди команд
-        self.bot_process = None
-        self.log_tail_thread = None
-        self.running_log_tail = True
-        self.command_queue = Queue() # Очередь для отправки команд в процесс бота
-
-        # Стилизация для кнопок (черный фон, синие кнопки)
-        style = ttk.Style()
-        style.theme_use('clam') # Используем тему 'clam' для лучшей настройки
-        
-        # Общие настройки для кнопок
-        style.configure('TButton',
-                        background='#007bff', # Синий цвет
-                        foreground='white',
-                        font=('Helvetica', 10, 'bold'),
-                        padding=10,
-                        bd=0) # Убираем стандартную границу
-        style.map('TButton',
-                  background=[('active', '#0056b3')], # Темнее при наведении
-                  foreground=[('disabled', '#cccccc')]) # Серый текст для неактивных кнопок
-
-        # Настройки для текстовых полей и меток
-        style.configure('TLabel', background='black', foreground='white')
-        style.configure('TEntry', fieldbackground='#333333', foreground='white', insertbackground='white')
-
-        # --- Рамка для управления ботом ---
-        self.control_frame = tk.Frame(master, bg='black', bd=0)
-        self.control_frame.pack(pady=10)
-
-        self.start_button = ttk.Button(self.control_frame, text="Запустить Бота", command=self.start_bot)
-        self.start_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
-
-        self.stop_button = ttk.Button(self.control_frame, text="Остановить Бота", command=self.stop_bot, state=tk.DISABLED)
-        self.stop_button.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
-
-        # --- Рамка для команд администрирования ---
-        self.admin_frame = tk.LabelFrame(master, text="Администрирование", bg='black', fg='white', bd=2, relief="groove", font=('Helvetica', 10, 'bold'))
-        self.admin_frame.pack(pady=10, padx=10, fill="x")
-
-        # Настраиваем расширение колонки для поля ввода
-        self.admin_frame.grid_columnconfigure(1, weight=1) 
-
-        tk.Label(self.admin_frame, text="ID пользователя (число):", bg='black', fg='white').grid(row=0, column=0, padx=5, pady=2, sticky="w")
-        self.user_id_entry = tk.Entry(self.admin_frame, width=25, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
-        self.user_id_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
-
-        # Новая кнопка "Вставить ID"
-        self.paste_id_button = ttk.Button(self.admin_frame, text="Вставить ID", command=self.paste_user_id_from_clipboard)
-        self.paste_id_button.grid(row=0, column=2, padx=5, pady=2, sticky="ew")
-
-        # Кнопки администрирования
-        self.ban_button = ttk.Button(self.admin_frame, text="Забанить", command=self.ban_user)
-        self.ban_button.grid(row=1, column=0, padx=5, pady=5, sticky="ew")
-
-        self.mute_button = ttk.Button(self.admin_frame, text="Замутить", command=self.mute_user)
-        self.mute_button.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
-
-        self.unban_button = ttk.Button(self.admin_frame, text="Разбанить", command=self.unban_user)
-        self.unban_button.grid(row=2, column=0, padx=5, pady=5, sticky="ew")
-
-        self.unmute_button = ttk.Button(self.admin_frame, text="Размутить", command=self.unmute_user)
-        self.unmute_button.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
-
-        # Поле для ввода длительности мута и причины
-        tk.Label(self.admin_frame, text="Длительность мута (мин, 0=бессрочно):", bg='black', fg='white').grid(row=3, column=0, padx=5, pady=2, sticky="w")
-        self.mute_duration_entry = tk.Entry(self.admin_frame, width=10, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
-        self.mute_duration_entry.insert(0, "60") # Значение по умолчанию
-        self.mute_duration_entry.grid(row=3, column=1, padx=5, pady=2, sticky="ew")
-
-        tk.Label(self.admin_frame, text="Причина:", bg='black', fg='white').grid(row=4, column=0, padx=5, pady=2, sticky="w")
-        self.reason_entry = tk.Entry(self.admin_frame, width=30, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
-        self.reason_entry.grid(row=4, column=1, padx=5, pady=2, sticky="ew")
-
-        # --- Рамка для логов ---
-        self.log_frame = tk.LabelFrame(master, text="Логи Бота", bg='black', fg='white', bd=2, relief="groove", font=('Helvetica', 10, 'bold'))
-        self.log_frame.pack(pady=10, padx=10, fill="both", expand=True)
-
-        self.log_text_widget = scrolledtext.ScrolledText(self.log_frame, wrap=tk.WORD, bg='#1a1a1a', fg='white', font=('Consolas', 9), insertbackground='white')
-        self.log_text_widget.pack(padx=5, pady=5, fill="both", expand=True)
-        self.log_text_widget.config(state=tk.DISABLED) # Только для чтения
-
-        # --- Кнопки управления логами ---
-        self.log_control_frame = tk.Frame(master, bg='black', bd=0)
-        self.log_control_frame.pack(pady=5, fill="x")
-
-        # Кнопка для копирования выделенного текста
-        self.copy_selected_button = ttk.Button(self.log_control_frame, text="Копировать выделенное", command=self.copy_selected_logs)
-        self.copy_selected_button.pack(side=tk.LEFT, padx=5, pady=5)
-
-        # Кнопка для копирования всего лога
-        self.copy_logs_button = ttk.Button(self.log_control_frame, text="Копировать весь лог", command=self.copy_full_logs)
-        self.copy_logs_button.pack(side=tk.LEFT, padx=5, pady=5)
-
-        # Обработка закрытия окна
-        self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
-
-    def start_bot(self):
-        if self.bot_process is None or not self.bot_process.is_alive():
-            try:
-                self.log_text_widget.config(state=tk.NORMAL)
-                self.log_text_widget.insert(tk.END, "[GUI]: Запуск бота...\n")
-                self.log_text_widget.config(state=tk.DISABLED)
-                self.log_text_widget.see(tk.END)
-
-                # Запускаем main.py как отдельный процесс, передавая ему очередь команд
-                self.bot_process = subprocess.Popen(['python', MAIN_PY_PATH], 
-                                                    stdout=subprocess.PIPE, 
-                                                    stderr=subprocess.PIPE,
-                                                    text=True,  # Декодирует stdout/stderr как текст
-                                                    bufsize=1,  # Буферизация построчно
-                                                    universal_newlines=True # Также для текста
-                                                    )
-                
-                # Запускаем поток для чтения логов из файла
-                self.running_log_tail = True
-                self.log_tail_thread = threading.Thread(target=self.tail_log_file)
-                self.log_tail_thread.daemon = True # Поток завершится с основным приложением
-                self.log_tail_thread.start()
-
-                self.start_button.config(state=tk.DISABLED)
-                self.stop_button.config(state=tk.NORMAL)
-                self.set_admin_buttons_state(tk.NORMAL)
-                self.paste_id_button.config(state=tk.NORMAL) # Включаем кнопку вставки
-                self.copy_selected_button.config(state=tk.NORMAL) # Включаем кнопку копирования выделенного
-                self.copy_logs_button.config(state=tk.NORMAL) # Включаем кнопку копирования всего лога
-
-                messagebox.showinfo("Статус", "Бот запущен!")
-
-            except Exception as e:
-                messagebox.showerror("Ошибка запуска", f"Не удалось запустить бота: {e}")
-                self.log_text_widget.config(state=tk.NORMAL)
-                self.log_text_widget.insert(tk.END, f"[GUI Error]: Failed to start bot: {e}\n")
-                self.log_text_widget.config(state=tk.DISABLED)
-                self.log_text_widget.see(tk.END)
-        else:
-            messagebox.showinfo("Статус", "Бот уже запущен.")
-
-    def stop_bot(self):
-        if self.bot_process and self.bot_process.poll() is None: # Проверяем, что процесс еще запущен
-            try:
-                self.log_text_widget.config(state=tk.NORMAL)
-                self.log_text_widget.insert(tk.END, "[GUI]: Попытка остановить бота...\n")
-                self.log_text_widget.config(state=tk.DISABLED)
-                self.log_text_widget.see(tk.END)
-
-                # Отправляем команду SHUTDOWN через очередь, чтобы бот завершился корректно
-                if self.command_queue:
-                    self.command_queue.put("SHUTDOWN")
-                    # Даем боту немного времени на завершение
-                    time.sleep(1) 
-
-                # Если процесс все еще жив, принудительно завершаем
-                if self.bot_process.poll() is None:
-                    # Убить процесс и его потомков
-                    parent = psutil.Process(self.bot_process.pid)
-                    for child in parent.children(recursive=True):
-                        child.terminate()
-                    parent.terminate()
-                    gone, alive = psutil.wait_procs([parent] + parent.children(recursive=True), timeout=5)
-                    for p in alive:
-                        p.kill() # Убиваем, если не завершились
-                    # Добавляем лог через стандартный print, т.к. логгер main.py уже может быть выключен
-                    print(f"Бот-процесс {self.bot_process.pid} и его потомки принудительно завершены.")
-
-
-                self.running_log_tail = False # Останавливаем поток чтения логов
-                if self.log_tail_thread and self.log_tail_thread.is_alive():
-                    self.log_tail_thread.join(timeout=2) # Ждем завершения потока
-
-                self.bot_process = None
-                self.start_button.config(state=tk.NORMAL)
-                self.stop_button.config(state=tk.DISABLED)
-                self.set_admin_buttons_state(tk.DISABLED)
-                self.paste_id_button.config(state=tk.DISABLED) # Отключаем кнопку вставки
-                self.copy_selected_button.config(state=tk.DISABLED) # Отключаем кнопку копирования выделенного
-                self.copy_logs_button.config(state=tk.DISABLED) # Отключаем кнопку копирования всего лога
-
-
-                messagebox.showinfo("Статус", "Бот остановлен.")
-                self.log_text_widget.config(state=tk.NORMAL)
-                self.log_text_widget.insert(tk.END, "[GUI]: Бот успешно остановлен.\n")
-                self.log_text_widget.config(state=tk.DISABLED)
-                self.log_text_widget.see(tk.END)
-
-            except Exception as e:
-                messagebox.showerror("Ошибка остановки", f"Не удалось остановить бота: {e}")
-                self.log_text_widget.config(state=tk.NORMAL)
-                self.log_text_widget.insert(tk.END, f"[GUI Error]: Failed to stop bot: {e}\n")
-                self.log_text_widget.config(state=tk.DISABLED)
-                self.log_text_widget.see(tk.END)
-        else:
-            messagebox.showinfo("Статус", "Бот не запущен.")
-            self.start_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
-            self.set_admin_buttons_state(tk.DISABLED)
-            self.paste_id_button.config(state=tk.DISABLED) # Отключаем кнопку вставки
-            self.copy_selected_button.config(state=tk.DISABLED) # Отключаем кнопку копирования выделенного
-            self.copy_logs_button.config(state=tk.DISABLED) # Отключаем кнопку копирования всего лога
-
-
-    def tail_log_file(self):
-        try:
-            # Ждем, пока файл будет создан, если его нет
-            while not os.path.exists(LOG_FILE) and self.running_log_tail:
-                time.sleep(0.1)
-
-            with open(LOG_FILE, 'r', encoding='utf-8', errors='ignore') as f:
-                # Перемещаемся в конец файла
-                f.seek(0, os.SEEK_END)
-                while self.running_log_tail:
-                    line = f.readline()
-                    if not line:
-                        time.sleep(0.1) # Ждем новых строк
-                        continue
-                    # Удаляем цветовые коды ANSI, если они есть (например, от colorlog)
-                    clean_line = re.sub(r'\x1b\[[0-9;]*m', '', line)
-                    self.master.after(0, self.update_log_widget, clean_line) # Обновляем GUI в основном потоке
-        except Exception as e:
-            self.master.after(0, self.update_log_widget, f"[GUI Log Error]: {e}\n")
-
-    def update_log_widget(self, message):
-        self.log_text_widget.config(state=tk.NORMAL)
-        self.log_text_widget.insert(tk.END, message)
-        self.log_text_widget.see(tk.END)
-        self.log_text_widget.config(state=tk.DISABLED)
-
-    def on_closing(self):
-        # Спрашиваем пользователя, действительно ли он хочет выйти
-        if messagebox.askokcancel("Выход", "Вы уверены, что хотите выйти? Бот будет остановлен."):
-            # Сначала сохраняем логи
-            self.save_logs_to_file()
-            # Затем останавливаем бота
-            self.stop_bot() 
-            # И закрываем приложение
-            self.master.destroy()
-
-    def save_logs_to_file(self):
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            log_filename = f"logs_{timestamp}.txt"
-            
-            self.log_text_widget.config(state=tk.NORMAL) # Временно включаем для чтения
-            logs_content = self.log_text_widget.get(1.0, tk.END)
-            self.log_text_widget.config(state=tk.DISABLED) # Возвращаем в состояние "только для чтения"
-
-            with open(log_filename, 'w', encoding='utf-8') as f:
-                f.write(logs_content)
-            
-            messagebox.showinfo("Сохранение логов", f"Логи сохранены в файл: {log_filename}")
-        except Exception as e:
-            messagebox.showerror("Ошибка сохранения логов", f"Не удалось сохранить логи: {e}")
-
-    def set_admin_buttons_state(self, state):
-        self.ban_button.config(state=state)
-        self.mute_button.config(state=state)
-        self.unban_button.config(state=state)
-        self.unmute_button.config(state=state)
-        self.user_id_entry.config(state=state)
-        self.mute_duration_entry.config(state=state)
-        self.reason_entry.config(state=state)
-
-    def paste_user_id_from_clipboard(self):
-        try:
-            clipboard_content = self.master.clipboard_get()
-            # Простая валидация: убедимся, что это число
-            if clipboard_content.strip().isdigit():
-                self.user_id_entry.delete(0, tk.END)
-                self.user_id_entry.insert(0, clipboard_content.strip())
-            else:
-                messagebox.showwarning("Вставка ID", "Содержимое буфера обмена не является числовым ID.")
-        except tk.TclError:
-            messagebox.showwarning("Вставка ID", "Буфер обмена пуст или содержит некорректные данные.")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Произошла ошибка при вставке: {e}")
-
-    def send_telegram_command(self, command_type):
-        user_input = self.user_id_entry.get().strip()
-        duration_input = self.mute_duration_entry.get().strip()
-        reason_input = self.reason_entry.get().strip()
-
-        if not user_input:
-            messagebox.showwarning("Предупреждение", "Пожалуйста, введите ID пользователя.")
-            return
-
-        user_id_arg = user_input # Предполагаем, что это всегда ID
-        full_command = ""
-        title = ""
-
-        if command_type == "ban":
-            full_command = f"/ban_id {user_id_arg} {reason_input}"
-            title = "Бан пользователя"
-        elif command_type == "mute":
-            # Валидация длительности мута
-            try:
-                duration_minutes = int(duration_input)
-                if duration_minutes < 0:
-                    messagebox.showwarning("Предупреждение", "Длительность мута не может быть отрицательной. Установлено 0 (бессрочно).")
-                    duration_minutes = 0
-            except ValueError:
-                messagebox.showwarning("Предупреждение", "Некорректная длительность мута. Установлено 60 минут.")
-                duration_minutes = 60 # Значение по умолчанию
-            full_command = f"/mute {user_id_arg} {duration_minutes} {reason_input}"
-            title = "Мут пользователя"
-        elif command_type == "unban":
-            full_command = f"/unban_id {user_id_arg}"
-            title = "Разбан пользователя"
-        elif command_type == "unmute":
-            full_command = f"/unmute {user_id_arg}"
-            title = "Размут пользователя"
-        else:
-            messagebox.showerror("Ошибка", "Неизвестная команда.")
-            return
-
-        # Отправка команды в очередь, которую слушает основной процесс бота
-        if self.command_queue:
-            self.command_queue.put(full_command)
-            messagebox.showinfo(title, f"Команда '{full_command}' отправлена боту.")
-            self.log_text_widget.config(state=tk.NORMAL)
-            self.log_text_widget.insert(tk.END, f"[GUI Action]: Command sent to bot: {full_command}\n")
-            self.log_text_widget.see(tk.END)
-            self.log_text_widget.config(state=tk.DISABLED)
-        else:
-            messagebox.showerror("Ошибка", "Бот не запущен или канал связи недоступен.")
-            self.log_text_widget.config(state=tk.NORMAL)
-            self.log_text_widget.insert(tk.END, "[GUI Error]: Bot not running or command queue not available.\n")
-            self.log_text_widget.see(tk.END)
-            self.log_text_widget.config(state=tk.DISABLED)
-
-    def ban_user(self):
-        self.send_telegram_command("ban")
-
-    def mute_user(self):
-        self.send_telegram_command("mute")
-
-    def unban_user(self):
-        self.send_telegram_command("unban")
-
-    def unmute_user(self):
-        self.send_telegram_command("unmute")
-
-    def copy_selected_logs(self):
-        try:
-            self.log_text_widget.config(state=tk.NORMAL)
-            selected_text = self.log_text_widget.get(tk.SEL_FIRST, tk.SEL_LAST)
-            self.master.clipboard_clear()
-            self.master.clipboard_append(selected_text)
-            self.master.update()
-            if selected_text:
-                messagebox.showinfo("Копирование", "Выделенный текст скопирован в буфер обмена!")
-            else:
-                messagebox.showwarning("Копирование", "Нет выделенного текста для копирования.")
-        except tk.TclError:
-            messagebox.showwarning("Копирование", "Нет выделенного текста для копирования.")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Произошла ошибка при копировании: {e}")
-        finally:
-            self.log_text_widget.config(state=tk.DISABLED)
-
-    def copy_full_logs(self):
-        self.log_text_widget.config(state=tk.NORMAL)
-        logs = self.log_text_widget.get(1.0, tk.END)
-        self.master.clipboard_clear()
-        self.master.clipboard_append(logs)
-        self.master.update()
-        messagebox.showinfo("Копирование", "Весь лог скопирован в буфер обмена!")
-        self.log_text_widget.config(state=tk.DISABLED)
-
-if __name__ == '__main__':
-    root = tk.Tk()
-    app = App(root)
+import tkinter as tk
+from tkinter import scrolledtext, messagebox, ttk, filedialog
+import threading
+import time
+import subprocess
+import os
+from ipc_channel import CommandChannel, ChannelError, SHUTDOWN # Канал команд к процессу бота с ответами
+import psutil 
+import datetime 
+from PIL import Image, ImageTk 
+import sys # <-- Эта строка очень важна для корректной работы иконки в скомпилированном exe
+import json
+import urllib.request
+import event_log # Поиск по журналу событий бота (по индексу, без чтения всех файлов)
+from log_tailer import LogTailer # Слежение за лог-файлом с учетом ротации (inotify или опрос)
+from log_view_store import LogViewStore # Все строки сессии на диске; в окне - только последние
+from bulk_actions import parse_user_ids # Разбор списка ID для массовых действий
+
+LOG_FILE = 'bot_activity.log' # Имя файла логов, должно совпадать с main.py
+EVENT_LOG_FILE = 'bot_events.jsonl' # Журнал событий, должен совпадать с EVENT_LOG_FILE в config.py
+HISTORY_DAYS = 7 # За сколько дней показывать историю пользователя
+LOG_MAX_UPDATES_PER_SECOND = 10 # Как часто (не чаще) новые строки лога добавляются в окно
+LOG_VIEW_MAX_LINES = 5000 # Сколько последних строк держать в окне логов; весь лог сессии - в кнопке "Весь лог"
+LOG_PAGER_PAGE_LINES = 500 # Строк на странице при просмотре всего лога
+MAIN_PY_PATH = 'main.py' # Путь к файлу main.py
+METRICS_URL = 'http://127.0.0.1:9108/metrics.json' # Метрики бота, должен совпадать с METRICS_HOST/METRICS_PORT в config.py
+METRICS_REFRESH_SECONDS = 2 # Как часто обновлять окно "Метрики"
+BOT_CONNECT_TIMEOUT = 30 # Сколько секунд ждать подключения бота к каналу команд после запуска
+BOT_SHUTDOWN_TIMEOUT = 40 # Сколько секунд ждать корректного завершения бота после SHUTDOWN: дольше long polling
+                         # (timeout=20 в main.py) плюс время на дообработку очереди и закрытие ресурсов
+ICON_FILENAME = 'bot_logo.png' # Имя PNG файла иконки. Замените на свое, если нужно.
+
+class App:
+    def __init__(self, master):
+        self.master = master
+        master.title("Управление Telegram Ботом")
+        master.geometry("800x700") 
+        master.configure(bg='black') # Темная тема
+
+        # --- Добавление иконки окна ---
+        # Правильный путь для PyInstaller
+        if getattr(sys, 'frozen', False):
+            # Если приложение заморожено (скомпилировано PyInstaller)
+            base_path = sys._MEIPASS
+        else:
+            # Если запускается как обычный скрипт Python
+            base_path = os.path.abspath(".")
+        
+        icon_path_full = os.path.join(base_path, ICON_FILENAME)
+
+        if os.path.exists(icon_path_full):
+            try:
+                # Открываем изображение для иконки
+                icon_image = Image.open(icon_path_full)
+                # Tkinter PhotoImage для иконки окна
+                self.tk_icon = ImageTk.PhotoImage(icon_image)
+                # Устанавливаем иконку окна
+                self.master.iconphoto(True, self.tk_icon) 
+            except Exception as e:
+                messagebox.showwarning("Ошибка загрузки иконки", f"Не удалось загрузить иконку {icon_path_full}: {e}")
+        else:
+            messagebox.showwarning("Иконка не найдена", f"Файл иконки '{ICON_FILENAME}' не найден. Для отображения иконки окна, поместите его в ту же папку, что и gui_app.py, или убедитесь, что он включен в сборку PyInstaller.")
+
+
+        # Переменные для хранения процесса бота и очереди команд
+        self.bot_process = None
+        self.log_tailer = None
+        self.log_store = LogViewStore() # Все строки, показанные за сессию (файл во временном каталоге)
+        self.running_log_tail = True
+        self.command_channel = None # Канал команд к процессу бота (создается при каждом запуске)
+
+        # Стилизация для кнопок (черный фон, синие кнопки)
+        style = ttk.Style()
+        style.theme_use('clam') # Используем тему 'clam' для лучшей настройки
+        
+        # Общие настройки для кнопок
+        style.configure('TButton',
+                        background='#007bff', # Синий цвет
+                        foreground='white',
+                        font=('Helvetica', 10, 'bold'),
+                        padding=10,
+                        bd=0) # Убираем стандартную границу
+        style.map('TButton',
+                  background=[('active', '#0056b3')], # Темнее при наведении
+                  foreground=[('disabled', '#cccccc')]) # Серый текст для неактивных кнопок
+
+        # Настройки для текстовых полей и меток
+        style.configure('TLabel', background='black', foreground='white')
+        style.configure('TEntry', fieldbackground='#333333', foreground='white', insertbackground='white')
+
+        # --- Рамка для управления ботом ---
+        self.control_frame = tk.Frame(master, bg='black', bd=0)
+        self.control_frame.pack(pady=10)
+
+        self.start_button = ttk.Button(self.control_frame, text="Запустить Бота", command=self.start_bot)
+        self.start_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+
+        self.stop_button = ttk.Button(self.control_frame, text="Остановить Бота", command=self.stop_bot, state=tk.DISABLED)
+        self.stop_button.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+
+        # --- Рамка для команд администрирования ---
+        self.admin_frame = tk.LabelFrame(master, text="Администрирование", bg='black', fg='white', bd=2, relief="groove", font=('Helvetica', 10, 'bold'))
+        self.admin_frame.pack(pady=10, padx=10, fill="x")
+
+        # Настраиваем расширение колонки для поля ввода
+        self.admin_frame.grid_columnconfigure(1, weight=1) 
+
+        tk.Label(self.admin_frame, text="ID пользователя (число):", bg='black', fg='white').grid(row=0, column=0, padx=5, pady=2, sticky="w")
+        self.user_id_entry = tk.Entry(self.admin_frame, width=25, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
+        self.user_id_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+
+        # Новая кнопка "Вставить ID"
+        self.paste_id_button = ttk.Button(self.admin_frame, text="Вставить ID", command=self.paste_user_id_from_clipboard)
+        self.paste_id_button.grid(row=0, column=2, padx=5, pady=2, sticky="ew")
+
+        # Кнопки администрирования
+        self.ban_button = ttk.Button(self.admin_frame, text="Забанить", command=self.ban_user)
+        self.ban_button.grid(row=1, column=0, padx=5, pady=5, sticky="ew")
+
+        self.mute_button = ttk.Button(self.admin_frame, text="Замутить", command=self.mute_user)
+        self.mute_button.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+
+        self.unban_button = ttk.Button(self.admin_frame, text="Разбанить", command=self.unban_user)
+        self.unban_button.grid(row=2, column=0, padx=5, pady=5, sticky="ew")
+
+        self.unmute_button = ttk.Button(self.admin_frame, text="Размутить", command=self.unmute_user)
+        self.unmute_button.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+
+        # Перезагрузка списка плохих слов из config.py без перезапуска бота
+        self.reload_words_button = ttk.Button(self.admin_frame, text="Обновить плохие слова", command=self.reload_bad_words)
+        self.reload_words_button.grid(row=1, column=2, padx=5, pady=5, sticky="ew")
+
+        # История действий с пользователем из журнала событий (работает и без запущенного бота)
+        self.history_button = ttk.Button(self.admin_frame, text="История пользователя", command=self.show_user_history)
+        self.history_button.grid(row=2, column=2, padx=5, pady=5, sticky="ew")
+
+        # Бан/мут/разбан списка ID (вставленного или из файла)
+        self.bulk_button = ttk.Button(self.admin_frame, text="Массовые действия", command=self.show_bulk_dialog)
+        self.bulk_button.grid(row=3, column=2, padx=5, pady=5, sticky="ew")
+
+        # Поле для ввода длительности мута и причины
+        tk.Label(self.admin_frame, text="Длительность мута (мин, 0=бессрочно):", bg='black', fg='white').grid(row=3, column=0, padx=5, pady=2, sticky="w")
+        self.mute_duration_entry = tk.Entry(self.admin_frame, width=10, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
+        self.mute_duration_entry.insert(0, "60") # Значение по умолчанию
+        self.mute_duration_entry.grid(row=3, column=1, padx=5, pady=2, sticky="ew")
+
+        tk.Label(self.admin_frame, text="Причина:", bg='black', fg='white').grid(row=4, column=0, padx=5, pady=2, sticky="w")
+        self.reason_entry = tk.Entry(self.admin_frame, width=30, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
+        self.reason_entry.grid(row=4, column=1, padx=5, pady=2, sticky="ew")
+
+        # Поле для ID чата: пусто - основной чат (MAIN_CHAT_ID)
+        tk.Label(self.admin_frame, text="ID чата (пусто = основной):", bg='black', fg='white').grid(row=5, column=0, padx=5, pady=2, sticky="w")
+        self.chat_id_entry = tk.Entry(self.admin_frame, width=25, bg='#333333', fg='white', insertbackground='white', bd=1, relief="solid")
+        self.chat_id_entry.grid(row=5, column=1, padx=5, pady=2, sticky="ew")
+
+        # --- Рамка для логов ---
+        self.log_frame = tk.LabelFrame(master, text="Логи Бота", bg='black', fg='white', bd=2, relief="groove", font=('Helvetica', 10, 'bold'))
+        self.log_frame.pack(pady=10, padx=10, fill="both", expand=True)
+
+        self.log_text_widget = scrolledtext.ScrolledText(self.log_frame, wrap=tk.WORD, bg='#1a1a1a', fg='white', font=('Consolas', 9), insertbackground='white')
+        self.log_text_widget.pack(padx=5, pady=5, fill="both", expand=True)
+        self.log_text_widget.config(state=tk.DISABLED) # Только для чтения
+
+        # --- Кнопки управления логами ---
+        self.log_control_frame = tk.Frame(master, bg='black', bd=0)
+        self.log_control_frame.pack(pady=5, fill="x")
+
+        # Кнопка для копирования выделенного текста
+        self.copy_selected_button = ttk.Button(self.log_control_frame, text="Копировать выделенное", command=self.copy_selected_logs)
+        self.copy_selected_button.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Кнопка для копирования всего лога
+        self.copy_logs_button = ttk.Button(self.log_control_frame, text="Копировать весь лог", command=self.copy_full_logs)
+        self.copy_logs_button.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Постраничный просмотр всего лога сессии (в окне логов - только последние LOG_VIEW_MAX_LINES строк)
+        self.full_log_button = ttk.Button(self.log_control_frame, text="Весь лог", command=self.show_full_log)
+        self.full_log_button.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Метрики работающего бота (нужен METRICS_ENABLED = True в config.py)
+        self.metrics_button = ttk.Button(self.log_control_frame, text="Метрики", command=self.show_metrics)
+        self.metrics_button.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Обработка закрытия окна
+        self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def start_bot(self):
+        if self.bot_process is None or self.bot_process.poll() is not None:
+            try:
+                self.update_log_widget("[GUI]: Запуск бота...\n")
+
+                # Запускаем main.py как отдельный процесс; адрес и ключ канала команд передаются через окружение.
+                # Вывод процесса не перехватываем: все пишется в LOG_FILE, а непрочитанный PIPE со временем заблокировал бы бота
+                self.command_channel = CommandChannel()
+                self.bot_process = subprocess.Popen(['python', MAIN_PY_PATH],
+                                                    stdout=subprocess.DEVNULL,
+                                                    stderr=subprocess.DEVNULL,
+                                                    env=self.command_channel.child_env()
+                                                    )
+                
+                # Запускаем слежение за файлом логов; строки добавляются в окно пачками
+                self.running_log_tail = True
+                self.log_tailer = LogTailer(LOG_FILE)
+                self.log_tailer.start()
+                self.flush_log_lines()
+
+                self.start_button.config(state=tk.DISABLED)
+                self.stop_button.config(state=tk.NORMAL)
+                self.set_admin_buttons_state(tk.NORMAL)
+                self.paste_id_button.config(state=tk.NORMAL) # Включаем кнопку вставки
+                self.copy_selected_button.config(state=tk.NORMAL) # Включаем кнопку копирования выделенного
+                self.copy_logs_button.config(state=tk.NORMAL) # Включаем кнопку копирования всего лога
+
+                messagebox.showinfo("Статус", "Бот запущен!")
+
+            except Exception as e:
+                messagebox.showerror("Ошибка запуска", f"Не удалось запустить бота: {e}")
+                self.update_log_widget(f"[GUI Error]: Failed to start bot: {e}\n")
+        else:
+            messagebox.showinfo("Статус", "Бот уже запущен.")
+
+    def stop_bot(self, on_stopped=None):
+        """Останавливает бота в фоновом потоке, чтобы окно не зависало; on_stopped вызывается в основном потоке после остановки."""
+        if self.bot_process and self.bot_process.poll() is None: # Проверяем, что процесс еще запущен
+            self.update_log_widget("[GUI]: Попытка остановить бота...\n")
+            self.stop_button.config(state=tk.DISABLED)
+            self.set_admin_buttons_state(tk.DISABLED)
+            bot_process = self.bot_process
+            command_channel = self.command_channel
+
+            def report(message):
+                self.master.after(0, self.update_log_widget, message)
+
+            def worker():
+                error = None
+                try:
+                    # Отправляем SHUTDOWN по каналу команд: бот подтверждает его, останавливает прием обновлений и закрывает ресурсы
+                    if command_channel and command_channel.connected:
+                        try:
+                            command_channel.request(SHUTDOWN, timeout=5)
+                            bot_process.wait(timeout=BOT_SHUTDOWN_TIMEOUT)
+                        except (ChannelError, subprocess.TimeoutExpired) as e:
+                            report(f"[GUI Error]: Бот не завершился сам ({e}), процесс будет остановлен принудительно.\n")
+
+                    # Если процесс все еще жив, принудительно завершаем
+                    if bot_process.poll() is None:
+                        # Убить процесс и его потомков
+                        parent = psutil.Process(bot_process.pid)
+                        for child in parent.children(recursive=True):
+                            child.terminate()
+                        parent.terminate()
+                        gone, alive = psutil.wait_procs([parent] + parent.children(recursive=True), timeout=5)
+                        for p in alive:
+                            p.kill() # Убиваем, если не завершились
+                        report(f"[GUI]: Бот-процесс {bot_process.pid} и его потомки принудительно завершены.\n")
+                except Exception as e:
+                    error = e
+                self.master.after(0, self.on_bot_stopped, error, on_stopped)
+
+            stop_thread = threading.Thread(target=worker, name="gui-stop-bot")
+            stop_thread.daemon = True
+            stop_thread.start()
+        else:
+            messagebox.showinfo("Статус", "Бот не запущен.")
+            self.set_stopped_state()
+            if on_stopped:
+                on_stopped()
+
+    def on_bot_stopped(self, error, on_stopped):
+        """Завершение stop_bot в основном потоке: останавливает чтение логов и возвращает кнопки в исходное состояние."""
+        try:
+            if error is not None:
+                raise error
+            self.running_log_tail = False # Останавливаем поток чтения логов
+            if self.log_tailer:
+                self.log_tailer.stop() # Ждем завершения потока
+                self.update_log_widget(self.log_tailer.drain()) # Последние строки, которые еще не попали в окно
+
+            self.bot_process = None
+            if self.command_channel:
+                self.command_channel.close()
+                self.command_channel = None
+            self.set_stopped_state()
+
+            messagebox.showinfo("Статус", "Бот остановлен.")
+            self.update_log_widget("[GUI]: Бот успешно остановлен.\n")
+
+        except Exception as e:
+            self.stop_button.config(state=tk.NORMAL)
+            messagebox.showerror("Ошибка остановки", f"Не удалось остановить бота: {e}")
+            self.update_log_widget(f"[GUI Error]: Failed to stop bot: {e}\n")
+        if on_stopped:
+            on_stopped()
+
+    def set_stopped_state(self):
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.set_admin_buttons_state(tk.DISABLED)
+        self.paste_id_button.config(state=tk.DISABLED) # Отключаем кнопку вставки
+        self.copy_selected_button.config(state=tk.DISABLED) # Отключаем кнопку копирования выделенного
+        self.copy_logs_button.config(state=tk.DISABLED) # Отключаем кнопку копирования всего лога
+
+    def flush_log_lines(self):
+        # Все строки, прочитанные с прошлого раза, вставляются одним вызовом - не чаще LOG_MAX_UPDATES_PER_SECOND раз в секунду
+        if not self.running_log_tail or not self.log_tailer:
+            return
+        lines = self.log_tailer.drain()
+        if lines:
+            self.update_log_widget(lines)
+        self.master.after(int(1000 / LOG_MAX_UPDATES_PER_SECOND), self.flush_log_lines)
+
+    def update_log_widget(self, message):
+        if not message:
+            return
+        self.log_store.append(message)
+        self.log_text_widget.config(state=tk.NORMAL)
+        self.log_text_widget.insert(tk.END, message)
+        # Окно - кольцевой буфер: лишние старые строки удаляются, они остаются в log_store
+        lines_in_widget = int(self.log_text_widget.index('end-1c').split('.')[0])
+        if lines_in_widget > LOG_VIEW_MAX_LINES:
+            self.log_text_widget.delete('1.0', f"{lines_in_widget - LOG_VIEW_MAX_LINES + 1}.0")
+        self.log_text_widget.see(tk.END)
+        self.log_text_widget.config(state=tk.DISABLED)
+
+    def on_closing(self):
+        # Спрашиваем пользователя, действительно ли он хочет выйти
+        if messagebox.askokcancel("Выход", "Вы уверены, что хотите выйти? Бот будет остановлен."):
+            # Сначала сохраняем логи
+            self.save_logs_to_file()
+            # Затем останавливаем бота и после остановки закрываем приложение
+            self.stop_bot(on_stopped=self.close_app)
+
+    def close_app(self):
+        self.log_store.close()
+        self.master.destroy()
+
+    def save_logs_to_file(self):
+        try:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            log_filename = f"logs_{timestamp}.txt"
+            
+            # Весь лог сессии копируется из файла-хранилища блоками, а не из виджета
+            self.log_store.export(log_filename)
+
+            messagebox.showinfo("Сохранение логов", f"Логи сохранены в файл: {log_filename}")
+        except Exception as e:
+            messagebox.showerror("Ошибка сохранения логов", f"Не удалось сохранить логи: {e}")
+
+    def set_admin_buttons_state(self, state):
+        self.ban_button.config(state=state)
+        self.mute_button.config(state=state)
+        self.unban_button.config(state=state)
+        self.unmute_button.config(state=state)
+        self.reload_words_button.config(state=state)
+        self.bulk_button.config(state=state)
+        self.user_id_entry.config(state=state)
+        self.mute_duration_entry.config(state=state)
+        self.reason_entry.config(state=state)
+        self.chat_id_entry.config(state=state)
+
+    def paste_user_id_from_clipboard(self):
+        try:
+            clipboard_content = self.master.clipboard_get()
+            # Простая валидация: убедимся, что это число
+            if clipboard_content.strip().isdigit():
+                self.user_id_entry.delete(0, tk.END)
+                self.user_id_entry.insert(0, clipboard_content.strip())
+            else:
+                messagebox.showwarning("Вставка ID", "Содержимое буфера обмена не является числовым ID.")
+        except tk.TclError:
+            messagebox.showwarning("Вставка ID", "Буфер обмена пуст или содержит некорректные данные.")
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Произошла ошибка при вставке: {e}")
+
+    def send_telegram_command(self, command_type):
+        user_input = self.user_id_entry.get().strip()
+        duration_input = self.mute_duration_entry.get().strip()
+        reason_input = self.reason_entry.get().strip()
+        chat_input = self.chat_id_entry.get().strip()
+
+        if not user_input:
+            messagebox.showwarning("Предупреждение", "Пожалуйста, введите ID пользователя.")
+            return
+        if chat_input and not chat_input.lstrip('-').isdigit():
+            messagebox.showwarning("Предупреждение", "ID чата должен быть числом (например, -1001234567890).")
+            return
+
+        user_id_arg = user_input # Предполагаем, что это всегда ID
+        full_command = ""
+        title = ""
+
+        if command_type == "ban":
+            full_command = f"/ban_id {user_id_arg} {reason_input}"
+            title = "Бан пользователя"
+        elif command_type == "mute":
+            # Валидация длительности мута
+            try:
+                duration_minutes = int(duration_input)
+                if duration_minutes < 0:
+                    messagebox.showwarning("Предупреждение", "Длительность мута не может быть отрицательной. Установлено 0 (бессрочно).")
+                    duration_minutes = 0
+            except ValueError:
+                messagebox.showwarning("Предупреждение", "Некорректная длительность мута. Установлено 60 минут.")
+                duration_minutes = 60 # Значение по умолчанию
+            full_command = f"/mute {user_id_arg} {duration_minutes} {reason_input}"
+            title = "Мут пользователя"
+        elif command_type == "unban":
+            full_command = f"/unban_id {user_id_arg}"
+            title = "Разбан пользователя"
+        elif command_type == "unmute":
+            full_command = f"/unmute {user_id_arg}"
+            title = "Размут пользователя"
+        else:
+            messagebox.showerror("Ошибка", "Неизвестная команда.")
+            return
+        if chat_input:
+            full_command = f"chat:{chat_input} {full_command}" # Команда для другого чата, а не основного
+
+        self.send_bot_command(full_command, title)
+
+    def send_bot_command(self, full_command, title):
+        """Отправляет команду процессу бота и показывает его ответ (результат или ошибку)."""
+        if not self.command_channel or not self.bot_process or self.bot_process.poll() is not None:
+            messagebox.showerror("Ошибка", "Бот не запущен или канал связи недоступен.")
+            self.update_log_widget("[GUI Error]: Bot not running or command channel not available.\n")
+            return
+        command_channel = self.command_channel
+        self.update_log_widget(f"[GUI Action]: Command sent to bot: {full_command}\n")
+
+        def show_error(text):
+            self.update_log_widget(f"[GUI Error]: {full_command}: {text}\n")
+            messagebox.showerror(title, text)
+
+        def show_result(result):
+            self.update_log_widget(f"[GUI Result]: {result}\n")
+            messagebox.showinfo(title, result)
+
+        def worker():
+            # Подключение бота и выполнение команды ждем вне основного потока, чтобы окно не зависало
+            if not command_channel.wait_connected(BOT_CONNECT_TIMEOUT):
+                self.master.after(0, show_error, "Бот не подключился к каналу команд.")
+                return
+            try:
+                result = command_channel.request(full_command)
+            except ChannelError as e:
+                self.master.after(0, show_error, f"Команда не выполнена: {e}")
+                return
+            self.master.after(0, show_result, result)
+
+        command_thread = threading.Thread(target=worker, name="gui-command")
+        command_thread.daemon = True
+        command_thread.start()
+
+    def ban_user(self):
+        self.send_telegram_command("ban")
+
+    def mute_user(self):
+        self.send_telegram_command("mute")
+
+    def unban_user(self):
+        self.send_telegram_command("unban")
+
+    def unmute_user(self):
+        self.send_telegram_command("unmute")
+
+    def show_bulk_dialog(self):
+        window = tk.Toplevel(self.master)
+        window.title("Массовые действия")
+        window.configure(bg='black')
+
+        tk.Label(window, text="ID пользователей (через пробел, запятую или с новой строки):", bg='black', fg='white').pack(anchor="w", padx=5, pady=2)
+        ids_text = scrolledtext.ScrolledText(window, width=60, height=10, bg='#333333', fg='white', insertbackground='white')
+        ids_text.pack(padx=5, pady=2, fill="both", expand=True)
+
+        def load_ids_from_file():
+            path = filedialog.askopenfilename(parent=window, title="Файл со списком ID", filetypes=[("Текст", "*.txt *.csv"), ("Все файлы", "*.*")])
+            if path:
+                with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                    ids_text.insert(tk.END, f.read() + "\n")
+
+        options = tk.Frame(window, bg='black')
+        options.pack(fill="x", padx=5, pady=2)
+        ttk.Button(options, text="Загрузить из файла", command=load_ids_from_file).pack(side=tk.LEFT, padx=5)
+        action_var = tk.StringVar(value="ban")
+        for value, label in (("ban", "Бан"), ("mute", "Мут"), ("unban", "Разбан"), ("unmute", "Размут")):
+            tk.Radiobutton(options, text=label, variable=action_var, value=value, bg='black', fg='white', selectcolor='#333333').pack(side=tk.LEFT)
+
+        progress_bar = ttk.Progressbar(window, mode='determinate')
+        progress_bar.pack(fill="x", padx=5, pady=2)
+        result_text = scrolledtext.ScrolledText(window, width=60, height=8, bg='#1a1a1a', fg='white', state=tk.DISABLED)
+        result_text.pack(padx=5, pady=2, fill="both", expand=True)
+
+        def show_result(text):
+            result_text.config(state=tk.NORMAL)
+            result_text.delete('1.0', tk.END)
+            result_text.insert(tk.END, text)
+            result_text.config(state=tk.DISABLED)
+            run_button.config(state=tk.NORMAL)
+
+        def on_progress(done, total):
+            # Вызывается из рабочего потока - обновляем окно в основном потоке
+            self.master.after(0, lambda: progress_bar.config(maximum=total, value=done))
+
+        def run():
+            user_ids, invalid = parse_user_ids(ids_text.get('1.0', tk.END))
+            if invalid:
+                messagebox.showwarning("Массовые действия", f"Не являются ID: {', '.join(invalid[:10])}", parent=window)
+                return
+            if not user_ids:
+                messagebox.showwarning("Массовые действия", "Список ID пуст.", parent=window)
+                return
+            if not self.command_channel or not self.command_channel.connected:
+                messagebox.showerror("Ошибка", "Бот не запущен или канал связи недоступен.", parent=window)
+                return
+            action = action_var.get()
+            full_command = f"/bulk_{action} {','.join(str(user_id) for user_id in user_ids)}"
+            if action == "mute":
+                duration_input = self.mute_duration_entry.get().strip()
+                full_command += f" {duration_input if duration_input.isdigit() and int(duration_input) > 0 else 60}"
+            if action in ("ban", "mute") and self.reason_entry.get().strip():
+                full_command += f" {self.reason_entry.get().strip()}"
+            chat_input = self.chat_id_entry.get().strip()
+            if chat_input:
+                full_command = f"chat:{chat_input} {full_command}"
+            if not messagebox.askokcancel("Массовые действия", f"Выполнить действие для {len(user_ids)} пользователей?", parent=window):
+                return
+
+            run_button.config(state=tk.DISABLED)
+            progress_bar.config(maximum=len(user_ids), value=0)
+            self.update_log_widget(f"[GUI Action]: Bulk command sent to bot: /bulk_{action} ({len(user_ids)} IDs)\n")
+
+            def worker():
+                # Команда выполняется долго - ждем ответа вне основного потока, чтобы окно не зависало
+                try:
+                    text = self.command_channel.request(full_command, on_progress=on_progress)
+                except ChannelError as e:
+                    text = f"Команда не выполнена: {e}"
+                self.master.after(0, show_result, text)
+                self.master.after(0, self.update_log_widget, f"[GUI Result]: {text.splitlines()[0]}\n")
+
+            bulk_thread = threading.Thread(target=worker, name="gui-bulk")
+            bulk_thread.daemon = True
+            bulk_thread.start()
+
+        run_button = ttk.Button(window, text="Выполнить", command=run)
+        run_button.pack(pady=5)
+        tk.Label(window, text="Чат, длительность мута и причина берутся из полей главного окна.", bg='black', fg='gray').pack(pady=2)
+
+    def reload_bad_words(self):
+        self.send_bot_command("/reload_bad_words", "Обновление плохих слов")
+
+    def show_user_history(self):
+        user_input = self.user_id_entry.get().strip()
+        if not user_input.isdigit():
+            messagebox.showwarning("История пользователя", "Пожалуйста, введите числовой ID пользователя.")
+            return
+        try:
+            found = event_log.query_events(EVENT_LOG_FILE, user_id=int(user_input), since=time.time() - HISTORY_DAYS * 86400)
+        except Exception as e:
+            messagebox.showerror("История пользователя", f"Не удалось прочитать журнал событий: {e}")
+            return
+
+        window = tk.Toplevel(self.master)
+        window.title(f"История пользователя {user_input} за {HISTORY_DAYS} дн.")
+        window.configure(bg='black')
+        text_widget = scrolledtext.ScrolledText(window, wrap=tk.WORD, width=110, height=30, bg='#1a1a1a', fg='white', font=('Consolas', 9))
+        text_widget.pack(padx=5, pady=5, fill="both", expand=True)
+        if found:
+            text_widget.insert(tk.END, "\n".join(event_log.format_event(event) for event in found) + "\n")
+        else:
+            text_widget.insert(tk.END, "Событий не найдено.\n")
+        text_widget.config(state=tk.DISABLED)
+
+    def copy_selected_logs(self):
+        try:
+            self.log_text_widget.config(state=tk.NORMAL)
+            selected_text = self.log_text_widget.get(tk.SEL_FIRST, tk.SEL_LAST)
+            self.master.clipboard_clear()
+            self.master.clipboard_append(selected_text)
+            self.master.update()
+            if selected_text:
+                messagebox.showinfo("Копирование", "Выделенный текст скопирован в буфер обмена!")
+            else:
+                messagebox.showwarning("Копирование", "Нет выделенного текста для копирования.")
+        except tk.TclError:
+            messagebox.showwarning("Копирование", "Нет выделенного текста для копирования.")
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Произошла ошибка при копировании: {e}")
+        finally:
+            self.log_text_widget.config(state=tk.DISABLED)
+
+    def copy_full_logs(self):
+        logs = self.log_store.read_all() # Весь лог сессии, включая строки, уже вытесненные из окна
+        self.master.clipboard_clear()
+        self.master.clipboard_append(logs)
+        self.master.update()
+        messagebox.showinfo("Копирование", "Весь лог скопирован в буфер обмена!")
+
+    def show_full_log(self):
+        # Окно читает с диска только текущую страницу
+        window = tk.Toplevel(self.master)
+        window.title("Весь лог сессии")
+        window.configure(bg='black')
+        page_text = scrolledtext.ScrolledText(window, wrap=tk.WORD, width=110, height=35, bg='#1a1a1a', fg='white', font=('Consolas', 9))
+        page_text.pack(padx=5, pady=5, fill="both", expand=True)
+        controls = tk.Frame(window, bg='black')
+        controls.pack(fill="x")
+        position_label = tk.Label(controls, bg='black', fg='white')
+        state = {"start": max(len(self.log_store) - LOG_PAGER_PAGE_LINES, 0)} # Начинаем с последней страницы
+
+        def show_page(start):
+            total = len(self.log_store)
+            start = max(0, min(start, total - LOG_PAGER_PAGE_LINES))
+            state["start"] = start
+            page_text.config(state=tk.NORMAL)
+            page_text.delete('1.0', tk.END)
+            page_text.insert(tk.END, self.log_store.read_lines(start, LOG_PAGER_PAGE_LINES))
+            page_text.config(state=tk.DISABLED)
+            position_label.config(text=f"Строки {start + 1}-{min(start + LOG_PAGER_PAGE_LINES, total)} из {total}")
+
+        ttk.Button(controls, text="<< Начало", command=lambda: show_page(0)).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(controls, text="< Назад", command=lambda: show_page(state["start"] - LOG_PAGER_PAGE_LINES)).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(controls, text="Вперед >", command=lambda: show_page(state["start"] + LOG_PAGER_PAGE_LINES)).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(controls, text="Конец >>", command=lambda: show_page(len(self.log_store))).pack(side=tk.LEFT, padx=5, pady=5)
+        position_label.pack(side=tk.LEFT, padx=10)
+        show_page(state["start"])
+
+    def show_metrics(self):
+        # Снимок метрик запрашивается в отдельном потоке, окно обновляется каждые METRICS_REFRESH_SECONDS секунд
+        window = tk.Toplevel(self.master)
+        window.title("Метрики бота")
+        window.configure(bg='black')
+        metrics_text = scrolledtext.ScrolledText(window, wrap=tk.NONE, width=90, height=35, bg='#1a1a1a', fg='white', font=('Consolas', 9))
+        metrics_text.pack(padx=5, pady=5, fill="both", expand=True)
+        state = {"previous": None}
+
+        def show(text):
+            if not window.winfo_exists():
+                return
+            metrics_text.config(state=tk.NORMAL)
+            metrics_text.delete('1.0', tk.END)
+            metrics_text.insert(tk.END, text)
+            metrics_text.config(state=tk.DISABLED)
+            window.after(METRICS_REFRESH_SECONDS * 1000, refresh)
+
+        def fetch():
+            try:
+                with urllib.request.urlopen(METRICS_URL, timeout=METRICS_REFRESH_SECONDS) as response:
+                    snapshot = json.loads(response.read().decode('utf-8'))
+                text = format_metrics(snapshot, state["previous"])
+                state["previous"] = snapshot
+            except Exception as e:
+                text = f"Метрики недоступны ({METRICS_URL}): {e}\nБот запущен? В config.py должно быть METRICS_ENABLED = True.\n"
+            self.master.after(0, show, text)
+
+        def refresh():
+            if window.winfo_exists():
+                threading.Thread(target=fetch, daemon=True).start()
+
+        refresh()
+
+
+def format_metrics(snapshot, previous):
+    """Текст окна "Метрики" из снимка /metrics.json; previous - предыдущий снимок для скорости обновлений."""
+    values = {name: metric["values"] for name, metric in snapshot["metrics"].items()}
+    lines = []
+    updates = values.get('bot_updates_total', {}).get('', 0)
+    rate = ""
+    if previous is not None:
+        elapsed = snapshot["time"] - previous["time"]
+        previous_updates = previous["metrics"].get('bot_updates_total', {}).get("values", {}).get('', 0)
+        if elapsed > 0:
+            rate = f", {(updates - previous_updates) / elapsed:.1f}/с"
+    lines.append(f"Обновлений: {updates}{rate}")
+
+    def latency_table(title, name, errors=None):
+        series = values.get(name, {})
+        if not series:
+            return
+        lines.append("")
+        lines.append(f"{title:<32}{'вызовов':>10}{'p50, мс':>10}{'p99, мс':>10}" + (f"{'ошибок':>9}" if errors else ""))
+        for label, histogram in sorted(series.items(), key=lambda item: -item[1]["count"]):
+            row = f"{label:<32}{histogram['count']:>10}{histogram['p50'] * 1000:>10.2f}{histogram['p99'] * 1000:>10.2f}"
+            if errors:
+                row += f"{errors.get(label, 0):>9}"
+            lines.append(row)
+
+    latency_table("Обработчик", 'bot_handler_seconds', values.get('bot_handler_errors_total', {}))
+    latency_table("Запрос к Bot API", 'bot_api_call_seconds')
+    api_errors = values.get('bot_api_errors_total', {})
+    if api_errors:
+        lines.append("Ошибки Bot API (метод, код): " + ", ".join(f"{label} - {count}" for label, count in sorted(api_errors.items())))
+    latency_table("Запись в хранилище", 'bot_storage_write_seconds')
+    latency_table("Команда GUI", 'bot_gui_command_seconds')
+
+    gauges = [(name, metric["values"]) for name, metric in snapshot["metrics"].items() if metric["type"] == 'gauge']
+    if gauges:
+        lines.append("")
+        lines.extend(f"{name:<42}{value:>10}" for name, value in gauges)
+    return "\n".join(lines) + "\n"
+
+if __name__ == '__main__':
+    root = tk.Tk()
+    app = App(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,199 @@
+# ipc_channel.py - Канал команд между gui_app.py и процессом бота
+#
+# GUI открывает на 127.0.0.1 слушающий сокет multiprocessing.connection со
+# случайным ключом authkey и передает адрес и ключ процессу бота через переменные
+# окружения. Бот подключается при старте и выполняет приходящие команды по одной.
+# На каждую команду приходит ответ с тем же id: выполнена ли она и что получилось
+# (или текст ошибки). Команда SHUTDOWN подтверждается до начала остановки бота,
+# после чего бот завершает polling/webhook и закрывает ресурсы.
+#
+# Формат (сообщения multiprocessing.connection уже разбиты на кадры):
+#   запрос: {"id": 1, "command": "/mute 123 60 спам"}
+#   ответ:  {"id": 1, "ok": True, "result": "..."} или {"id": 1, "ok": False, "error": "..."}
+#   ход выполнения долгой команды (до ответа, сколько угодно раз): {"id": 1, "progress": [сделано, всего]}
+
+import asyncio
+import logging
+import os
+import secrets
+import threading
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_ENV = 'BOT_IPC_ADDRESS' # "host:port"
+AUTHKEY_ENV = 'BOT_IPC_AUTHKEY' # ключ в hex
+SHUTDOWN = 'SHUTDOWN'
+POLL_SECONDS = 0.5 # Как долго serve_commands_async ждет команду за один заход (и как быстро замечает отмену)
+
+
+class ChannelError(Exception):
+    pass
+
+
+class CommandChannel:
+    """Сторона GUI: ждет подключения бота и отправляет ему команды."""
+
+    def __init__(self, host='127.0.0.1'):
+        self._authkey = secrets.token_bytes(32)
+        self._listener = Listener((host, 0), authkey=self._authkey)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._connected = threading.Event()
+        self._next_id = 0
+        accept_thread = threading.Thread(target=self._accept, name="ipc-accept")
+        accept_thread.daemon = True
+        accept_thread.start()
+
+    def child_env(self):
+        """Переменные окружения для процесса бота."""
+        host, port = self._listener.address
+        env = dict(os.environ)
+        env[ADDRESS_ENV] = f"{host}:{port}"
+        env[AUTHKEY_ENV] = self._authkey.hex()
+        return env
+
+    def _accept(self):
+        try:
+            conn = self._listener.accept()
+        except Exception as e:
+            logger.error(f"Канал команд: ошибка при подключении бота: {e}")
+            return
+        with self._lock:
+            self._conn = conn
+        self._connected.set()
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def wait_connected(self, timeout):
+        return self._connected.wait(timeout)
+
+    def request(self, command, timeout=10, on_progress=None):
+        """
+        Отправляет команду и ждет ответа. Возвращает результат, при ошибке бросает ChannelError.
+        timeout - наибольшая пауза между сообщениями бота; on_progress(done, total) получает ход выполнения.
+        """
+        with self._lock:
+            if self._conn is None:
+                raise ChannelError("Бот еще не подключился к каналу команд.")
+            self._next_id += 1
+            request_id = self._next_id
+            try:
+                self._conn.send({"id": request_id, "command": command})
+                while True:
+                    if not self._conn.poll(timeout):
+                        raise ChannelError(f"Бот не ответил на команду за {timeout} с.")
+                    response = self._conn.recv()
+                    if response.get("id") != request_id:
+                        continue # Ответы на запросы, для которых истек таймаут, пропускаем
+                    if "progress" in response:
+                        if on_progress:
+                            on_progress(*response["progress"])
+                        continue
+                    break
+            except (EOFError, OSError) as e:
+                self._conn = None
+                raise ChannelError(f"Связь с ботом потеряна: {e}")
+        if not response.get("ok"):
+            raise ChannelError(response.get("error") or "Неизвестная ошибка")
+        return response.get("result", "")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._listener.close()
+
+
+def connect_from_env():
+    """Сторона бота: подключается к GUI, если процесс запущен из gui_app.py. Иначе возвращает None."""
+    address = os.environ.get(ADDRESS_ENV)
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if not address or not authkey:
+        return None
+    host, _, port = address.rpartition(':')
+    conn = Client((host, int(port)), authkey=bytes.fromhex(authkey))
+    logger.info(f"Подключен канал команд GUI ({address}).")
+    return conn
+
+
+def serve_commands(conn, execute, on_shutdown):
+    """
+    Цикл бота: получает команды из conn и отвечает на каждую.
+    execute(command, progress) -> (ok, text), где progress(done, total) отправляет GUI ход выполнения;
+    on_shutdown() вызывается после подтверждения SHUTDOWN.
+    Возвращается после SHUTDOWN или разрыва связи с GUI.
+    """
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            logger.warning("Канал команд GUI закрыт.")
+            return
+        command = request.get("command", "")
+        if command == SHUTDOWN:
+            _confirm_shutdown(conn, request)
+            on_shutdown()
+            return
+        try:
+            ok, text = execute(command, _progress_sender(conn, request))
+        except Exception as e:
+            ok, text = False, str(e)
+        if not _respond(conn, request, ok, text):
+            return
+
+
+async def serve_commands_async(conn, execute, on_shutdown):
+    """
+    serve_commands для asyncio-движка: execute(command, progress) - корутина, on_shutdown() вызывается в цикле событий.
+    Канал читается в потоке короткими ожиданиями, поэтому отмена задачи при остановке бота не ждет следующей команды.
+    """
+    while True:
+        try:
+            request = await asyncio.to_thread(_poll_request, conn, POLL_SECONDS)
+        except (EOFError, OSError):
+            logger.warning("Канал команд GUI закрыт.")
+            return
+        if request is None:
+            continue
+        command = request.get("command", "")
+        if command == SHUTDOWN:
+            _confirm_shutdown(conn, request)
+            on_shutdown()
+            return
+        try:
+            ok, text = await execute(command, _progress_sender(conn, request))
+        except Exception as e:
+            ok, text = False, str(e)
+        if not _respond(conn, request, ok, text):
+            return
+
+
+def _poll_request(conn, timeout):
+    return conn.recv() if conn.poll(timeout) else None
+
+
+def _confirm_shutdown(conn, request):
+    logger.info("GUI command listener received SHUTDOWN command. Exiting.")
+    conn.send({"id": request.get("id"), "ok": True, "result": "Бот останавливается."})
+
+
+def _progress_sender(conn, request):
+    def progress(done, total, request_id=request.get("id")):
+        conn.send({"id": request_id, "progress": [done, total]})
+    return progress
+
+
+def _respond(conn, request, ok, text):
+    """Отправляет ответ на команду. Возвращает False, если канал закрыт."""
+    response = {"id": request.get("id"), "ok": ok}
+    response["result" if ok else "error"] = text
+    try:
+        conn.send(response)
+    except (EOFError, OSError):
+        logger.warning("Канал команд GUI закрыт.")
+        return False
+    return True
@@ -0,0 +1,155 @@
+# journal.py - Журнал событий модерации (write-ahead log) со снимком состояния
+#
+# Каждое предупреждение/мут/размут дописывается одной строкой JSON в конец журнала,
+# поэтому стоимость записи не зависит от размера состояния. Периодически журнал
+# сворачивается в снимок (DATA_FILE), который записывается во временный файл
+# и атомарно подменяет старый через os.replace. При старте читается снимок,
+# а поверх него проигрывается журнал.
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OP_WARNS = 'warns'   # Установить количество предупреждений пользователя
+OP_MUTE = 'mute'     # Записать мут пользователя
+OP_UNMUTE = 'unmute' # Удалить мут пользователя
+
+
+def empty_state():
+    return {"warns": {}, "mutes": {}}
+
+
+def apply_event(data, event):
+    """
+    Применяет событие журнала к состоянию. События хранят итоговые значения, а не приращения,
+    поэтому повторное проигрывание уже учтенного в снимке события ничего не ломает.
+    """
+    op = event.get("op")
+    user_id = str(event["user_id"])
+    if op == OP_WARNS:
+        if event["count"]:
+            data["warns"][user_id] = event["count"]
+        else:
+            data["warns"].pop(user_id, None)
+    elif op == OP_MUTE:
+        data["mutes"][user_id] = event["mute"]
+    elif op == OP_UNMUTE:
+        data["mutes"].pop(user_id, None)
+    else:
+        raise ValueError(f"Неизвестная операция журнала: {op!r}")
+
+
+class ModerationJournal:
+    def __init__(self, snapshot_path, journal_path=None, compact_every=1000, fsync=True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or snapshot_path + '.journal'
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._journal_file = None
+        self._events_since_compact = 0
+
+    # --- Загрузка ---
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            logger.info(f"Файл данных {self.snapshot_path} не найден. Создаю новый.")
+            return empty_state()
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict) or "warns" not in data or "mutes" not in data:
+                raise ValueError("Файл данных поврежден или имеет неверный формат.")
+            return data
+        except (json.JSONDecodeError, ValueError) as e:
+            # Не затираем поврежденный файл молча - откладываем его в сторону для ручного разбора
+            corrupt_path = f"{self.snapshot_path}.corrupt-{int(time.time())}"
+            os.replace(self.snapshot_path, corrupt_path)
+            logger.error(f"Ошибка чтения {self.snapshot_path}: {e}. Файл сохранен как {corrupt_path}, состояние будет восстановлено из журнала.")
+            return empty_state()
+
+    def _replay_journal(self, data):
+        """Проигрывает журнал поверх снимка. Оборванная при сбое последняя строка отбрасывается."""
+        if not os.path.exists(self.journal_path):
+            return 0
+        applied = 0
+        valid_size = 0
+        with open(self.journal_path, 'rb') as f:
+            for raw_line in f:
+                if not raw_line.endswith(b'\n'):
+                    break # Запись не была дописана до конца
+                try:
+                    apply_event(data, json.loads(raw_line))
+                except (ValueError, KeyError) as e:
+                    logger.error(f"Журнал {self.journal_path}: пропущена некорректная запись после {applied} событий: {e}")
+                    break
+                valid_size += len(raw_line)
+                applied += 1
+        if valid_size != os.path.getsize(self.journal_path):
+            logger.warning(f"Журнал {self.journal_path} обрезан до последней целой записи ({applied} событий).")
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_size)
+        return applied
+
+    def load(self):
+        """Возвращает состояние: снимок + проигранный журнал."""
+        with self._lock:
+            data = self._load_snapshot()
+            applied = self._replay_journal(data)
+            if applied:
+                logger.info(f"Из журнала {self.journal_path} восстановлено событий: {applied}.")
+            self._events_since_compact = applied
+            return data
+
+    # --- Запись ---
+    def _append(self, event, data):
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal_file.write(line)
+            self._journal_file.flush()
+            if self.fsync:
+                os.fsync(self._journal_file.fileno())
+            self._events_since_compact += 1
+            if self.compact_every and self._events_since_compact >= self.compact_every:
+                self._compact_locked(data)
+
+    def record_warns(self, data, user_id, count):
+        self._append({"op": OP_WARNS, "user_id": str(user_id), "count": count}, data)
+
+    def record_mute(self, data, user_id, mute_info):
+        self._append({"op": OP_MUTE, "user_id": str(user_id), "mute": mute_info}, data)
+
+    def record_unmute(self, data, user_id):
+        self._append({"op": OP_UNMUTE, "user_id": str(user_id)}, data)
+
+    # --- Сжатие журнала ---
+    def _compact_locked(self, data):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path) # Атомарная подмена снимка
+        # Журнал очищается только после того, как новый снимок уже на диске.
+        # Если процесс упадет между этими шагами, журнал просто проиграется повторно.
+        if self._journal_file is not None:
+            self._journal_file.close()
+        self._journal_file = open(self.journal_path, 'w', encoding='utf-8')
+        self._events_since_compact = 0
+        logger.info(f"Журнал модерации свернут в снимок {self.snapshot_path}.")
+
+    def compact(self, data):
+        """Записывает полный снимок состояния и очищает журнал."""
+        with self._lock:
+            self._compact_locked(data)
+
+    def close(self):
+        with self._lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
@@ -0,0 +1,132 @@
+# log_pipeline.py - Неблокирующее логирование через очередь
+#
+# Обработчики, которые пишут в файл и в консоль, работают в отдельном потоке
+# (QueueListener). Поток, обрабатывающий обновление, только кладет запись в
+# ограниченную очередь: форматирование и ввод-вывод происходят вне его. Если
+# очередь переполнена, запись отбрасывается и учитывается в счетчике - логи
+# никогда не задерживают модерацию.
+#
+# Логирование текста каждого сообщения вынесено в отдельный логгер "messages":
+# его можно отключить уровнем или оставить только часть сообщений (выборка).
+
+import atexit
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '[%(asctime)s - %(name)s - %(levelname)s - %(message)s]'
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler, который никогда не ждет: при переполненной очереди запись отбрасывается."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._lock_counters = threading.Lock()
+        self.queued = 0
+        self.dropped = 0
+        self.dropped_by_level = {}
+
+    def prepare(self, record):
+        # Стандартный prepare форматирует запись в вызывающем потоке. Очередь живет в этом же процессе,
+        # поэтому запись передается как есть, а форматирует ее уже поток QueueListener.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_counters:
+                self.dropped += 1
+                self.dropped_by_level[record.levelname] = self.dropped_by_level.get(record.levelname, 0) + 1
+            return
+        with self._lock_counters:
+            self.queued += 1
+
+
+class LogPipeline:
+    """Очередь + поток записи. Создается функцией setup_logging."""
+
+    def __init__(self, handlers, level=logging.INFO, queue_size=10000, stats_interval=60):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._stopped = False
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.setLevel(level)
+        root.addHandler(self.handler)
+        self.listener.start()
+        atexit.register(self.stop) # Дописываем оставшиеся записи при любом завершении процесса
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="log-pipeline-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def stats(self):
+        with self.handler._lock_counters:
+            return {
+                "queued": self.handler.queued,
+                "dropped": self.handler.dropped,
+                "dropped_by_level": dict(self.handler.dropped_by_level),
+                "backlog": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+            }
+
+    def stop(self):
+        """Останавливает поток записи, предварительно записав все, что осталось в очереди."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.listener.stop()
+
+    def _stats_reporter(self, interval):
+        reported_dropped = 0
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            if stats["dropped"] != reported_dropped:
+                logger.warning(f"Очередь логов переполнялась: отброшено записей {stats['dropped'] - reported_dropped} "
+                               f"(всего {stats['dropped']}, по уровням {stats['dropped_by_level']}), "
+                               f"в очереди {stats['backlog']}/{stats['queue_size']}")
+                reported_dropped = stats["dropped"]
+
+
+def setup_logging(handlers, level=logging.INFO, queue_size=10000, stats_interval=60, fmt=LOG_FORMAT):
+    """Назначает обработчикам общий формат и подключает их к корневому логгеру через очередь."""
+    formatter = logging.Formatter(fmt)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return LogPipeline(handlers, level, queue_size, stats_interval)
+
+
+class MessageLogSampler:
+    """
+    Решает, логировать ли текст очередного сообщения, до того как строка лога будет собрана.
+    Сообщения пишутся в логгер на уровне level; sample_rate - доля сообщений, которые попадут в лог (0..1).
+    """
+
+    def __init__(self, message_logger, level=logging.INFO, sample_rate=1.0):
+        self.logger = message_logger
+        self.level = level
+        self.sample_rate = sample_rate
+        self.seen = 0
+        self.logged = 0
+
+    def should_log(self):
+        self.seen += 1 # Счетчики без блокировки: при гонке потоков возможна лишь небольшая неточность
+        if not self.logger.isEnabledFor(self.level):
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        self.logged += 1
+        return True
+
+    def log(self, msg, *args):
+        self.logger.log(self.level, msg, *args)
@@ -0,0 +1,246 @@
+# log_tailer.py - Слежение за лог-файлом для GUI
+#
+# LogTailer читает новые строки лог-файла в отдельном потоке и складывает их в
+# буфер; GUI забирает весь буфер не чаще заданной частоты и вставляет его в
+# виджет одним вызовом. Ротация RotatingFileHandler (переименование файла и
+# создание нового) и усечение файла отслеживаются: дочитывается старый файл,
+# затем чтение продолжается с начала нового.
+#
+# На Linux поток ждет изменений через inotify (ctypes, без зависимостей) и не
+# просыпается, пока в файл ничего не пишут. На других системах (или если inotify
+# недоступен) изменения обнаруживаются по os.stat с коротким интервалом; файл при
+# этом держится открытым только на время чтения, чтобы не мешать ротации в Windows.
+
+import collections
+import ctypes
+import ctypes.util
+import logging
+import os
+import re
+import select
+import struct
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*m') # Цветовые коды (например, от colorlog)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Флаги inotify (см. man 7 inotify)
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Минимальная обертка над inotify через ctypes: наблюдение за каталогом лог-файла."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 не удался")
+        mask = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch для {directory} не удался")
+
+    def wait(self, timeout):
+        """Ждет событий до timeout секунд. Возвращает имена файлов, которых они касаются (None - переполнение очереди)."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, pos)
+            pos += _EVENT_HEADER.size
+            name = data[pos:pos + name_len].rstrip(b'\0')
+            pos += name_len
+            names.append(None if mask & IN_Q_OVERFLOW else os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    def __init__(self, path, poll_interval=0.25, max_pending_lines=20000):
+        """max_pending_lines - сколько строк держать до забора GUI; при переполнении старые отбрасываются."""
+        self.path = os.path.abspath(path)
+        self._poll_interval = poll_interval
+        self._pending = collections.deque(maxlen=max_pending_lines)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._position = 0
+        self._identity = None # (st_dev, st_ino) файла, который сейчас читается
+        self._partial = b''
+        self.lines_read = 0
+        self.lines_dropped = 0
+        self.rotations = 0
+        self.mode = None
+
+    # --- Чтение файла ---
+    def _read_available(self, f):
+        data = f.read(READ_CHUNK_SIZE)
+        while data:
+            self._feed(data)
+            data = f.read(READ_CHUNK_SIZE)
+        self._position = f.tell()
+
+    def _feed(self, data):
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop() # Незаконченная строка дочитается со следующей порцией
+        if not lines:
+            return
+        text = [line.decode('utf-8', errors='ignore') + '\n' for line in lines]
+        with self._lock:
+            free = self._pending.maxlen - len(self._pending)
+            if len(text) > free:
+                self.lines_dropped += len(text) - free
+            self._pending.extend(text)
+            self.lines_read += len(text)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st
+
+    def _check_rotation(self, st):
+        """True, если по пути лежит другой файл или текущий усечен - тогда читаем с начала."""
+        if st is None:
+            return False
+        if self._identity is not None and (st.st_dev, st.st_ino) != self._identity:
+            self.rotations += 1
+            return True
+        if st.st_size < self._position:
+            self.rotations += 1 # Файл усечен
+            return True
+        return False
+
+    def _switch_to(self, st):
+        self._identity = (st.st_dev, st.st_ino)
+        self._position = 0
+        self._partial = b''
+
+    def _step_open(self):
+        """Шаг для inotify: файл держится открытым, после ротации старый дочитывается до конца."""
+        if self._file is not None:
+            self._read_available(self._file)
+        st = self._stat()
+        if st is None:
+            return
+        rotated = self._file is not None and self._check_rotation(st)
+        if self._file is not None and not rotated:
+            return
+        if rotated:
+            self._file.close()
+            self._switch_to(st)
+        elif self._identity != (st.st_dev, st.st_ino):
+            self._switch_to(st) # Файла не было при запуске или это уже другой файл
+        self._file = open(self.path, 'rb')
+        self._file.seek(self._position)
+        self._read_available(self._file)
+
+    def _step_closed(self):
+        """Шаг для опроса по stat: файл открывается только на время чтения."""
+        st = self._stat()
+        if st is None:
+            return
+        if self._check_rotation(st):
+            self._read_rotated_tail()
+            self._switch_to(st)
+        elif self._identity is None:
+            self._identity = (st.st_dev, st.st_ino)
+        if st.st_size == self._position:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._position)
+            self._read_available(f)
+
+    def _read_rotated_tail(self):
+        """Дочитывает хвост файла, переименованного RotatingFileHandler в <имя>.1, если это тот самый файл."""
+        rotated_path = self.path + '.1'
+        try:
+            with open(rotated_path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if (st.st_dev, st.st_ino) != self._identity or st.st_size < self._position:
+                    return
+                f.seek(self._position)
+                self._read_available(f)
+        except OSError:
+            pass
+
+    # --- Поток ---
+    def _run(self):
+        inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                inotify = _Inotify(os.path.dirname(self.path))
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify недоступен ({e}), изменения лога отслеживаются опросом файла.")
+        self.mode = 'inotify' if inotify else 'poll'
+        name = os.path.basename(self.path)
+        try:
+            while not self._stop.is_set():
+                if inotify is None:
+                    self._step_closed()
+                    self._stop.wait(self._poll_interval)
+                    continue
+                self._step_open()
+                # Ждем изменения в каталоге; таймаут - страховка и возможность остановить поток
+                while not self._stop.is_set():
+                    names = inotify.wait(1.0)
+                    if not names or name in names or None in names:
+                        break
+        except Exception as e:
+            with self._lock:
+                self._pending.append(f"[GUI Log Error]: {e}\n")
+        finally:
+            if inotify is not None:
+                inotify.close()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def start(self, from_end=True):
+        """Запускает слежение. from_end=True - показывать только строки, записанные после запуска."""
+        st = self._stat()
+        if from_end and st is not None:
+            self._identity = (st.st_dev, st.st_ino)
+            self._position = st.st_size
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-tailer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def drain(self):
+        """Забирает все накопленные строки одной строкой (без цветовых кодов ANSI)."""
+        with self._lock:
+            if not self._pending:
+                return ''
+            lines = list(self._pending)
+            self._pending.clear()
+        return ANSI_ESCAPE_RE.sub('', ''.join(lines))
@@ -0,0 +1,92 @@
+# log_view_store.py - Хранилище строк лога, показанных в GUI за сессию
+#
+# В окне GUI остаются только последние строки (кольцевой буфер фиксированного
+# размера), а все строки сессии дописываются во временный файл на диске. Для
+# файла хранится массив смещений начала строк, поэтому постраничный просмотр
+# читает с диска только нужную страницу, а сохранение и копирование всего лога
+# идут из файла, а не из виджета.
+
+import array
+import os
+import tempfile
+import threading
+
+
+class LogViewStore:
+    def __init__(self, directory=None):
+        """directory - где создать файл сессии (по умолчанию - временный каталог системы)."""
+        fd, self.path = tempfile.mkstemp(prefix='gui_log_session_', suffix='.log', dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._offsets = array.array('Q') # Смещение начала каждой строки в файле
+        self._size = 0
+        self._partial = False # Последняя записанная строка не закончилась переводом строки
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def append(self, text):
+        """Дописывает текст (одну или несколько строк) в конец лога сессии."""
+        if not text:
+            return
+        data = text.encode('utf-8')
+        with self._lock:
+            self._file.seek(self._size)
+            self._file.write(data)
+            pos = 0
+            if self._partial:
+                # Продолжение незаконченной строки: ее начало уже учтено
+                pos = data.find(b'\n') + 1
+                if pos == 0:
+                    self._size += len(data)
+                    return
+            while pos < len(data):
+                self._offsets.append(self._size + pos)
+                next_newline = data.find(b'\n', pos)
+                if next_newline < 0:
+                    break
+                pos = next_newline + 1
+            self._partial = not data.endswith(b'\n')
+            self._size += len(data)
+
+    def read_lines(self, start, count):
+        """Возвращает строки с номерами [start, start + count) одним текстом."""
+        with self._lock:
+            total = len(self._offsets)
+            start = max(0, min(start, total))
+            end = min(start + count, total)
+            if start >= end:
+                return ''
+            begin = self._offsets[start]
+            finish = self._offsets[end] if end < total else self._size
+            self._file.flush()
+            self._file.seek(begin)
+            data = self._file.read(finish - begin)
+        return data.decode('utf-8', errors='ignore')
+
+    def export(self, destination):
+        """Копирует весь лог сессии в файл destination блоками, не загружая его в память целиком."""
+        with self._lock:
+            self._file.flush()
+            self._file.seek(0)
+            remaining = self._size
+            with open(destination, 'wb') as target:
+                while remaining > 0:
+                    chunk = self._file.read(min(1024 * 1024, remaining))
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    remaining -= len(chunk)
+
+    def read_all(self):
+        """Весь лог сессии одной строкой (для копирования в буфер обмена)."""
+        return self.read_lines(0, len(self))
+
+    def close(self):
+        """Закрывает и удаляет файл сессии."""
+        with self._lock:
+            self._file.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -1,367 +1,794 @@
-# main.py - Модифицированный для работы с GUI через очередь
-
-import telebot
-from telebot import types
-import json
-import os
-import datetime
-import logging
-import time
-import threading
-from multiprocessing import Queue # Импорт Queue
-import sys # Для работы с аргументами при запуске
-from logging.handlers import RotatingFileHandler # Для более гибкого логирования
-
-# Импорт конфигурации из config.py
-try:
-    from config import TOKEN, MAIN_CHAT_ID, CHAT_RULES, BAD_WORDS, ADMIN_USER_IDS, AUTO_MUTE_WARN_COUNT, AUTO_MUTE_DURATION_MINUTES, DATA_FILE, SEND_GUI_CONFIRMATIONS_TO_CHAT
-except ImportError:
-    print("Ошибка: Не найден файл config.py или в нем отсутствуют необходимые переменные.")
-    print("Убедитесь, что config.py находится в той же папке, что и main.py, и содержит все необходимые настройки.")
-    sys.exit(1) # Используем sys.exit для завершения процесса при ошибке конфигурации
-
-# --- Настройка логирования ---
-LOG_FILE = 'bot_activity.log'
-try:
-    # Удаляем предыдущие обработчики, если они уже были настроены
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
-    for handler in logging.getLogger().handlers[:]:
-        logging.getLogger().removeHandler(handler)
-
-    # Используем RotatingFileHandler для автоматического управления размером лог-файла
-    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=2, encoding='utf-8')
-    stream_handler = logging.StreamHandler() # Вывод в консоль тоже
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format='[%(asctime)s - %(name)s - %(levelname)s - %(message)s]',
-        handlers=[
-            file_handler,
-            stream_handler
-        ]
-    )
-    logging.info(f"Логи будут записываться в файл: {os.path.abspath(LOG_FILE)}")
-    logger = logging.getLogger(__name__)
-
-except Exception as e:
-    print(f"Критическая ошибка при настройке логирования: {e}")
-    sys.exit(1)
-
-# --- Инициализация бота ---
-bot = telebot.TeleBot(TOKEN)
-
-# --- Загрузка и сохранение данных ---
-def load_data():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            # Проверяем наличие ключей, если файл пуст или поврежден
-            if not isinstance(data, dict) or "warns" not in data or "mutes" not in data:
-                raise ValueError("Файл данных поврежден или имеет неверный формат.")
-            return data
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.warning(f"Ошибка чтения {DATA_FILE}. Файл поврежден или пуст. Создаю новый. Ошибка: {e}")
-            return {"warns": {}, "mutes": {}}
-    logger.info(f"Файл данных {DATA_FILE} не найден. Создаю новый.")
-    return {"warns": {}, "mutes": {}}
-
-def save_data(data):
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
-
-bot_data = load_data()
-
-# --- Вспомогательные функции ---
-def is_admin(user_id):
-    return user_id in ADMIN_USER_IDS
-
-def check_mutes():
-    current_time = datetime.datetime.now()
-    users_to_unmute = []
-    for user_id_str, mute_info in list(bot_data["mutes"].items()): # Используем list() для безопасной итерации
-        mute_end_time = datetime.datetime.fromisoformat(mute_info["end_time"])
-        if current_time >= mute_end_time:
-            users_to_unmute.append(int(user_id_str)) # Преобразуем обратно в int для unban_chat_member
-    
-    for user_id in users_to_unmute:
-        try:
-            # Размучиваем пользователя
-            bot.restrict_chat_member(MAIN_CHAT_ID, user_id, can_send_messages=True, can_add_web_page_previews=True,
-                                     can_send_media_messages=True, can_send_other_messages=True)
-            bot_data["mutes"].pop(str(user_id))
-            save_data(bot_data)
-            logger.info(f"Пользователь {user_id} размучен автоматически.")
-            # Отправка сообщения в чат об автоматическом размучивании (это сообщение всегда отправляется)
-            bot.send_message(MAIN_CHAT_ID, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> был размучен автоматически.", parse_mode='HTML')
-        except Exception as e:
-            logger.error(f"Ошибка при автоматическом размучивании пользователя {user_id}: {e}")
-
-# --- ОБРАБОТЧИКИ КОМАНД И СООБЩЕНИЙ (как у вас уже есть) ---
-
-@bot.message_handler(commands=['start'])
-def send_welcome(message):
-    bot.reply_to(message, "Привет! Я твой бот-модератор. Используй /rules, чтобы ознакомиться с правилами.")
-    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Пользователь {message.from_user.first_name} (ID: {message.from_user.id}) использовал /start")
-
-@bot.message_handler(commands=['rules'])
-def send_rules(message):
-    bot.send_message(message.chat.id, CHAT_RULES, parse_mode='HTML')
-    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Пользователь {message.from_user.first_name} (ID: {message.from_user.id}) использовал /rules")
-
-@bot.message_handler(commands=['warn'])
-def warn_user(message):
-    if not is_admin(message.from_user.id):
-        bot.reply_to(message, "У вас нет прав для использования этой команды.")
-        return
-
-    try:
-        if message.reply_to_message:
-            target_user_id = message.reply_to_message.from_user.id
-            target_username = message.reply_to_message.from_user.username
-            target_first_name = message.reply_to_message.from_user.first_name
-
-            if str(target_user_id) not in bot_data["warns"]:
-                bot_data["warns"][str(target_user_id)] = 0
-            
-            bot_data["warns"][str(target_user_id)] += 1
-            save_data(bot_data)
-
-            warn_count = bot_data["warns"][str(target_user_id)]
-            bot.reply_to(message.reply_to_message, 
-                         f"<a href='tg://user?id={target_user_id}'>{target_first_name}</a>, вам выдано предупреждение ({warn_count}/{AUTO_MUTE_WARN_COUNT}).", 
-                         parse_mode='HTML')
-            
-            logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Администратор {message.from_user.id} предупредил {target_user_id} (@{target_username}). Предупреждений: {warn_count}")
-
-            if warn_count >= AUTO_MUTE_WARN_COUNT:
-                mute_user_id(target_user_id, AUTO_MUTE_DURATION_MINUTES, "Автоматический мут за превышение лимита предупреждений", message.chat.id)
-                bot_data["warns"][str(target_user_id)] = 0 # Сбрасываем счетчик предупреждений после авто-мута
-                save_data(bot_data)
-
-        else:
-            bot.reply_to(message, "Эта команда должна быть использована в ответ на сообщение пользователя.")
-    except Exception as e:
-        logger.error(f"Ошибка при выполнении команды /warn: {e}", exc_info=True)
-        bot.reply_to(message, "Произошла ошибка при обработке команды /warn.")
-
-def mute_user_id(user_id, duration_minutes, reason, chat_id):
-    try:
-        current_time = datetime.datetime.now()
-        mute_end_time = current_time + datetime.timedelta(minutes=duration_minutes)
-        
-        bot.restrict_chat_member(chat_id, user_id, 
-                                 can_send_messages=False, 
-                                 until_date=int(mute_end_time.timestamp()))
-        
-        bot_data["mutes"][str(user_id)] = {
-            "end_time": mute_end_time.isoformat(),
-            "reason": reason,
-            "admin_id": chat_id # В данном случае это chat_id, если мут из чата
-        }
-        save_data(bot_data)
-        logger.info(f"Пользователь {user_id} замучен на {duration_minutes} минут. Причина: {reason}")
-        # Это сообщение отправляется в чат, если мут сделан через GUI и SEND_GUI_CONFIRMATIONS_TO_CHAT = True
-        # или если это автоматический мут (тогда вызывается отсюда)
-        if SEND_GUI_CONFIRMATIONS_TO_CHAT: # Отправляем только если включено
-            bot.send_message(chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> замучен на {duration_minutes} минут. Причина: {reason}", parse_mode='HTML')
-    except Exception as e:
-        logger.error(f"Ошибка при мутировании пользователя {user_id}: {e}", exc_info=True)
-
-# Обработчик текстовых сообщений
-@bot.message_handler(func=lambda message: True, content_types=['text'])
-def handle_text(message):
-    # Исправленная строка f-string:
-    full_name_or_empty = ((message.from_user.first_name or '') + ' ' + (message.from_user.last_name or '')).strip()
-    logger.info(f"[{message.chat.title} (ID: {message.chat.id}) (Type: {message.chat.type})] - "
-                f"[{full_name_or_empty} " # Используем очищенное полное имя
-                f"(ID: {message.from_user.id}) (Username: @{message.from_user.username or ''})]: {message.text}")
-
-
-    # Проверка на плохие слова
-    if message.chat.type in ['group', 'supergroup']:
-        for word in BAD_WORDS:
-            if word in message.text.lower():
-                try:
-                    bot.delete_message(message.chat.id, message.message_id)
-                    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Удалено сообщение от {message.from_user.id} за плохое слово: '{word}'")
-                    
-                    # Можно добавить предупреждение пользователю
-                    bot.send_message(message.chat.id, 
-                                     f"<a href='tg://user?id={message.from_user.id}'>{message.from_user.first_name}</a>, ваше сообщение удалено за нарушение правил (обнаружено запрещенное слово).",
-                                     parse_mode='HTML')
-                    break # Удаляем только одно сообщение, если нашли плохое слово
-
-                except telebot.apihelper.ApiTelegramException as e:
-                    logger.error(f"Не удалось удалить сообщение: {e}. Возможно, у бота нет прав администратора.")
-                except Exception as e:
-                    logger.error(f"Неизвестная ошибка при удалении сообщения: {e}")
-
-# --- НОВЫЕ ФУНКЦИИ ДЛЯ ОБРАБОТКИ КОМАНД ИЗ GUI ---
-
-# Функция для безопасного получения ID пользователя из @username или прямого ID
-def get_user_id_from_arg(bot_instance, chat_id, arg):
-    """
-    Пытается получить ID пользователя из аргумента.
-    Предпочтительно использовать прямой ID. Поиск по @username без истории сообщений сложен.
-    """
-    if arg.startswith('@'):
-        logger.warning(f"Получен username '{arg}'. Для административных действий (бан/мут) надежнее использовать прямой ID пользователя.")
-        # Если вы хотите реализовать поиск по username, это потребует дополнительных запросов
-        # или использования кэша пользователей. Для простоты, пока что вернем None.
-        return None 
-    else:
-        try:
-            return int(arg)
-        except ValueError:
-            logger.error(f"Некорректный ID пользователя в аргументе: {arg}")
-            return None
-
-def process_gui_command(command_str, bot_instance):
-    """Обрабатывает команды, полученные из GUI."""
-    logger.info(f"Получена команда из GUI: {command_str}")
-    try:
-        parts = command_str.split(' ', 3) # Разбиваем на 4 части: команда, цель, длительность, причина
-        cmd = parts[0]
-
-        # Специальная команда для отправки произвольного сообщения из GUI
-        if cmd == "/send_message_to_main_chat":
-            message_text = " ".join(parts[1:]) if len(parts) > 1 else ""
-            if message_text:
-                bot_instance.send_message(MAIN_CHAT_ID, message_text, parse_mode='HTML')
-                logger.info(f"GUI: Отправлено сообщение в чат {MAIN_CHAT_ID}: \"{message_text}\"")
-            else:
-                logger.warning("GUI: Попытка отправить пустое сообщение в чат.")
-            return # Выходим, так как это не команда администрирования пользователя
-
-        # Далее идут команды, требующие user_id
-        target_arg = parts[1] if len(parts) > 1 else None
-        user_id = get_user_id_from_arg(bot_instance, MAIN_CHAT_ID, target_arg) if target_arg else None
-        
-        if not user_id:
-            logger.error(f"Не удалось получить корректный ID пользователя для команды из GUI: {command_str}")
-            return
-
-        if cmd == "/ban_id":
-            reason = parts[2] if len(parts) > 2 else "Без причины"
-            bot_instance.ban_chat_member(MAIN_CHAT_ID, user_id)
-            logger.info(f"GUI: Пользователь {user_id} забанен в чате {MAIN_CHAT_ID}. Причина: {reason}")
-            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
-                bot_instance.send_message(MAIN_CHAT_ID, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> забанен через GUI. Причина: {reason}", parse_mode='HTML')
-
-        elif cmd == "/mute":
-            duration_minutes = 0
-            if len(parts) > 2:
-                try:
-                    duration_int = int(parts[2])
-                    if duration_int <= 0: # Мут должен быть хотя бы на 1 минуту, или 0 для бессрочного
-                        logger.warning(f"GUI: Длительность мута должна быть положительным числом, получено '{parts[2]}'. Установлено 1 минута.")
-                        duration_minutes = 1
-                    else:
-                        duration_minutes = duration_int
-                except ValueError:
-                    logger.warning(f"GUI: Некорректная длительность мута '{parts[2]}'. Установлено 60 минут по умолчанию.")
-                    duration_minutes = 60 # Значение по умолчанию
-            else:
-                duration_minutes = 60 # Значение по умолчанию, если длительность не указана
-
-            reason = parts[3] if len(parts) > 3 else "Без причины"
-            
-            until_date = int(time.time() + duration_minutes * 60) if duration_minutes > 0 else 0
-            bot_instance.restrict_chat_member(MAIN_CHAT_ID, user_id, can_send_messages=False, until_date=until_date)
-            
-            # Сохранение мута в bot_data
-            bot_data["mutes"][str(user_id)] = {
-                "end_time": (datetime.datetime.now() + datetime.timedelta(minutes=duration_minutes)).isoformat(),
-                "reason": reason,
-                "admin_id": "GUI" # Указываем, что мут был через GUI
-            }
-            save_data(bot_data)
-
-            logger.info(f"GUI: Пользователь {user_id} замучен на {duration_minutes} минут. Причина: {reason}")
-            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
-                bot_instance.send_message(MAIN_CHAT_ID, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> замучен на {duration_minutes} минут через GUI. Причина: {reason}", parse_mode='HTML')
-
-        elif cmd == "/unban_id":
-            bot_instance.unban_chat_member(MAIN_CHAT_ID, user_id)
-            logger.info(f"GUI: Пользователь {user_id} разбанен в чате {MAIN_CHAT_ID}.")
-            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
-                bot_instance.send_message(MAIN_CHAT_ID, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> разбанен через GUI.", parse_mode='HTML')
-            
-        elif cmd == "/unmute":
-            bot_instance.restrict_chat_member(MAIN_CHAT_ID, user_id, can_send_messages=True, can_add_web_page_previews=True,
-                                              can_send_media_messages=True, can_send_other_messages=True)
-            if str(user_id) in bot_data["mutes"]:
-                bot_data["mutes"].pop(str(user_id))
-                save_data(bot_data)
-            logger.info(f"GUI: Пользователь {user_id} размучен в чате {MAIN_CHAT_ID}.")
-            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
-                bot_instance.send_message(MAIN_CHAT_ID, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> размучен через GUI.", parse_mode='HTML')
-        else:
-            logger.warning(f"GUI: Неизвестная команда: {command_str}")
-
-    except telebot.apihelper.ApiTelegramException as e:
-        logger.error(f"GUI: Ошибка Telegram API при выполнении команды '{command_str}': {e}", exc_info=True)
-        # Отправляем сообщение об ошибке только в логи и GUI, не в чат
-        # bot_instance.send_message(MAIN_CHAT_ID, f"Ошибка выполнения команды из GUI для Telegram API: {e}", parse_mode='HTML')
-    except Exception as e:
-        logger.error(f"GUI: Неизвестная ошибка при выполнении команды '{command_str}': {e}", exc_info=True)
-
-# --- Функция, которая слушает команды от GUI ---
-def gui_command_listener_thread(command_queue, bot_instance):
-    logger.info("GUI command listener thread started.")
-    while True:
-        try:
-            # Получаем команду из очереди с таймаутом, чтобы поток мог завершиться
-            command = command_queue.get(timeout=1) 
-            if command == "SHUTDOWN":
-                logger.info("GUI command listener received SHUTDOWN command. Exiting.")
-                break
-            process_gui_command(command, bot_instance)
-        except Exception as e:
-            # Если очередь пуста (таймаут), просто продолжаем
-            # Другие ошибки будут залогированы
-            pass
-
-# --- Функция, которая запускает весь основной код бота ---
-# Эта функция будет вызвана из gui_app.py как отдельный процесс
-def run_main_bot_process(command_queue):
-    global bot # Убеждаемся, что бот доступен в этом процессе
-    
-    logger.info("Бот-процесс запущен из GUI.")
-
-    # Запускаем слушателя команд GUI в отдельном ПОТОКЕ
-    listener_thread = threading.Thread(target=gui_command_listener_thread, args=(command_queue, bot))
-    listener_thread.daemon = True # Поток завершится, когда завершится основной процесс бота
-    listener_thread.start()
-
-    # Запускаем проверку мутов в отдельном потоке
-    def mute_checker_loop():
-        while True:
-            try:
-                check_mutes()
-            except Exception as e:
-                logger.error(f"Ошибка в потоке проверки мутов: {e}")
-            time.sleep(30 * 60) # Проверяем каждые 30 минут
-
-    mute_thread = threading.Thread(target=mute_checker_loop)
-    mute_thread.daemon = True
-    mute_thread.start()
-
-    try:
-        logger.info("Бот запущен и готов к работе!")
-        logger.info("Бот запускается...")
-        bot.polling(none_stop=True, interval=2, timeout=20)
-    except Exception as e:
-        logger.error(f"Произошла критическая ошибка бота: {e}", exc_info=True)
-    finally:
-        logger.info("Бот остановлен.")
-        
-# Точка входа для скрипта, если он запускается напрямую (для отладки)
-if __name__ == '__main__':
-    logger.warning("main.py запущен напрямую. Функции GUI будут недоступны без gui_app.py.")
-    # При прямом запуске, очередь не будет использоваться
-    # Создаем фиктивную очередь для совместимости, но она не будет принимать команды из GUI
-    dummy_queue = Queue() 
-    run_main_bot_process(dummy_queue)
\ No newline at end of file
+# main.py - Модифицированный для работы с GUI через очередь
+
+import telebot
+from telebot import types
+import os
+import importlib
+import datetime
+import logging
+import time
+import threading
+import ipc_channel # Канал команд от GUI (multiprocessing.connection) с ответами на каждую команду
+import sys # Для работы с аргументами при запуске
+from logging.handlers import RotatingFileHandler # Для более гибкого логирования
+from log_pipeline import setup_logging, MessageLogSampler # Запись логов в отдельном потоке через очередь
+from chat_config import ChatConfigRegistry # Настройки модерации по чатам (правила, плохие слова, авто-мут)
+from storage import ModerationStore # Хранилище предупреждений и мутов на SQLite
+from mute_scheduler import MuteScheduler # Точное снятие мутов по ближайшему сроку
+from dispatcher import UpdateDispatcher # Пул рабочих потоков для обработки обновлений
+from rate_limiter import RateLimitedBot # Ограничение частоты исходящих запросов к Telegram
+from delete_batcher import DeletionBatcher # Пакетное удаление сообщений (deleteMessages)
+import event_log # Структурированный журнал событий с индексом по пользователю и времени
+from bulk_actions import BulkExecutor, parse_user_ids, split_leading_ids # Массовый бан/мут/разбан по списку ID
+from username_cache import UsernameCache # Кэш @username -> ID из входящих обновлений
+import flood_detector # Антифлуд: скользящее окно сообщений и повторы текста
+from spam_fingerprint import NearDuplicateIndex # Рейды: одинаковые и почти одинаковые сообщения от разных аккаунтов
+from update_recorder import UpdateRecorder # Запись входящих обновлений для воспроизведения
+import metrics # Счетчики и гистограммы задержек, HTTP /metrics
+from moderation_rules import DETAIL_FIELDS # Под каким полем журнала событий записывать подробности срабатывания правила
+import text_normalizer # Нормализация текста перед поиском плохих слов (кэш - в метриках)
+from metrics import timed # Замер времени обработчиков для метрик
+
+# Импорт конфигурации из config.py
+try:
+    import config
+    from config import TOKEN, MAIN_CHAT_ID, ADMIN_USER_IDS, DATA_FILE, DB_FILE, SEND_GUI_CONFIRMATIONS_TO_CHAT
+    from config import UPDATE_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN
+    from config import DISPATCHER_WORKERS, DISPATCHER_QUEUE_SIZE, DISPATCHER_STATS_INTERVAL, RUNTIME
+    from config import RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_CHAT_PER_MINUTE, RATE_LIMIT_CHAT_BURST, RATE_LIMIT_MAX_RETRIES, NOTICE_COALESCE_WINDOW_SECONDS
+    from config import DELETE_BATCH_WINDOW_SECONDS
+    from config import LOG_QUEUE_SIZE, MESSAGE_LOG_LEVEL, MESSAGE_LOG_SAMPLE_RATE
+    from config import EVENT_LOG_FILE, EVENT_LOG_SEGMENT_MB, EVENT_LOG_KEEP_SEGMENTS, EVENT_LOG_MESSAGES
+    from config import BULK_ACTION_WORKERS
+    from config import USERNAME_CACHE_SIZE, USERNAME_CACHE_TTL_DAYS
+    from config import FLOOD_TRACKED_USERS
+    from config import NEAR_DUP_WINDOW_SECONDS, NEAR_DUP_MIN_LENGTH, NEAR_DUP_MAX_MESSAGES
+    from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+    from config import RECORD_UPDATES, RECORD_UPDATES_DIR, RECORD_SEGMENT_MB
+except ImportError:
+    print("Ошибка: Не найден файл config.py или в нем отсутствуют необходимые переменные.")
+    print("Убедитесь, что config.py находится в той же папке, что и main.py, и содержит все необходимые настройки.")
+    sys.exit(1) # Используем sys.exit для завершения процесса при ошибке конфигурации
+
+# --- Настройка логирования ---
+LOG_FILE = 'bot_activity.log'
+try:
+    # Удаляем предыдущие обработчики, если они уже были настроены
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+    for handler in logging.getLogger().handlers[:]:
+        logging.getLogger().removeHandler(handler)
+
+    # Используем RotatingFileHandler для автоматического управления размером лог-файла
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=2, encoding='utf-8')
+    stream_handler = logging.StreamHandler() # Вывод в консоль тоже
+
+    # Файл и консоль пишет отдельный поток; обработчики обновлений только кладут записи в очередь
+    log_pipeline = setup_logging([file_handler, stream_handler], logging.INFO, LOG_QUEUE_SIZE, DISPATCHER_STATS_INTERVAL)
+    logging.info(f"Логи будут записываться в файл: {os.path.abspath(LOG_FILE)}")
+    logger = logging.getLogger(__name__)
+    # Текст каждого сообщения - отдельный логгер, его уровень и доля задаются в config.py
+    message_log = MessageLogSampler(logging.getLogger('messages'), logging.getLevelName(MESSAGE_LOG_LEVEL), MESSAGE_LOG_SAMPLE_RATE)
+
+except Exception as e:
+    print(f"Критическая ошибка при настройке логирования: {e}")
+    sys.exit(1)
+
+# --- Инициализация бота ---
+# С диспетчером обновления обрабатываются в его рабочих потоках, поэтому собственный пул потоков TeleBot отключаем
+raw_bot = telebot.TeleBot(TOKEN, threaded=DISPATCHER_WORKERS <= 0)
+
+def remember_users(updates):
+    """Пополняет кэш username -> ID из входящих обновлений: авторы сообщений, авторы сообщений в ответах, новые участники."""
+    try:
+        for update in updates:
+            message = update.message or update.edited_message
+            if message is not None:
+                username_cache.observe_user(message.from_user)
+                if message.reply_to_message is not None:
+                    username_cache.observe_user(message.reply_to_message.from_user)
+                for member in message.new_chat_members or []:
+                    username_cache.observe_user(member)
+            if update.callback_query is not None:
+                username_cache.observe_user(update.callback_query.from_user)
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении кэша username: {e}", exc_info=True)
+
+_process_new_updates = raw_bot.process_new_updates
+
+def process_new_updates(updates):
+    metrics.UPDATES.inc(amount=len(updates))
+    remember_users(updates)
+    _process_new_updates(updates)
+
+# polling и webhook вызывают bot.process_new_updates - подменяем его, обработчики остаются прежними
+dispatcher = None
+if DISPATCHER_WORKERS > 0:
+    dispatcher = UpdateDispatcher(process_new_updates, DISPATCHER_WORKERS, DISPATCHER_QUEUE_SIZE, DISPATCHER_STATS_INTERVAL)
+    _receive_updates = dispatcher.submit
+else:
+    _receive_updates = process_new_updates
+
+# Запись обновлений: в момент получения, до очередей диспетчера - так сохраняются исходный порядок и время
+update_recorder = UpdateRecorder(RECORD_UPDATES_DIR, RECORD_SEGMENT_MB * 1024 * 1024, LOG_QUEUE_SIZE) if RECORD_UPDATES else None
+
+def receive_and_record_updates(updates):
+    update_recorder.record(updates)
+    _receive_updates(updates)
+
+raw_bot.process_new_updates = receive_and_record_updates if update_recorder else _receive_updates
+
+# Все исходящие запросы идут через ограничитель частоты; регистрация обработчиков и polling передаются raw_bot как есть
+bot = RateLimitedBot(raw_bot, RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_CHAT_PER_MINUTE, RATE_LIMIT_CHAT_BURST,
+                     RATE_LIMIT_MAX_RETRIES, NOTICE_COALESCE_WINDOW_SECONDS, DISPATCHER_STATS_INTERVAL)
+
+# Удаляемые сообщения копятся коротким окном и удаляются одним запросом на чат
+deletion_batcher = DeletionBatcher(bot, DELETE_BATCH_WINDOW_SECONDS, DISPATCHER_STATS_INTERVAL)
+
+# --- Хранилище данных ---
+# Предупреждения и муты хранятся в SQLite (DB_FILE). Старый DATA_FILE переносится в базу один раз при первом запуске.
+# Данные разделены по чатам; данные старых версий без chat_id относятся к MAIN_CHAT_ID.
+store = ModerationStore(DB_FILE, MAIN_CHAT_ID)
+store.migrate_from_json(DATA_FILE)
+
+# Кэш username -> ID: пополняется из всех обновлений (remember_users), сохраняется в DB_FILE и загружается при старте
+username_cache = UsernameCache(store, USERNAME_CACHE_SIZE, USERNAME_CACHE_TTL_DAYS * 24 * 60 * 60, stats_interval=DISPATCHER_STATS_INTERVAL)
+username_cache.load()
+
+# --- Журнал событий ---
+# Сообщения, удаления, предупреждения, муты, баны и команды GUI в JSONL с индексом (см. event_log.py)
+events = event_log.EventLog(EVENT_LOG_FILE, EVENT_LOG_SEGMENT_MB * 1024 * 1024, EVENT_LOG_KEEP_SEGMENTS, LOG_QUEUE_SIZE)
+
+# --- Настройки чатов ---
+# Правила, плохие слова и авто-мут для каждого чата: общие значения из config.py + переопределения из CHAT_SETTINGS.
+# Автоматы поиска плохих слов строятся один раз при старте, а не перебирают список на каждом сообщении.
+chat_configs = ChatConfigRegistry(config, DISPATCHER_STATS_INTERVAL)
+
+def reload_bad_words():
+    """Перечитывает настройки чатов (BAD_WORDS, CHAT_SETTINGS и т.д.) из config.py без перезапуска бота."""
+    importlib.reload(config)
+    matchers_count = chat_configs.load(config)
+    words_count = len(chat_configs.default.bad_word_matcher)
+    logger.info(f"Настройки чатов перезагружены: общий список - {words_count} слов, "
+                f"отдельных настроек чатов - {len(chat_configs.configured_chat_ids())}, автоматов - {matchers_count}.")
+    return words_count
+
+# --- Вспомогательные функции ---
+# Антифлуд: пороги берутся из настроек чата (FLOOD_* / CHAT_SETTINGS), счетчики - общие на все чаты
+flood = flood_detector.FloodDetector(FLOOD_TRACKED_USERS, stats_interval=DISPATCHER_STATS_INTERVAL)
+
+FLOOD_REASONS = {
+    flood_detector.FLOOD: "Автоматический мут за флуд",
+    flood_detector.DUPLICATES: "Автоматический мут за повтор одинаковых сообщений",
+}
+
+def check_flood(message, settings):
+    """Учитывает сообщение в антифлуде. Возвращает FLOOD, DUPLICATES или None (админы не проверяются)."""
+    if is_admin(message.from_user.id):
+        return None
+    return flood.check(message.chat.id, message.from_user.id, message.text,
+                       settings.flood_max_messages, settings.flood_window_seconds,
+                       settings.flood_max_duplicates, settings.flood_duplicate_window_seconds)
+
+# Рейды: отпечатки сообщений групп за NEAR_DUP_WINDOW_SECONDS, порог копий - из настроек чата
+near_duplicates = NearDuplicateIndex(NEAR_DUP_WINDOW_SECONDS, NEAR_DUP_MAX_MESSAGES, min_length=NEAR_DUP_MIN_LENGTH,
+                                     stats_interval=DISPATCHER_STATS_INTERVAL)
+
+def check_near_duplicates(message, settings):
+    """Добавляет сообщение в индекс отпечатков. Возвращает [(user_id, message_id), ...] копий для удаления или None."""
+    if is_admin(message.from_user.id):
+        return None
+    return near_duplicates.add(message.chat.id, message.from_user.id, message.message_id, message.text, settings.near_dup_copies)
+
+NEAR_DUP_NOTICE = ("{user}, ваше сообщение удалено: одинаковые сообщения с разных аккаунтов считаются спамом "
+                   "(предупреждение {count}/{limit}).")
+NEAR_DUP_SUMMARY = "Удалены одинаковые сообщения (рейд). Предупреждено пользователей: {count}: {items}."
+
+def punish_near_duplicates(chat_id, duplicates, settings):
+    """Удаляет копии рейда (удаления объединяются в пакеты) и выдает по одному предупреждению каждому автору."""
+    for user_id, message_id in duplicates:
+        deletion_batcher.delete(chat_id, message_id)
+        events.record(event_log.DELETE, chat_id, user_id, message_id=message_id, reason="near_duplicate")
+    logger.info(f"[ID: {chat_id}] - Удалено одинаковых сообщений (рейд): {len(duplicates)}")
+    for user_id in dict.fromkeys(user_id for user_id, _ in duplicates):
+        try:
+            warn_count = store.add_warn(chat_id, user_id)
+            events.record(event_log.WARN, chat_id, user_id, reason="near_duplicate", count=warn_count)
+            user_link = f"<a href='tg://user?id={user_id}'>{user_id}</a>"
+            bot.send_coalesced(chat_id, 'near_duplicates',
+                               NEAR_DUP_NOTICE.format(user=user_link, count=warn_count, limit=settings.auto_mute_warn_count),
+                               user_link, NEAR_DUP_SUMMARY)
+            escalate_warns(chat_id, user_id, warn_count, settings)
+        except Exception as e:
+            logger.error(f"Ошибка при предупреждении пользователя {user_id} за рейд: {e}", exc_info=True)
+
+AUTO_MUTE_REASON = "Автоматический мут за превышение лимита предупреждений"
+
+def auto_mute_due(chat_id, user_id, warn_count, settings):
+    """
+    Решение об авто-муте без запросов к Telegram (общее для main.py и async_main.py): когда предупреждений набралось
+    auto_mute_warn_count, счетчик сбрасывается и возвращается длительность мута в минутах, иначе None.
+    """
+    if warn_count < settings.auto_mute_warn_count:
+        return None
+    store.reset_warns(chat_id, user_id)
+    return settings.auto_mute_duration_minutes
+
+def escalate_warns(chat_id, user_id, warn_count, settings):
+    """Авто-мут, когда предупреждений набралось auto_mute_warn_count; счетчик предупреждений сбрасывается."""
+    duration_minutes = auto_mute_due(chat_id, user_id, warn_count, settings)
+    if duration_minutes is not None:
+        mute_user_id(user_id, duration_minutes, AUTO_MUTE_REASON, chat_id)
+
+def log_rule_hit(message, hit):
+    """Пишет срабатывание правила в лог; возвращает подробности для журнала событий (для bad_words - слова, для regex - шаблоны)."""
+    rule = hit.rule
+    details = {DETAIL_FIELDS[rule.match]: hit.detail} if rule.match in DETAIL_FIELDS else {}
+    found = f", найдено: {', '.join(repr(w) for w in hit.detail)}" if details else ""
+    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Правило '{rule.name}' ({', '.join(rule.actions)}): "
+                f"сообщение от {message.from_user.id}{found}")
+    return details
+
+def apply_rule(message, settings, hit):
+    """Выполняет действия сработавшего правила модерации (moderation_rules.RuleHit) по порядку."""
+    rule = hit.rule
+    chat_id = message.chat.id
+    user = message.from_user
+    user_link = f"<a href='tg://user?id={user.id}'>{user.first_name}</a>"
+    details = log_rule_hit(message, hit)
+    for action in rule.actions:
+        try:
+            if action == 'delete':
+                # Ошибки удаления (например, нет прав администратора) логирует сам deletion_batcher
+                deletion_batcher.delete(chat_id, message.message_id)
+                events.record(event_log.DELETE, chat_id, user.id, message_id=message.message_id, reason=rule.name, **details)
+            elif action == 'notify':
+                # При наплыве нарушителей уведомления объединяются в одну сводку
+                bot.send_coalesced(chat_id, f"rule:{rule.name}", rule.notice.format(user=user_link), user_link, rule.notice_summary)
+            elif action == 'warn':
+                warn_count = store.add_warn(chat_id, user.id)
+                events.record(event_log.WARN, chat_id, user.id, reason=rule.name, count=warn_count)
+                bot.send_coalesced(chat_id, f"rule:{rule.name}",
+                                   f"{rule.notice.format(user=user_link)} Предупреждение {warn_count}/{settings.auto_mute_warn_count}.",
+                                   user_link, rule.notice_summary)
+                escalate_warns(chat_id, user.id, warn_count, settings)
+            elif action == 'mute':
+                mute_user_id(user.id, rule.mute_minutes, rule.reason, chat_id)
+            elif action == 'ban':
+                bot.ban_chat_member(chat_id, user.id)
+                events.record(event_log.BAN, chat_id, user.id, reason=rule.reason, source="rule")
+        except Exception as e:
+            logger.error(f"Правило '{rule.name}': ошибка действия {action} для пользователя {user.id}: {e}", exc_info=True)
+
+def check_message(message, settings):
+    """
+    Проверки сообщения группы без запросов к Telegram (общие для main.py и async_main.py), от дешевых к дорогим.
+    Возвращает ('flood', FLOOD/DUPLICATES), ('near_duplicates', [(user_id, message_id), ...]), ('rule', RuleHit) или None.
+    """
+    # Антифлуд: сообщение, на котором сработал порог, удаляется, а автор мутится
+    flood_kind = check_flood(message, settings)
+    if flood_kind:
+        return 'flood', flood_kind
+    # Рейд: как только набралось near_dup_copies копий текста, удаляются все копии разом
+    duplicates = check_near_duplicates(message, settings)
+    if duplicates:
+        return 'near_duplicates', duplicates
+    # Правила модерации (MODERATION_RULES): скомпилированный конвейер чата, от дешевых проверок к дорогим
+    hit = settings.rule_pipeline.evaluate(message)
+    if hit:
+        return 'rule', hit
+    return None
+
+def is_admin(user_id):
+    return user_id in ADMIN_USER_IDS
+
+UNMUTE_RETRY_SECONDS = 5 * 60 # Через сколько повторить автоматический размут, если он не удался
+
+@timed(metrics.HANDLER_SECONDS, 'check_mutes', errors=metrics.HANDLER_ERRORS)
+def check_mutes(mutes_to_clear=None):
+    """
+    Снимает истекшие муты. Вызывается планировщиком со списком пар (chat_id, user_id), у которых истек мут.
+    Без аргумента сама выбирает истекшие муты из хранилища (по индексу end_time).
+    """
+    if mutes_to_clear is None:
+        mutes_to_clear = [(chat_id, user_id) for chat_id, user_id, _ in store.due_mutes(time.time())]
+
+    unmuted = []
+    for chat_id, user_id in mutes_to_clear:
+        try:
+            # Размучиваем пользователя
+            bot.restrict_chat_member(chat_id, user_id, can_send_messages=True, can_add_web_page_previews=True,
+                                     can_send_media_messages=True, can_send_other_messages=True)
+            unmuted.append((chat_id, user_id))
+        except Exception as e:
+            logger.error(f"Ошибка при автоматическом размучивании пользователя {user_id} в чате {chat_id}: {e}")
+            mute_scheduler.schedule((chat_id, user_id), time.time() + UNMUTE_RETRY_SECONDS)
+
+    if not unmuted:
+        return
+    store.clear_mutes(unmuted) # Одна транзакция на всю пачку
+    for chat_id, user_id in unmuted:
+        logger.info(f"Пользователь {user_id} размучен автоматически в чате {chat_id}.")
+        events.record(event_log.UNMUTE, chat_id, user_id, source="auto")
+        try:
+            # Отправка сообщения в чат об автоматическом размучивании (это сообщение всегда отправляется)
+            bot.send_message(chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> был размучен автоматически.", parse_mode='HTML')
+        except Exception as e:
+            logger.error(f"Не удалось сообщить о размуте пользователя {user_id} в чате {chat_id}: {e}")
+
+# Планировщик спит до ближайшего окончания мута и передает истекшие муты в check_mutes пачкой.
+# Ключ мута в планировщике - пара (chat_id, user_id).
+mute_scheduler = MuteScheduler(check_mutes)
+
+def scheduled_mutes():
+    """Муты из хранилища в формате планировщика: ((chat_id, user_id), end_time)."""
+    return [((chat_id, user_id), end_time) for chat_id, user_id, end_time in store.all_mutes()]
+
+# --- Метрики ---
+# Размеры хранилища и очередей считываются только при запросе /metrics
+metrics.Gauge('bot_active_mutes', "Активных мутов в хранилище", store.mutes_count)
+metrics.Gauge('bot_dispatcher_queue_depth', "Обновлений в очередях диспетчера",
+              lambda: dispatcher.stats()["queue_depth"] if dispatcher else 0)
+metrics.Gauge('bot_username_cache_entries', "Записей в кэше username -> ID", lambda: len(username_cache))
+metrics.Gauge('bot_flood_tracked_users', "Пользователей, отслеживаемых антифлудом", lambda: len(flood))
+metrics.Gauge('bot_near_dup_entries', "Сообщений в индексе отпечатков", lambda: len(near_duplicates))
+metrics.Gauge('bot_normalizer_cache_entries', "Текстов в кэше нормализации", lambda: text_normalizer.cache_stats()["size"])
+
+def start_metrics_server():
+    """Включает метрики и HTTP-сервер /metrics, если METRICS_ENABLED. Возвращает сервер или None."""
+    if not METRICS_ENABLED:
+        return None
+    metrics.enable()
+    try:
+        return metrics.serve(METRICS_HOST, METRICS_PORT)
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на {METRICS_HOST}:{METRICS_PORT}: {e}")
+        return None
+
+# --- ОБРАБОТЧИКИ КОМАНД И СООБЩЕНИЙ (как у вас уже есть) ---
+
+@bot.message_handler(commands=['start'])
+@timed(metrics.HANDLER_SECONDS, 'send_welcome', errors=metrics.HANDLER_ERRORS)
+def send_welcome(message):
+    bot.reply_to(message, "Привет! Я твой бот-модератор. Используй /rules, чтобы ознакомиться с правилами.")
+    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Пользователь {message.from_user.first_name} (ID: {message.from_user.id}) использовал /start")
+
+@bot.message_handler(commands=['rules'])
+@timed(metrics.HANDLER_SECONDS, 'send_rules', errors=metrics.HANDLER_ERRORS)
+def send_rules(message):
+    bot.send_message(message.chat.id, chat_configs.get(message.chat.id).rules, parse_mode='HTML')
+    logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Пользователь {message.from_user.first_name} (ID: {message.from_user.id}) использовал /rules")
+
+@bot.message_handler(commands=['reload_words'])
+@timed(metrics.HANDLER_SECONDS, 'reload_words_command', errors=metrics.HANDLER_ERRORS)
+def reload_words_command(message):
+    if not is_admin(message.from_user.id):
+        bot.reply_to(message, "У вас нет прав для использования этой команды.")
+        return
+    try:
+        words_count = reload_bad_words()
+        bot.reply_to(message, f"Список плохих слов перезагружен ({words_count} слов).")
+    except Exception as e:
+        logger.error(f"Ошибка при перезагрузке списка плохих слов: {e}", exc_info=True)
+        bot.reply_to(message, "Не удалось перезагрузить список плохих слов. Подробности в логах.")
+
+@bot.message_handler(commands=['warn'])
+@timed(metrics.HANDLER_SECONDS, 'warn_user', errors=metrics.HANDLER_ERRORS)
+def warn_user(message):
+    if not is_admin(message.from_user.id):
+        bot.reply_to(message, "У вас нет прав для использования этой команды.")
+        return
+
+    try:
+        if message.reply_to_message:
+            target_user_id = message.reply_to_message.from_user.id
+            target_username = message.reply_to_message.from_user.username
+            target_first_name = message.reply_to_message.from_user.first_name
+
+            settings = chat_configs.get(message.chat.id)
+            warn_count = store.add_warn(message.chat.id, target_user_id)
+
+            bot.reply_to(message.reply_to_message, 
+                         f"<a href='tg://user?id={target_user_id}'>{target_first_name}</a>, вам выдано предупреждение ({warn_count}/{settings.auto_mute_warn_count}).", 
+                         parse_mode='HTML')
+            
+            logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Администратор {message.from_user.id} предупредил {target_user_id} (@{target_username}). Предупреждений: {warn_count}")
+            events.record(event_log.WARN, message.chat.id, target_user_id, admin_id=message.from_user.id, count=warn_count)
+
+            escalate_warns(message.chat.id, target_user_id, warn_count, settings)
+
+        else:
+            bot.reply_to(message, "Эта команда должна быть использована в ответ на сообщение пользователя.")
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении команды /warn: {e}", exc_info=True)
+        bot.reply_to(message, "Произошла ошибка при обработке команды /warn.")
+
+def mute_user_id(user_id, duration_minutes, reason, chat_id):
+    try:
+        current_time = datetime.datetime.now()
+        mute_end_time = current_time + datetime.timedelta(minutes=duration_minutes)
+        
+        bot.restrict_chat_member(chat_id, user_id, 
+                                 can_send_messages=False, 
+                                 until_date=int(mute_end_time.timestamp()))
+        
+        store.set_mute(chat_id, user_id, mute_end_time.timestamp(), reason, chat_id) # admin_id здесь - chat_id, если мут из чата
+        mute_scheduler.schedule((chat_id, user_id), mute_end_time.timestamp())
+        logger.info(f"Пользователь {user_id} замучен на {duration_minutes} минут. Причина: {reason}")
+        events.record(event_log.MUTE, chat_id, user_id, duration_minutes=duration_minutes, reason=reason, source="chat")
+        # Это сообщение отправляется в чат, если мут сделан через GUI и SEND_GUI_CONFIRMATIONS_TO_CHAT = True
+        # или если это автоматический мут (тогда вызывается отсюда)
+        if SEND_GUI_CONFIRMATIONS_TO_CHAT: # Отправляем только если включено
+            bot.send_message(chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> замучен на {duration_minutes} минут. Причина: {reason}", parse_mode='HTML')
+    except Exception as e:
+        logger.error(f"Ошибка при мутировании пользователя {user_id}: {e}", exc_info=True)
+
+# --- Массовые действия ---
+# Запросы идут в BULK_ACTION_WORKERS потоков через ограничитель частоты; хранилище и планировщик обновляются одной пачкой
+bulk_executor = BulkExecutor(BULK_ACTION_WORKERS)
+
+BULK_ACTION_NAMES = {'ban': "Бан", 'mute': "Мут", 'unban': "Разбан", 'unmute': "Размут"}
+
+def run_bulk_action(action, chat_id, user_ids, reason="Без причины", duration_minutes=60, source="gui", on_progress=None,
+                    bot_instance=None):
+    """
+    Бан, мут, разбан или размут списка пользователей в чате. Возвращает BulkResult с результатом по каждому ID.
+    bot_instance - через кого идут запросы (по умолчанию bot; asyncio-движок передает свой общий клиент).
+    """
+    if bot_instance is None:
+        bot_instance = bot
+    if action == 'ban':
+        def apply(user_id):
+            bot_instance.ban_chat_member(chat_id, user_id)
+    elif action == 'unban':
+        def apply(user_id):
+            bot_instance.unban_chat_member(chat_id, user_id)
+    elif action == 'mute':
+        mute_end_time = time.time() + duration_minutes * 60
+        def apply(user_id):
+            bot_instance.restrict_chat_member(chat_id, user_id, can_send_messages=False, until_date=int(mute_end_time))
+    elif action == 'unmute':
+        def apply(user_id):
+            bot_instance.restrict_chat_member(chat_id, user_id, can_send_messages=True, can_add_web_page_previews=True,
+                                              can_send_media_messages=True, can_send_other_messages=True)
+    else:
+        raise ValueError(f"Неизвестное массовое действие: {action}")
+
+    result = bulk_executor.run(f"{BULK_ACTION_NAMES[action]} в чате {chat_id}", user_ids, apply, on_progress)
+    keys = [(chat_id, user_id) for user_id in result.succeeded]
+    if action == 'mute':
+        store.set_mutes([(chat_id, user_id, mute_end_time, reason, source.upper()) for user_id in result.succeeded])
+        mute_scheduler.schedule_many([(key, mute_end_time) for key in keys])
+    elif action == 'unmute':
+        store.clear_mutes(keys)
+        for key in keys:
+            mute_scheduler.cancel(key)
+    event_type = {'ban': event_log.BAN, 'mute': event_log.MUTE, 'unban': event_log.UNBAN, 'unmute': event_log.UNMUTE}[action]
+    for user_id in result.succeeded:
+        events.record(event_type, chat_id, user_id, reason=reason, source=source, bulk=True)
+    return result
+
+@bot.message_handler(commands=['ban_ids'])
+@timed(metrics.HANDLER_SECONDS, 'ban_ids_command', errors=metrics.HANDLER_ERRORS)
+def ban_ids_command(message):
+    """/ban_ids 111 222 333 [причина] - массовый бан в этом чате с ходом выполнения в одном редактируемом сообщении."""
+    if not is_admin(message.from_user.id):
+        bot.reply_to(message, "У вас нет прав для использования этой команды.")
+        return
+    args = message.text.split(maxsplit=1)
+    user_ids, reason = split_leading_ids(args[1] if len(args) > 1 else '')
+    reason = reason or "Без причины"
+    if not user_ids:
+        bot.reply_to(message, "Использование: /ban_ids 111111 222222 333333 [причина]")
+        return
+    try:
+        status = bot.reply_to(message, f"Бан: 0/{len(user_ids)}...")
+
+        def on_progress(done, total):
+            if done < total:
+                bot.edit_message_text(f"Бан: {done}/{total}...", message.chat.id, status.message_id)
+
+        result = run_bulk_action('ban', message.chat.id, user_ids, reason, source="chat", on_progress=on_progress)
+        bot.edit_message_text(result.summary(max_errors=20), message.chat.id, status.message_id)
+        logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Администратор {message.from_user.id} выполнил /ban_ids: "
+                    f"забанено {len(result.succeeded)} из {len(user_ids)}")
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении команды /ban_ids: {e}", exc_info=True)
+        bot.reply_to(message, "Произошла ошибка при обработке команды /ban_ids.")
+
+# Обработчик текстовых сообщений
+@bot.message_handler(func=lambda message: True, content_types=['text'])
+@timed(metrics.HANDLER_SECONDS, 'handle_text', errors=metrics.HANDLER_ERRORS)
+def handle_text(message):
+    # Строка лога собирается, только если сообщение попадет в лог (уровень и выборка MESSAGE_LOG_*)
+    if message_log.should_log():
+        full_name_or_empty = ((message.from_user.first_name or '') + ' ' + (message.from_user.last_name or '')).strip()
+        message_log.log("[%s (ID: %s) (Type: %s)] - [%s (ID: %s) (Username: @%s)]: %s",
+                        message.chat.title, message.chat.id, message.chat.type,
+                        full_name_or_empty, message.from_user.id, message.from_user.username or '', message.text)
+    if EVENT_LOG_MESSAGES:
+        events.record(event_log.MESSAGE, message.chat.id, message.from_user.id, message_id=message.message_id,
+                      username=message.from_user.username, text=message.text)
+
+    if message.chat.type in ['group', 'supergroup']:
+        settings = chat_configs.get(message.chat.id)
+        verdict = check_message(message, settings)
+        if verdict is None:
+            return
+        kind, detail = verdict
+        if kind == 'flood':
+            deletion_batcher.delete(message.chat.id, message.message_id)
+            logger.info(f"[{message.chat.title} (ID: {message.chat.id})] - Антифлуд ({detail}): пользователь {message.from_user.id}")
+            events.record(event_log.DELETE, message.chat.id, message.from_user.id, message_id=message.message_id, reason=detail)
+            mute_user_id(message.from_user.id, settings.flood_mute_minutes, FLOOD_REASONS[detail], message.chat.id)
+        elif kind == 'near_duplicates':
+            punish_near_duplicates(message.chat.id, detail, settings)
+        else:
+            apply_rule(message, settings, detail)
+
+# --- НОВЫЕ ФУНКЦИИ ДЛЯ ОБРАБОТКИ КОМАНД ИЗ GUI ---
+
+# Функция для безопасного получения ID пользователя из @username или прямого ID
+def get_user_id_from_arg(bot_instance, chat_id, arg):
+    """
+    Пытается получить ID пользователя из аргумента.
+    @username ищется в кэше username -> ID (без запросов к API): бот знает пользователей, которых уже видел.
+    """
+    if arg.startswith('@'):
+        user_id = username_cache.resolve(arg)
+        if user_id is None:
+            logger.warning(f"Username '{arg}' не найден в кэше: бот еще не видел сообщений этого пользователя. Используйте числовой ID.")
+        else:
+            logger.info(f"Username '{arg}' найден в кэше: ID {user_id}.")
+        return user_id
+    else:
+        try:
+            return int(arg)
+        except ValueError:
+            logger.error(f"Некорректный ID пользователя в аргументе: {arg}")
+            return None
+
+def process_gui_command(command_str, bot_instance, progress=None):
+    """
+    Обрабатывает команды, полученные из GUI.
+    Команда может начинаться с "chat:<chat_id> " - тогда она выполняется в этом чате, иначе в MAIN_CHAT_ID.
+    Массовые команды: /bulk_ban <id,id,...> [причина], /bulk_mute <id,id,...> <минуты> [причина],
+    /bulk_unban <id,id,...>, /bulk_unmute <id,id,...>; progress(done, total) сообщает GUI ход их выполнения.
+    Возвращает (ok, text) - ответ, который канал команд отправит обратно в GUI.
+    """
+    logger.info(f"Получена команда из GUI: {command_str}")
+    try:
+        target_chat_id = MAIN_CHAT_ID
+        if command_str.startswith('chat:'):
+            chat_arg, _, command_str = command_str.partition(' ')
+            target_chat_id = int(chat_arg[len('chat:'):])
+        events.record(event_log.GUI_COMMAND, target_chat_id, command=command_str)
+
+        parts = command_str.split(' ', 3) # Разбиваем на 4 части: команда, цель, длительность, причина
+        cmd = parts[0]
+
+        # Специальная команда для отправки произвольного сообщения из GUI
+        if cmd == "/send_message_to_main_chat":
+            message_text = " ".join(parts[1:]) if len(parts) > 1 else ""
+            if message_text:
+                bot_instance.send_message(target_chat_id, message_text, parse_mode='HTML')
+                logger.info(f"GUI: Отправлено сообщение в чат {target_chat_id}: \"{message_text}\"")
+                return True, f"Сообщение отправлено в чат {target_chat_id}."
+            logger.warning("GUI: Попытка отправить пустое сообщение в чат.")
+            return False, "Пустое сообщение не отправлено."
+
+        # Перезагрузка списка плохих слов из config.py без перезапуска бота
+        if cmd == "/reload_bad_words":
+            words_count = reload_bad_words()
+            return True, f"Список плохих слов перезагружен ({words_count} слов)."
+
+        # Массовые действия по списку ID через запятую
+        if cmd.startswith("/bulk_"):
+            action = cmd[len("/bulk_"):]
+            if action not in BULK_ACTION_NAMES:
+                return False, f"Неизвестная команда: {cmd}"
+            user_ids, invalid = parse_user_ids(parts[1] if len(parts) > 1 else "")
+            if invalid or not user_ids:
+                return False, f"Некорректные ID: {', '.join(invalid) or 'список пуст'}"
+            duration_minutes = 60
+            reason_parts = parts[2:]
+            if action == 'mute':
+                if len(parts) > 2 and parts[2].isdigit() and int(parts[2]) > 0:
+                    duration_minutes = int(parts[2])
+                reason_parts = parts[3:]
+            reason = ' '.join(reason_parts) or "Без причины"
+            result = run_bulk_action(action, target_chat_id, user_ids, reason, duration_minutes, "gui", progress, bot_instance)
+            if SEND_GUI_CONFIRMATIONS_TO_CHAT and result.succeeded:
+                bot_instance.send_message(target_chat_id, f"{BULK_ACTION_NAMES[action]} через GUI: {len(result.succeeded)} пользователей. Причина: {reason}")
+            return True, result.summary() # Ошибки по отдельным ID - часть итога, а не ошибка команды
+
+        # Далее идут команды, требующие user_id
+        target_arg = parts[1] if len(parts) > 1 else None
+        user_id = get_user_id_from_arg(bot_instance, target_chat_id, target_arg) if target_arg else None
+        
+        if not user_id:
+            logger.error(f"Не удалось получить корректный ID пользователя для команды из GUI: {command_str}")
+            return False, "Некорректный ID пользователя."
+
+        if cmd == "/ban_id":
+            reason = parts[2] if len(parts) > 2 else "Без причины"
+            bot_instance.ban_chat_member(target_chat_id, user_id)
+            logger.info(f"GUI: Пользователь {user_id} забанен в чате {target_chat_id}. Причина: {reason}")
+            events.record(event_log.BAN, target_chat_id, user_id, reason=reason, source="gui")
+            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
+                bot_instance.send_message(target_chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> забанен через GUI. Причина: {reason}", parse_mode='HTML')
+            return True, f"Пользователь {user_id} забанен в чате {target_chat_id}."
+
+        elif cmd == "/mute":
+            duration_minutes = 0
+            if len(parts) > 2:
+                try:
+                    duration_int = int(parts[2])
+                    if duration_int <= 0: # Мут должен быть хотя бы на 1 минуту, или 0 для бессрочного
+                        logger.warning(f"GUI: Длительность мута должна быть положительным числом, получено '{parts[2]}'. Установлено 1 минута.")
+                        duration_minutes = 1
+                    else:
+                        duration_minutes = duration_int
+                except ValueError:
+                    logger.warning(f"GUI: Некорректная длительность мута '{parts[2]}'. Установлено 60 минут по умолчанию.")
+                    duration_minutes = 60 # Значение по умолчанию
+            else:
+                duration_minutes = 60 # Значение по умолчанию, если длительность не указана
+
+            reason = parts[3] if len(parts) > 3 else "Без причины"
+            
+            until_date = int(time.time() + duration_minutes * 60) if duration_minutes > 0 else 0
+            bot_instance.restrict_chat_member(target_chat_id, user_id, can_send_messages=False, until_date=until_date)
+            
+            # Сохранение мута в хранилище
+            mute_end_time = time.time() + duration_minutes * 60
+            store.set_mute(target_chat_id, user_id, mute_end_time, reason, "GUI") # Указываем, что мут был через GUI
+            mute_scheduler.schedule((target_chat_id, user_id), mute_end_time)
+
+            logger.info(f"GUI: Пользователь {user_id} замучен на {duration_minutes} минут. Причина: {reason}")
+            events.record(event_log.MUTE, target_chat_id, user_id, duration_minutes=duration_minutes, reason=reason, source="gui")
+            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
+                bot_instance.send_message(target_chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> замучен на {duration_minutes} минут через GUI. Причина: {reason}", parse_mode='HTML')
+            return True, f"Пользователь {user_id} замучен в чате {target_chat_id} на {duration_minutes} минут."
+
+        elif cmd == "/unban_id":
+            bot_instance.unban_chat_member(target_chat_id, user_id)
+            logger.info(f"GUI: Пользователь {user_id} разбанен в чате {target_chat_id}.")
+            events.record(event_log.UNBAN, target_chat_id, user_id, source="gui")
+            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
+                bot_instance.send_message(target_chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> разбанен через GUI.", parse_mode='HTML')
+            return True, f"Пользователь {user_id} разбанен в чате {target_chat_id}."
+
+        elif cmd == "/unmute":
+            bot_instance.restrict_chat_member(target_chat_id, user_id, can_send_messages=True, can_add_web_page_previews=True,
+                                              can_send_media_messages=True, can_send_other_messages=True)
+            store.clear_mute(target_chat_id, user_id)
+            mute_scheduler.cancel((target_chat_id, user_id))
+            logger.info(f"GUI: Пользователь {user_id} размучен в чате {target_chat_id}.")
+            events.record(event_log.UNMUTE, target_chat_id, user_id, source="gui")
+            if SEND_GUI_CONFIRMATIONS_TO_CHAT: # <<< НОВОЕ УСЛОВИЕ
+                bot_instance.send_message(target_chat_id, f"Пользователь <a href='tg://user?id={user_id}'>{user_id}</a> размучен через GUI.", parse_mode='HTML')
+            return True, f"Пользователь {user_id} размучен в чате {target_chat_id}."
+        else:
+            logger.warning(f"GUI: Неизвестная команда: {command_str}")
+            return False, f"Неизвестная команда: {cmd}"
+
+    except telebot.apihelper.ApiTelegramException as e:
+        logger.error(f"GUI: Ошибка Telegram API при выполнении команды '{command_str}': {e}", exc_info=True)
+        # Отправляем сообщение об ошибке только в логи и GUI, не в чат
+        return False, f"Ошибка Telegram API: {e}"
+    except Exception as e:
+        logger.error(f"GUI: Неизвестная ошибка при выполнении команды '{command_str}': {e}", exc_info=True)
+        return False, f"Ошибка: {e}"
+
+# --- Функция, которая слушает команды от GUI ---
+webhook_server = None # Запущенный WebhookServer (в режиме webhook), чтобы SHUTDOWN мог его остановить
+
+def stop_receiving_updates():
+    """Останавливает polling или webhook-сервер; после этого run_main_bot_process закрывает ресурсы и завершается."""
+    if webhook_server is not None:
+        webhook_server.shutdown()
+    else:
+        raw_bot.stop_polling()
+
+def run_gui_command(command_str, bot_instance, progress=None):
+    """process_gui_command с замером времени для метрик (метка - имя команды без аргументов)."""
+    started = time.perf_counter()
+    try:
+        return process_gui_command(command_str, bot_instance, progress)
+    finally:
+        metrics.GUI_COMMAND_SECONDS.observe(time.perf_counter() - started, command_str.split(' ', 1)[0])
+
+def gui_command_listener_thread(command_channel, bot_instance):
+    logger.info("GUI command listener thread started.")
+    # Каждая команда получает ответ (результат или ошибку); SHUTDOWN подтверждается и останавливает бота
+    ipc_channel.serve_commands(command_channel, lambda command, progress: run_gui_command(command, bot_instance, progress),
+                               stop_receiving_updates)
+
+# --- Функция, которая запускает весь основной код бота ---
+# Эта функция будет вызвана из gui_app.py как отдельный процесс
+def run_webhook():
+    """Принимает обновления через встроенный HTTP-сервер вместо long polling."""
+    from webhook_server import WebhookServer # Импорт здесь: в режиме polling сервер не нужен
+    if not WEBHOOK_URL:
+        raise ValueError("UPDATE_MODE = 'webhook', но WEBHOOK_URL в config.py не задан.")
+    global webhook_server
+    webhook_server = WebhookServer(bot, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN)
+    webhook_server.register(WEBHOOK_URL)
+    try:
+        webhook_server.serve_forever()
+    finally:
+        webhook_server.shutdown()
+
+metrics_server = None # HTTP-сервер /metrics (при METRICS_ENABLED)
+
+def start_services():
+    """Запускает фоновые компоненты: журнал событий, кэш username, сервер метрик, планировщик мутов и диспетчер."""
+    global metrics_server
+    events.start()
+    username_cache.start()
+    if update_recorder:
+        update_recorder.start()
+    metrics_server = start_metrics_server()
+
+    # Загружаем активные муты в планировщик: уже истекшие будут сняты сразу после старта
+    mute_scheduler.schedule_many(scheduled_mutes())
+    mute_scheduler.start()
+
+    if dispatcher:
+        dispatcher.start()
+
+def stop_services():
+    """Дообрабатывает принятые обновления, останавливает фоновые компоненты и закрывает хранилище."""
+    if dispatcher:
+        dispatcher.stop()
+    deletion_batcher.flush_all()
+    mute_scheduler.stop()
+    if update_recorder:
+        update_recorder.stop()
+    events.stop()
+    username_cache.stop()
+    if metrics_server is not None:
+        metrics_server.shutdown()
+    store.close()
+
+def run_main_bot_process(command_channel):
+    """command_channel - соединение с GUI (ipc_channel.connect_from_env()) или None при запуске без GUI."""
+    global bot # Убеждаемся, что бот доступен в этом процессе
+    
+    logger.info("Бот-процесс запущен из GUI." if command_channel else "Бот-процесс запущен без GUI.")
+
+    # Запускаем слушателя команд GUI в отдельном ПОТОКЕ
+    if command_channel is not None:
+        listener_thread = threading.Thread(target=gui_command_listener_thread, args=(command_channel, bot))
+        listener_thread.daemon = True # Поток завершится, когда завершится основной процесс бота
+        listener_thread.start()
+
+    start_services()
+
+    try:
+        logger.info("Бот запущен и готов к работе!")
+        logger.info("Бот запускается...")
+        if UPDATE_MODE == 'webhook':
+            run_webhook()
+        else:
+            bot.polling(none_stop=True, interval=2, timeout=20)
+    except Exception as e:
+        logger.error(f"Произошла критическая ошибка бота: {e}", exc_info=True)
+    finally:
+        stop_services()
+        logger.info("Бот остановлен.")
+        
+# Точка входа для скрипта, если он запускается напрямую (для отладки)
+if __name__ == '__main__':
+    # gui_app.py передает адрес и ключ своего канала команд через переменные окружения
+    command_channel = ipc_channel.connect_from_env()
+    if command_channel is None:
+        logger.warning("main.py запущен напрямую. Функции GUI будут недоступны без gui_app.py.")
+    if RUNTIME == 'asyncio':
+        # async_main импортирует main - регистрируем уже загруженный модуль, чтобы main.py не выполнился второй раз
+        sys.modules['main'] = sys.modules[__name__]
+        from async_main import run_async_bot_process
+        run_async_bot_process(command_channel)
+    else:
+        run_main_bot_process(command_channel)
\ No newline at end of file
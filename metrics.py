@@ -0,0 +1,280 @@
+# metrics.py - Метрики производительности бота в формате Prometheus
+#
+# Счетчики (Counter), гистограммы задержек (Histogram) и показатели (Gauge) с
+# метками. Пока метрики не включены (enable()), inc()/observe() и обертка timed()
+# сразу возвращаются после одной проверки флага, поэтому инструментирование можно
+# оставлять в горячих путях. serve() поднимает локальный HTTP-сервер:
+#   /metrics       - текстовый формат Prometheus;
+#   /metrics.json  - снимок с процентилями для панели метрик в gui_app.py.
+
+import bisect
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек, секунд
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_metrics = [] # Все созданные метрики в порядке создания
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled():
+    return _enabled
+
+
+def _escape_label_value(value):
+    # Формат Prometheus: в значении метки экранируются обратная косая черта, перевод строки и кавычка
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labels, extra=()):
+    pairs = list(zip(labelnames, labels)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {} # метки -> значение
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values.items())
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return {','.join(map(str, labels)): value for labels, value in self._values.items()}
+
+
+class Gauge:
+    """Текущее значение; function (если задана) вызывается при каждом чтении метрик."""
+
+    def __init__(self, name, documentation, function=None):
+        self.name = name
+        self.documentation = documentation
+        self._function = function
+        self._value = 0
+        _metrics.append(self)
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def value(self):
+        if self._function is None:
+            return self._value
+        try:
+            return self._function()
+        except Exception as e:
+            logger.warning(f"Метрика {self.name}: не удалось получить значение: {e}")
+            return float('nan')
+
+    def collect(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.value()}"]
+
+    def snapshot(self):
+        return self.value()
+
+
+class _HistogramSeries:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, size):
+        self.counts = [0] * size # По корзинам (не накопительно); последняя - +Inf
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # метки -> _HistogramSeries
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        if not _enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _HistogramSeries(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    def _copy(self):
+        with self._lock:
+            return {labels: (list(s.counts), s.total, s.count) for labels, s in self._series.items()}
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self._copy().items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+    def quantile(self, counts, count, q):
+        """Оценка квантиля по корзинам (линейно внутри корзины, как histogram_quantile в Prometheus)."""
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index >= len(self.buckets):
+                    return self.buckets[-1] # Выше последней границы оценить нельзя
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            ','.join(map(str, labels)): {
+                "count": count,
+                "sum": total,
+                "p50": self.quantile(counts, count, 0.5),
+                "p99": self.quantile(counts, count, 0.99),
+            }
+            for labels, (counts, total, count) in self._copy().items()
+        }
+
+
+def timed(histogram, *labels, errors=None):
+    """
+    Декоратор: время выполнения функции (обычной или async) в histogram с метками labels.
+    errors - Counter с теми же метками, увеличивается, если функция бросила исключение.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(*labels)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, *labels)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(*labels)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+
+# --- Метрики бота ---
+UPDATES = Counter('bot_updates_total', "Получено обновлений от Telegram")
+HANDLER_SECONDS = Histogram('bot_handler_seconds', "Время обработчиков сообщений и фоновых задач", ['handler'])
+HANDLER_ERRORS = Counter('bot_handler_errors_total', "Исключения в обработчиках", ['handler'])
+API_CALLS = Counter('bot_api_calls_total', "Запросы к Bot API", ['method'])
+API_ERRORS = Counter('bot_api_errors_total', "Ошибки запросов к Bot API по коду ответа", ['method', 'code'])
+API_SECONDS = Histogram('bot_api_call_seconds', "Время запроса к Bot API (без ожидания ограничителя частоты)", ['method'])
+STORAGE_SECONDS = Histogram('bot_storage_write_seconds', "Время записи в хранилище", ['operation'])
+GUI_COMMAND_SECONDS = Histogram('bot_gui_command_seconds', "Время выполнения команд из GUI", ['command'])
+REGEX_PATTERN_HITS = Counter('bot_regex_pattern_hits_total', "Сообщения, в которых сработал шаблон правила 'regex'", ['rule', 'pattern'])
+REGEX_OVER_BUDGET = Counter('bot_regex_over_budget_total', "Проверки правила 'regex', прерванные по бюджету времени", ['rule'])
+
+
+def collect_text():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def collect_json():
+    return {
+        "time": time.time(),
+        "enabled": _enabled,
+        "metrics": {metric.name: {"type": type(metric).__name__.lower(), "values": metric.snapshot()} for metric in _metrics},
+    }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = collect_text().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(collect_json(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Опросы Prometheus и GUI не засоряют лог
+
+
+def serve(host='127.0.0.1', port=9108):
+    """
+    Запускает HTTP-сервер метрик в фоновом потоке. Возвращает сервер (server.shutdown() - остановка).
+    Запросы обслуживаются по одному в этом же потоке: опрашивают редко, а показатели (например, число мутов
+    в хранилище) читаются через одно соединение с базой вместо нового на каждый запрос.
+    """
+    server = HTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http")
+    thread.daemon = True
+    thread.start()
+    logger.info(f"Метрики доступны на http://{host}:{server.server_address[1]}/metrics")
+    return server
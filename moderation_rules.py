@@ -0,0 +1,284 @@
+# moderation_rules.py - Правила модерации сообщений из config.py (MODERATION_RULES)
+#
+# Правило - словарь вида "если проверка match срабатывает count раз за
+# window_seconds секунд у одного пользователя, выполнить actions":
+#   {'name': 'links', 'match': 'links', 'count': 3, 'window_seconds': 600, 'actions': ['delete', 'warn']}
+#
+# При загрузке настроек правила чата компилируются в конвейер: проверки
+# создаются один раз (регулярные выражения компилируются, автомат плохих слов
+# берется из настроек чата), а порядок - от дешевых проверок к дорогим (при
+# равной стоимости - как в списке). Конвейер останавливается на первом
+# сработавшем правиле, поэтому на сообщение, которое уже удаляется за ссылку,
+# дорогие проверки не тратятся.
+#
+# Для каждого правила считается число проверок, срабатываний и суммарное время
+# проверки - так видно, какое правило дороже всего обходится каждому сообщению.
+# У правил 'regex' дополнительно считаются срабатывания каждого шаблона и случаи,
+# когда проверка не уложилась в бюджет времени (regex_filter.py).
+
+import logging
+import threading
+import time
+
+import flood_detector
+import metrics
+from regex_filter import PatternSet
+
+logger = logging.getLogger(__name__)
+
+# Проверки: имя -> (стоимость, фабрика). Фабрика получает правило, настройки чата и счетчики правила (RuleStats)
+# и возвращает функцию message -> подробности срабатывания (истина) или ложь
+_MATCHERS = {}
+
+ACTIONS = ('delete', 'notify', 'warn', 'mute', 'ban')
+
+# Под каким полем подробности срабатывания попадают в журнал событий
+DETAIL_FIELDS = {'bad_words': 'words', 'regex': 'patterns'}
+
+
+def _matcher(name, cost):
+    def register(factory):
+        _MATCHERS[name] = (cost, factory)
+        return factory
+    return register
+
+
+@_matcher('links', cost=0)
+def _match_links(rule, settings, stats):
+    """Ссылки в сообщении (по разметке Telegram, текст не просматривается)."""
+    return lambda message: any(entity.type in ('url', 'text_link') for entity in message.entities or ())
+
+
+@_matcher('mentions', cost=0)
+def _match_mentions(rule, settings, stats):
+    """Упоминания пользователей (@username или ссылка на пользователя)."""
+    return lambda message: any(entity.type in ('mention', 'text_mention') for entity in message.entities or ())
+
+
+@_matcher('length', cost=0)
+def _match_length(rule, settings, stats):
+    """Сообщение длиннее max_length символов."""
+    max_length = rule['max_length']
+    return lambda message: len(message.text) > max_length
+
+
+@_matcher('caps', cost=1)
+def _match_caps(rule, settings, stats):
+    """Текст из не меньше min_length букв, из которых доля ratio - заглавные."""
+    min_length = rule.get('min_length', 10)
+    ratio = rule.get('ratio', 0.7)
+
+    def match(message):
+        text = message.text
+        if len(text) < min_length or text.islower(): # Обычное сообщение без заглавных отсекается одним проходом в C
+            return False
+        letters = sum(map(str.isalpha, text))
+        return letters >= min_length and sum(map(str.isupper, text)) >= letters * ratio
+    return match
+
+
+@_matcher('bad_words', cost=2)
+def _match_bad_words(rule, settings, stats):
+    """Плохие слова чата (BAD_WORDS или 'bad_words' из CHAT_SETTINGS). Подробности - найденные слова."""
+    matcher = settings.bad_word_matcher
+    return lambda message: matcher.find_all(message.text)
+
+
+@_matcher('regex', cost=3)
+def _match_regex(rule, settings, stats):
+    """
+    Регулярные выражения: 'pattern' (одно) или 'patterns' (словарь имя -> шаблон или список), без учета регистра,
+    если не указано 'ignore_case': False. Все шаблоны проверяются за один проход; подробности - имена сработавших.
+    На сообщение отводится не больше 'time_budget_ms' (по умолчанию REGEX_TIME_BUDGET_MS).
+    """
+    budget_ms = rule.get('time_budget_ms', settings.regex_time_budget_ms)
+    patterns = PatternSet(_rule_patterns(rule), rule.get('ignore_case', True), budget_ms / 1000)
+
+    def match(message):
+        names, over_budget = patterns.search(message.text)
+        if names or over_budget:
+            stats.record_patterns(names, over_budget)
+        return names
+    return match
+
+
+def _rule_patterns(rule):
+    """Шаблоны правила 'regex' как словарь имя -> шаблон (именем одиночного шаблона служит имя правила)."""
+    if 'patterns' in rule:
+        patterns = rule['patterns']
+        return dict(patterns) if isinstance(patterns, dict) else {pattern: pattern for pattern in patterns}
+    return {rule['name']: rule['pattern']}
+
+
+class RuleStats:
+    """Счетчики одного правила (общие для всех чатов)."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.evaluations = 0
+        self.matches = 0     # Проверка сработала
+        self.hits = 0        # Сработала нужное число раз за окно - выполнены действия
+        self.total_seconds = 0.0
+        self.pattern_hits = {} # Для правил 'regex': имя шаблона -> число сообщений, где он сработал
+        self.over_budget = 0   # Для правил 'regex': проверка прервана по бюджету времени
+
+    def record_patterns(self, names, over_budget):
+        with self._lock:
+            for name in names:
+                self.pattern_hits[name] = self.pattern_hits.get(name, 0) + 1
+            if over_budget:
+                self.over_budget += 1
+        for name in names:
+            metrics.REGEX_PATTERN_HITS.inc(self.name, name)
+        if over_budget:
+            metrics.REGEX_OVER_BUDGET.inc(self.name)
+
+    def record(self, seconds, matched, hit):
+        with self._lock:
+            self.evaluations += 1
+            self.total_seconds += seconds
+            if matched:
+                self.matches += 1
+                if hit:
+                    self.hits += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "evaluations": self.evaluations,
+                "matches": self.matches,
+                "hits": self.hits,
+                "avg_us": self.total_seconds / self.evaluations * 1e6 if self.evaluations else 0.0,
+                "total_seconds": self.total_seconds,
+                "pattern_hits": dict(self.pattern_hits),
+                "over_budget": self.over_budget,
+            }
+
+
+class RuleStatsRegistry:
+    """Счетчики всех правил по имени; переживают перезагрузку настроек. Периодически пишет сводку в лог."""
+
+    def __init__(self, stats_interval=60):
+        self._lock = threading.Lock()
+        self._stats = {}
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="rules-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def get(self, name):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = RuleStats(name)
+            return stats
+
+    def snapshot(self):
+        with self._lock:
+            items = list(self._stats.items())
+        return {name: stats.snapshot() for name, stats in items}
+
+    def _stats_reporter(self, interval):
+        while True:
+            time.sleep(interval)
+            snapshot = self.snapshot()
+            if any(stats["evaluations"] for stats in snapshot.values()):
+                logger.info("Правила модерации: " + "; ".join(
+                    f"{name} - проверок {stats['evaluations']}, срабатываний {stats['hits']}, "
+                    f"{stats['avg_us']:.1f} мкс/проверка{_format_patterns(stats)}" for name, stats in snapshot.items()))
+
+
+def _format_patterns(stats):
+    if not stats["pattern_hits"] and not stats["over_budget"]:
+        return ""
+    top = sorted(stats["pattern_hits"].items(), key=lambda item: -item[1])[:5]
+    text = f" (шаблоны: {', '.join(f'{name} {count}' for name, count in top) or 'нет'}"
+    if stats["over_budget"]:
+        text += f", превышений бюджета времени {stats['over_budget']}"
+    return text + ")"
+
+
+class CompiledRule:
+    __slots__ = ('name', 'match', 'cost', 'predicate', 'count', 'window_seconds', 'counter', 'actions',
+                 'mute_minutes', 'reason', 'notice', 'notice_summary', 'stats')
+
+    def __init__(self, rule, settings, stats_registry):
+        self.name = rule['name']
+        self.match = rule['match']
+        self.cost, factory = _MATCHERS[self.match]
+        self.stats = stats_registry.get(self.name)
+        self.predicate = factory(rule, settings, self.stats)
+        self.count = rule.get('count', 1)
+        self.window_seconds = rule.get('window_seconds', 60)
+        # "count раз за window_seconds" - то же скользящее окно, что и у антифлуда
+        self.counter = flood_detector.FloodDetector(idle_seconds=self.window_seconds, stats_interval=0) if self.count > 1 else None
+        self.actions = tuple(rule['actions'])
+        self.mute_minutes = rule.get('mute_minutes', 60)
+        self.reason = rule.get('reason', f"Правило {self.name}")
+        self.notice = rule.get('notice', "{user}, ваше сообщение удалено за нарушение правил.")
+        self.notice_summary = rule.get('notice_summary', "Удалено сообщений за нарушение правил: {count}. Нарушители: {items}.")
+
+    def _counted(self, message):
+        if self.counter is None:
+            return True
+        return self.counter.check(message.chat.id, message.from_user.id, None, self.count, self.window_seconds, 0, 0) is not None
+
+
+class RuleHit:
+    __slots__ = ('rule', 'detail')
+
+    def __init__(self, rule, detail):
+        self.rule = rule
+        self.detail = detail # Что нашла проверка (например, список плохих слов или имена шаблонов)
+
+
+def validate_rules(rules, where="MODERATION_RULES"):
+    """Проверяет описание правил; ошибки - ValueError с именем правила, как и для неизвестных ключей CHAT_SETTINGS."""
+    names = set()
+    for index, rule in enumerate(rules):
+        name = rule.get('name') or f"#{index + 1}"
+        if not rule.get('name'):
+            raise ValueError(f"{where}: у правила {name} не задано имя ('name')")
+        if name in names:
+            raise ValueError(f"{where}: правило {name} описано дважды")
+        names.add(name)
+        if rule.get('match') not in _MATCHERS:
+            raise ValueError(f"{where}[{name}]: неизвестная проверка {rule.get('match')!r}, "
+                             f"доступны: {', '.join(sorted(_MATCHERS))}")
+        unknown_actions = set(rule.get('actions') or ()) - set(ACTIONS)
+        if not rule.get('actions') or unknown_actions:
+            raise ValueError(f"{where}[{name}]: 'actions' должен быть непустым списком из {', '.join(ACTIONS)}")
+        if rule['match'] == 'regex':
+            if ('pattern' in rule) == ('patterns' in rule) or not rule.get('pattern', rule.get('patterns')):
+                raise ValueError(f"{where}[{name}]: для проверки 'regex' нужен 'pattern' или непустой 'patterns'")
+            try:
+                PatternSet(_rule_patterns(rule), rule.get('ignore_case', True))
+            except ValueError as e:
+                raise ValueError(f"{where}[{name}]: {e}")
+        if rule['match'] == 'length' and not isinstance(rule.get('max_length'), int):
+            raise ValueError(f"{where}[{name}]: для проверки 'length' нужен 'max_length'")
+
+
+class RulePipeline:
+    """Скомпилированные правила одного чата, от дешевых к дорогим."""
+
+    def __init__(self, rules, settings, stats_registry, where="MODERATION_RULES"):
+        validate_rules(rules, where)
+        compiled = [CompiledRule(rule, settings, stats_registry) for rule in rules]
+        self.rules = sorted(compiled, key=lambda rule: rule.cost) # sorted устойчива: при равной стоимости - порядок из списка
+
+    def __len__(self):
+        return len(self.rules)
+
+    def evaluate(self, message):
+        """Первое правило, сработавшее нужное число раз за окно (RuleHit), или None."""
+        perf_counter = time.perf_counter
+        for rule in self.rules:
+            started = perf_counter()
+            detail = rule.predicate(message)
+            hit = bool(detail) and rule._counted(message)
+            rule.stats.record(perf_counter() - started, detail, hit)
+            if hit:
+                return RuleHit(rule, detail)
+        return None
@@ -0,0 +1,191 @@
+# mute_scheduler.py - Планировщик окончания мутов на куче (heapq)
+#
+# Вместо проверки всех мутов раз в 30 минут поток спит ровно до ближайшего
+# окончания мута. Если появляется более ранний срок (новый мут из чата или GUI),
+# поток будится сразу. Все муты, истекшие к моменту пробуждения, передаются
+# обработчику одной пачкой.
+
+import asyncio
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Максимальное время сна без пробуждения. Страхует от перевода системных часов.
+MAX_SLEEP_SECONDS = 300
+
+
+class _DeadlineHeap:
+    """Куча сроков (end_time, user_id) с ленивым удалением снятых и перенесенных мутов."""
+
+    def __init__(self):
+        self.heap = []       # (end_time, user_id); устаревшие записи удаляются лениво
+        self.deadlines = {}  # user_id -> актуальное end_time
+
+    def push(self, user_id, end_time):
+        """Добавляет срок. Возвращает True, если он стал ближайшим."""
+        earliest = not self.heap or end_time < self.heap[0][0]
+        self.deadlines[user_id] = end_time
+        heapq.heappush(self.heap, (end_time, user_id))
+        return earliest
+
+    def push_many(self, items):
+        for user_id, end_time in items:
+            self.deadlines[user_id] = end_time
+            self.heap.append((end_time, user_id))
+        heapq.heapify(self.heap)
+
+    def cancel(self, user_id):
+        self.deadlines.pop(user_id, None)
+
+    def pop_due(self, now):
+        due = []
+        while self.heap:
+            end_time, user_id = self.heap[0]
+            if self.deadlines.get(user_id) != end_time:
+                heapq.heappop(self.heap) # Мут снят или перенесен
+                continue
+            if end_time > now:
+                break
+            heapq.heappop(self.heap)
+            del self.deadlines[user_id]
+            due.append(user_id)
+        return due
+
+    def sleep_time(self, now):
+        if not self.heap:
+            return MAX_SLEEP_SECONDS
+        return max(min(self.heap[0][0] - now, MAX_SLEEP_SECONDS), 0)
+
+
+class MuteScheduler:
+    def __init__(self, on_expired, clock=time.time):
+        """on_expired(user_ids) вызывается из потока планировщика со списком истекших мутов."""
+        self._on_expired = on_expired
+        self._clock = clock
+        self._deadlines = _DeadlineHeap()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._deadlines.deadlines)
+
+    def schedule(self, user_id, end_time):
+        """Добавляет или переносит мут пользователя. Будит поток, если срок раньше текущего ближайшего."""
+        with self._cond:
+            if self._deadlines.push(user_id, end_time):
+                self._cond.notify()
+
+    def schedule_many(self, items):
+        """Массовая загрузка (user_id, end_time), например из хранилища при старте."""
+        with self._cond:
+            self._deadlines.push_many(items)
+            self._cond.notify()
+
+    def cancel(self, user_id):
+        """Снимает мут с планирования (запись в куче станет устаревшей и будет пропущена)."""
+        with self._cond:
+            self._deadlines.cancel(user_id)
+
+    def _run(self):
+        logger.info("Планировщик мутов запущен.")
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        logger.info("Планировщик мутов остановлен.")
+                        return
+                    due = self._deadlines.pop_due(self._clock())
+                    if due:
+                        break
+                    self._cond.wait(self._deadlines.sleep_time(self._clock()))
+            # Обработчик вызывается вне блокировки, чтобы schedule() из других потоков не ждал API Telegram
+            try:
+                self._on_expired(due)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке истекших мутов {due}: {e}", exc_info=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="mute-scheduler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class AsyncMuteScheduler:
+    """
+    Тот же планировщик для asyncio: работает задачей в цикле событий.
+    schedule() и cancel() можно вызывать и из других потоков - изменения передаются в цикл событий.
+    """
+
+    def __init__(self, on_expired, clock=time.time):
+        """on_expired(user_ids) - корутина, вызывается со списком истекших мутов."""
+        self._on_expired = on_expired
+        self._clock = clock
+        self._deadlines = _DeadlineHeap()
+        self._wakeup = None
+        self._loop = None
+
+    def __len__(self):
+        return len(self._deadlines.deadlines)
+
+    def _call_in_loop(self, func, *args):
+        if self._loop is None or self._loop_is_current():
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _loop_is_current(self):
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _push(self, user_id, end_time):
+        if self._deadlines.push(user_id, end_time) and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _push_many(self, items):
+        self._deadlines.push_many(items)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def schedule(self, user_id, end_time):
+        self._call_in_loop(self._push, user_id, end_time)
+
+    def schedule_many(self, items):
+        self._call_in_loop(self._push_many, list(items))
+
+    def cancel(self, user_id):
+        self._call_in_loop(self._deadlines.cancel, user_id)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info("Планировщик мутов (asyncio) запущен.")
+        try:
+            while True:
+                due = self._deadlines.pop_due(self._clock())
+                if due:
+                    try:
+                        await self._on_expired(due)
+                    except Exception as e:
+                        logger.error(f"Ошибка при обработке истекших мутов {due}: {e}", exc_info=True)
+                    continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._deadlines.sleep_time(self._clock()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            logger.info("Планировщик мутов (asyncio) остановлен.")
@@ -0,0 +1,318 @@
+# rate_limiter.py - Ограничение частоты исходящих запросов к Bot API
+#
+# RateLimitedBot оборачивает TeleBot: запросы, которые пишут в чат или меняют его
+# участников, проходят через "ведра с токенами" - общее на весь бот и отдельное
+# на каждый чат (только для отправки сообщений). Вместо ответа 429 от Telegram
+# запрос немного ждет своей очереди. Если 429 все же пришел, бот выжидает
+# retry_after и повторяет запрос. Однотипные уведомления в чат за короткое окно
+# объединяются в одно сообщение-сводку. Все остальные атрибуты (message_handler,
+# polling и т.д.) передаются исходному боту без изменений.
+#
+# AsyncRateLimitedBot - то же для AsyncTeleBot (asyncio-движок): ведра, счетчики
+# и объединение уведомлений те же, только ожидание - asyncio.sleep, а отложенная
+# отправка сводки - таймер цикла событий.
+
+import asyncio
+import logging
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ведро с токенами с резервированием: вызывающий сразу узнает, сколько ему ждать."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate             # Токенов в секунду
+        self.capacity = capacity     # Размер всплеска
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0     # Пауза после 429 (retry_after)
+
+    def reserve(self, now):
+        """Забирает токен (баланс может уйти в минус) и возвращает задержку до момента, когда токен "наступит"."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.blocked_until - now)
+
+
+class RateLimitedBot:
+    # Методы, которые отправляют сообщения в чат: для них действует еще и лимит чата
+    SEND_METHODS = ('send_message', 'reply_to', 'edit_message_text')
+    # Остальные действия модерации: только общий лимит бота
+    ACTION_METHODS = ('delete_message', 'delete_messages', 'restrict_chat_member', 'ban_chat_member', 'unban_chat_member')
+
+    def __init__(self, bot, global_per_second=30, chat_per_minute=20, chat_burst=5, max_retries=3,
+                 coalesce_window=3.0, stats_interval=60):
+        self._bot = bot
+        self._lock = threading.Lock()
+        self._global_bucket = TokenBucket(global_per_second, global_per_second)
+        self._chat_buckets = {}
+        self._chat_rate = chat_per_minute / 60.0
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._coalesce_window = coalesce_window
+        self._pending_notices = {} # (chat_id, key) -> {"texts": [...], "items": [...], "summary": str}
+        # Метрики
+        self.waiting = 0           # Сколько запросов сейчас ждут своей очереди
+        self.max_waiting = 0
+        self.calls = 0
+        self.throttled = 0         # Сколько запросов пришлось задержать
+        self.throttle_delay = 0.0  # Суммарная задержка, секунд
+        self.retry_after_hits = 0  # Сколько раз Telegram ответил 429
+        self.coalesced = 0         # Сколько уведомлений было поглощено сводками
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="rate-limiter-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def __getattr__(self, name):
+        return getattr(self._bot, name)
+
+    # --- Ожидание токенов ---
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    def _reserve(self, chat_id, is_send):
+        """Резервирует токены запроса и возвращает, сколько секунд ему ждать (ожидающий учитывается в waiting)."""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._global_bucket.reserve(now)
+            if is_send and chat_id is not None:
+                delay = max(delay, self._chat_bucket(chat_id).reserve(now))
+            self.calls += 1
+            if delay <= 0:
+                return 0.0
+            self.throttled += 1
+            self.throttle_delay += delay
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            return delay
+
+    def _waited(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def _acquire(self, chat_id, is_send):
+        delay = self._reserve(chat_id, is_send)
+        if delay <= 0:
+            return
+        try:
+            time.sleep(delay)
+        finally:
+            self._waited()
+
+    def _penalize(self, chat_id, is_send, retry_after):
+        with self._lock:
+            until = time.monotonic() + retry_after
+            bucket = self._chat_bucket(chat_id) if is_send and chat_id is not None else self._global_bucket
+            bucket.blocked_until = max(bucket.blocked_until, until)
+            self.retry_after_hits += 1
+
+    def _retry_after(self, e, method_name, chat_id, is_send, attempt):
+        """Ответ 429: запоминает паузу retry_after и возвращает True, если запрос можно повторить."""
+        metrics.API_ERRORS.inc(method_name, e.error_code)
+        if e.error_code != 429 or attempt == self._max_retries:
+            return False
+        retry_after = (e.result_json or {}).get('parameters', {}).get('retry_after', 1)
+        logger.warning(f"Telegram ограничил частоту запросов ({method_name}, чат {chat_id}): повтор через {retry_after} с.")
+        self._penalize(chat_id, is_send, retry_after)
+        return True
+
+    def _call(self, method_name, chat_id, *args, **kwargs):
+        is_send = method_name in self.SEND_METHODS
+        method = getattr(self._bot, method_name)
+        for attempt in range(self._max_retries + 1):
+            self._acquire(chat_id, is_send)
+            metrics.API_CALLS.inc(method_name)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except ApiTelegramException as e:
+                if not self._retry_after(e, method_name, chat_id, is_send, attempt):
+                    raise
+            except Exception:
+                metrics.API_ERRORS.inc(method_name, 'network') # Нет ответа от Telegram: таймаут, обрыв соединения
+                raise
+            finally:
+                metrics.API_SECONDS.observe(time.perf_counter() - started, method_name)
+
+    # --- Обертки методов TeleBot ---
+    def send_message(self, chat_id, *args, **kwargs):
+        return self._call('send_message', chat_id, chat_id, *args, **kwargs)
+
+    def reply_to(self, message, *args, **kwargs):
+        return self._call('reply_to', message.chat.id, message, *args, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, *args, **kwargs):
+        return self._call('edit_message_text', chat_id, text, chat_id, *args, **kwargs)
+
+    def delete_message(self, chat_id, *args, **kwargs):
+        return self._call('delete_message', chat_id, chat_id, *args, **kwargs)
+
+    def delete_messages(self, chat_id, *args, **kwargs):
+        return self._call('delete_messages', chat_id, chat_id, *args, **kwargs)
+
+    def restrict_chat_member(self, chat_id, *args, **kwargs):
+        return self._call('restrict_chat_member', chat_id, chat_id, *args, **kwargs)
+
+    def ban_chat_member(self, chat_id, *args, **kwargs):
+        return self._call('ban_chat_member', chat_id, chat_id, *args, **kwargs)
+
+    def unban_chat_member(self, chat_id, *args, **kwargs):
+        return self._call('unban_chat_member', chat_id, chat_id, *args, **kwargs)
+
+    # --- Объединение уведомлений ---
+    def send_coalesced(self, chat_id, key, text, item, summary, parse_mode='HTML'):
+        """
+        Отправляет уведомление, объединяя однотипные (одинаковый key) уведомления в чат за окно coalesce_window.
+        Если за окно пришло одно уведомление, отправляется text. Иначе - одна сводка:
+        summary.format(count=<число уведомлений>, items=<уникальные item через запятую>).
+        """
+        if not self._coalesce_window:
+            self.send_message(chat_id, text, parse_mode=parse_mode)
+            return
+        if self._add_notice(chat_id, key, text, item, summary, parse_mode):
+            timer = threading.Timer(self._coalesce_window, self._flush_notice, args=(chat_id, key))
+            timer.daemon = True
+            timer.start()
+
+    def _add_notice(self, chat_id, key, text, item, summary, parse_mode):
+        """Добавляет уведомление к ожидающим. Возвращает True, если оно первое за окно (нужно запустить таймер)."""
+        with self._lock:
+            pending = self._pending_notices.get((chat_id, key))
+            if pending is not None:
+                pending["texts"].append(text)
+                if item not in pending["items"]:
+                    pending["items"].append(item)
+                self.coalesced += 1
+                return False
+            self._pending_notices[(chat_id, key)] = {"texts": [text], "items": [item], "summary": summary, "parse_mode": parse_mode}
+            return True
+
+    def _take_notice(self, chat_id, key):
+        """Забирает накопленные за окно уведомления: (текст или сводка, parse_mode) или None."""
+        with self._lock:
+            pending = self._pending_notices.pop((chat_id, key), None)
+        if pending is None:
+            return None
+        if len(pending["texts"]) == 1:
+            return pending["texts"][0], pending["parse_mode"]
+        return pending["summary"].format(count=len(pending["texts"]), items=', '.join(pending["items"])), pending["parse_mode"]
+
+    def _flush_notice(self, chat_id, key):
+        notice = self._take_notice(chat_id, key)
+        if notice is None:
+            return
+        text, parse_mode = notice
+        try:
+            self.send_message(chat_id, text, parse_mode=parse_mode)
+        except Exception as e:
+            logger.error(f"Не удалось отправить уведомление '{key}' в чат {chat_id}: {e}")
+
+    # --- Метрики ---
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "throttled": self.throttled,
+                "avg_throttle_delay_ms": self.throttle_delay / self.throttled * 1000 if self.throttled else 0.0,
+                "total_throttle_delay_s": self.throttle_delay,
+                "retry_after_hits": self.retry_after_hits,
+                "coalesced_notices": self.coalesced,
+                "pending_notices": len(self._pending_notices),
+            }
+
+    def _stats_reporter(self, interval):
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            if stats["throttled"] or stats["retry_after_hits"] or stats["coalesced_notices"]:
+                logger.info(f"Лимит запросов: ждут {stats['waiting']} (макс. {stats['max_waiting']}), "
+                            f"задержано {stats['throttled']} из {stats['calls']} "
+                            f"(ср. {stats['avg_throttle_delay_ms']:.0f} мс), ответов 429: {stats['retry_after_hits']}, "
+                            f"объединено уведомлений: {stats['coalesced_notices']}")
+
+
+class AsyncRateLimitedBot(RateLimitedBot):
+    """
+    RateLimitedBot для AsyncTeleBot: обертки методов возвращают корутины, а ожидание очереди и пауза после 429
+    не блокируют цикл событий. Остальные атрибуты (message_handler, polling, close_session) - исходного бота.
+    """
+
+    def __init__(self, bot, *args, **kwargs):
+        # Импорт здесь: asyncio_helper требует aiohttp, который нужен только asyncio-движку
+        from telebot.asyncio_helper import ApiTelegramException as AsyncApiTelegramException
+        super().__init__(bot, *args, **kwargs)
+        self._api_exception = AsyncApiTelegramException
+        self._notice_tasks = set() # Отправки сводок по таймеру (ссылки держим, чтобы задачи не собрал сборщик мусора)
+
+    async def _acquire(self, chat_id, is_send):
+        delay = self._reserve(chat_id, is_send)
+        if delay <= 0:
+            return
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._waited()
+
+    async def _call(self, method_name, chat_id, *args, **kwargs):
+        is_send = method_name in self.SEND_METHODS
+        method = getattr(self._bot, method_name)
+        for attempt in range(self._max_retries + 1):
+            await self._acquire(chat_id, is_send)
+            metrics.API_CALLS.inc(method_name)
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except self._api_exception as e:
+                if not self._retry_after(e, method_name, chat_id, is_send, attempt):
+                    raise
+            except Exception:
+                metrics.API_ERRORS.inc(method_name, 'network')
+                raise
+            finally:
+                metrics.API_SECONDS.observe(time.perf_counter() - started, method_name)
+
+    async def send_coalesced(self, chat_id, key, text, item, summary, parse_mode='HTML'):
+        if not self._coalesce_window:
+            await self.send_message(chat_id, text, parse_mode=parse_mode)
+            return
+        if self._add_notice(chat_id, key, text, item, summary, parse_mode):
+            asyncio.get_running_loop().call_later(self._coalesce_window, self._start_flush_notice, chat_id, key)
+
+    def _start_flush_notice(self, chat_id, key):
+        task = asyncio.ensure_future(self._flush_notice(chat_id, key))
+        self._notice_tasks.add(task)
+        task.add_done_callback(self._notice_tasks.discard)
+
+    async def _flush_notice(self, chat_id, key):
+        notice = self._take_notice(chat_id, key)
+        if notice is None:
+            return
+        text, parse_mode = notice
+        try:
+            await self.send_message(chat_id, text, parse_mode=parse_mode)
+        except Exception as e:
+            logger.error(f"Не удалось отправить уведомление '{key}' в чат {chat_id}: {e}")
+
+    async def flush_notices(self):
+        """Сразу отправляет накопленные уведомления, не дожидаясь таймеров (при остановке бота)."""
+        with self._lock:
+            keys = list(self._pending_notices)
+        for chat_id, key in keys:
+            await self._flush_notice(chat_id, key)
+        if self._notice_tasks:
+            await asyncio.gather(*self._notice_tasks, return_exceptions=True)
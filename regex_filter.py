@@ -0,0 +1,151 @@
+# regex_filter.py - Проверка сообщения набором регулярных выражений с бюджетом времени
+#
+# С движком re2 шаблоны одного правила (ссылки, коды приглашений, телефоны,
+# шаблоны крипто-скама) объединяются в одно выражение (?P<p0>...)|(?P<p1>...)|...:
+# re2 проверяет все варианты за один линейный проход, поэтому обычное сообщение,
+# в котором ничего не найдено, просматривается один раз, а не по разу на каждый
+# шаблон. Движку с возвратом (regex) объединение не помогает, а вредит: он
+# перебирает варианты в каждой позиции текста и теряет быстрый поиск по начальной
+# строке шаблона (benchmarks/bench_regex_rules.py), поэтому в нем каждый шаблон
+# ищется отдельно. Если объединенное выражение сработало, его шаблоны, кроме
+# найденного, тоже проверяются по одному: совпадения могут перекрываться (ссылка
+# на t.me - это и 'link', и 'invite'), а объединенное выражение находит только
+# одно. Шаблоны с обратными ссылками и другие, которые нельзя объединить, всегда
+# проверяются отдельно.
+#
+# Движок выбирается из установленных:
+#   re2   (pip install google-re2) - линейное время: катастрофический возврат невозможен, шаблоны объединяются
+#         (шаблоны, которые re2 не поддерживает, например с lookahead, уходят в regex);
+#   regex (pip install regex)      - поиск прерывается по истечении бюджета времени (timeout).
+# Стандартный re не используется: прервать его поиск нельзя, а распознать все шаблоны с
+# экспоненциальным возвратом невозможно ((a+)+b, (a|aa)+$, ...) - один такой шаблон на длинном
+# сообщении останавливает обработку всех чатов. Без re2 и regex PatternSet не создается (ValueError).
+# Текст длиннее MAX_TEXT_LENGTH обрезается: время поиска ограничено и по длине.
+
+import re
+import time
+
+try:
+    import re2 # Линейное время поиска
+except ImportError:
+    re2 = None
+try:
+    import regex # Поиск с timeout
+except ImportError:
+    regex = None
+
+MAX_TEXT_LENGTH = 4096 # Telegram ограничивает текст сообщения 4096 символами
+
+_BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+class _Engine:
+    """Обертка над модулем регулярных выражений: компиляция и поиск с учетом бюджета времени."""
+
+    def __init__(self, name, module, supports_timeout, combines):
+        self.name = name
+        self.module = module
+        self.supports_timeout = supports_timeout
+        self.combines = combines # Объединять шаблоны в одно выражение
+
+    def compile(self, pattern):
+        return self.module.compile(pattern)
+
+
+def available_engines():
+    """Движки в порядке предпочтения."""
+    engines = []
+    if re2 is not None:
+        engines.append(_Engine('re2', re2, False, True))
+    if regex is not None:
+        engines.append(_Engine('regex', regex, True, False))
+    return engines
+
+
+class PatternSet:
+    def __init__(self, patterns, ignore_case=True, time_budget=0.02):
+        """
+        patterns - {имя: шаблон}; time_budget - сколько секунд можно потратить на одно сообщение.
+        Неверный шаблон - ValueError с его именем; без re2 и regex - ValueError для любого набора шаблонов.
+        """
+        self.names = list(patterns)
+        self.time_budget = time_budget
+        prefix = '(?i)' if ignore_case else ''
+        engines = available_engines()
+        if not engines:
+            raise ValueError("для регулярных выражений нужен google-re2 (pip install google-re2) или regex (pip install regex): "
+                             "поиск стандартного re нельзя прервать по бюджету времени")
+        # Каждый шаблон - первому движку, который его компилирует (re2 поддерживает не все возможности re)
+        by_engine = {}
+        for name, pattern in patterns.items():
+            for engine in engines:
+                try:
+                    engine.compile(prefix + pattern)
+                except Exception as e:
+                    error = e
+                    continue
+                by_engine.setdefault(engine.name, (engine, []))[1].append((name, pattern))
+                break
+            else:
+                hint = "" if regex is not None else " (re2 не поддерживает lookahead и обратные ссылки - для них нужен regex)"
+                raise ValueError(f"неверный шаблон {name!r}: {error}{hint}")
+
+        # Объединение (только re2): одно выражение, шаблоны с обратными ссылками - отдельно (номера групп сдвигаются)
+        self._single = {} # имя шаблона -> (search скомпилированного шаблона, поддерживает ли он timeout)
+        self._combined = [] # (search объединенного выражения, поддерживает ли он timeout, {имя группы: имя шаблона})
+        standalone = []
+        for engine, items in by_engine.values():
+            combinable = []
+            for name, pattern in items:
+                self._single[name] = (engine.compile(prefix + pattern).search, engine.supports_timeout)
+                if not engine.combines or _BACKREFERENCE_RE.search(pattern):
+                    standalone.append(name)
+                else:
+                    combinable.append((name, pattern))
+            if len(combinable) == 1:
+                standalone.append(combinable[0][0])
+            elif combinable:
+                groups = {f"p{index}": name for index, (name, _) in enumerate(combinable)}
+                combined = '|'.join(f"(?P<p{index}>{pattern})" for index, (_, pattern) in enumerate(combinable))
+                try:
+                    self._combined.append((engine.compile(prefix + combined).search, engine.supports_timeout, groups))
+                except Exception: # Например, флаги внутри шаблона допустимы только в его начале
+                    standalone.extend(name for name, _ in combinable)
+        self._standalone = [(name, *self._single[name]) for name in standalone]
+        self.engines = sorted(by_engine)
+
+    def search(self, text):
+        """
+        Имена сработавших шаблонов (в порядке первого совпадения) и признак превышения бюджета времени.
+        При превышении бюджета возвращаются совпадения, найденные до него.
+        """
+        text = text[:MAX_TEXT_LENGTH]
+        deadline = time.perf_counter() + self.time_budget
+        found = {}
+        try:
+            for search, supports_timeout, groups in self._combined:
+                match = self._first(search, supports_timeout, text, deadline)
+                if match is not None:
+                    found[groups[match.lastgroup]] = True
+                    # Остальные шаблоны этого выражения могли совпасть в перекрывающихся местах
+                    for name in groups.values():
+                        if name not in found and self._first(*self._single[name], text, deadline) is not None:
+                            found[name] = True
+            perf_counter = time.perf_counter
+            for name, search, supports_timeout in self._standalone:
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    return list(found), True
+                if (search(text, timeout=remaining) if supports_timeout else search(text)) is not None:
+                    found[name] = True
+        except TimeoutError:
+            return list(found), True
+        return list(found), time.perf_counter() > deadline
+
+    @staticmethod
+    def _first(search, supports_timeout, text, deadline):
+        """Первое совпадение или None; TimeoutError, если бюджет времени уже исчерпан или поиск прерван движком."""
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise TimeoutError
+        return search(text, timeout=remaining) if supports_timeout else search(text)
@@ -0,0 +1,267 @@
+# spam_fingerprint.py - Обнаружение одинаковых и почти одинаковых сообщений (рейды)
+#
+# Во время рейда один и тот же текст (или слегка измененный: другие эмодзи,
+# пара замененных букв, добавленный номер) пишут с разных аккаунтов. Для каждого
+# сообщения группы строится отпечаток:
+#   - хэш нормализованного текста (нижний регистр, знаки препинания и лишние
+#     пробелы убраны) - для точных копий;
+#   - MinHash-подпись из SIGNATURE_SIZE значений по символьным 3-граммам - для
+#     почти одинаковых текстов: доля совпавших значений подписей двух текстов
+#     оценивает долю общих 3-грамм (коэффициент Жаккара). Подпись строится за один
+#     проход по 3-граммам (one permutation hashing: 3-грамма попадает в одну из
+#     SIGNATURE_SIZE корзин, в корзине хранится минимум).
+#
+# Отпечатки хранятся в индексе за последние window_seconds секунд (и не больше
+# max_messages). Похожие тексты ищутся без перебора индекса (LSH): подпись
+# делится на BANDS полос, и кандидаты - только записи, у которых хотя бы одна
+# полоса совпала целиком. Для текстов с общими 80% 3-грамм это случается с
+# вероятностью ~98%, для непохожих - почти никогда. Кандидат принимается, если
+# совпало не меньше min_similarity значений подписи.
+#
+# Похожие сообщения собираются в группы: новое сообщение присоединяется к
+# группе похожего на него сообщения, если похоже и на первое сообщение группы
+# (иначе короткие фразы с общими словами цепочкой собрались бы в одну группу).
+# Когда в группе чата набирается copies живых копий, add() возвращает
+# их все (бот удаляет их и предупреждает авторов разом); дальнейшие копии в той
+# же группе возвращаются сразу по одной.
+
+import collections
+import logging
+import operator
+import re
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3
+MAX_TEXT_LENGTH = 8192 # Длиннее - обрезается
+SIGNATURE_SIZE = 32    # Значений в подписи MinHash (степень двойки)
+BANDS = 8              # Полос LSH по SIGNATURE_SIZE // BANDS значений
+MAX_CANDIDATES = 64    # Больше кандидатов на одно сообщение не проверяется
+
+_ROWS = SIGNATURE_SIZE // BANDS
+_BIN_BITS = SIGNATURE_SIZE.bit_length() - 1
+_MASK64 = (1 << 64) - 1
+_EMPTY = 1 << 64
+_SIGNATURE = struct.Struct(f'<{SIGNATURE_SIZE}I')
+_EXACT_BAND = -1 # Номер "полосы" для ключа точной копии
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Нижний регистр, все, кроме букв и цифр, заменено одним пробелом."""
+    return _NON_WORD_RE.sub(' ', text[:MAX_TEXT_LENGTH].lower()).strip()
+
+
+def minhash(normalized):
+    """Подпись MinHash нормализованного текста: SIGNATURE_SIZE 32-битных значений, упакованных в bytes."""
+    mins = [_EMPTY] * SIGNATURE_SIZE
+    for h in map(hash, {normalized[i:i + SHINGLE_SIZE] for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1))}):
+        h &= _MASK64
+        b = h & (SIGNATURE_SIZE - 1)
+        if h < mins[b]:
+            mins[b] = h
+    if _EMPTY in mins:
+        # У короткого текста часть корзин пуста: берем значение ближайшей непустой корзины справа (по кругу),
+        # смешанное с расстоянием до нее, - так подписи похожих текстов совпадают и в пустых корзинах
+        original = mins[:]
+        for b in range(SIGNATURE_SIZE):
+            if original[b] == _EMPTY:
+                distance = 1
+                while original[(b + distance) % SIGNATURE_SIZE] == _EMPTY:
+                    distance += 1
+                mins[b] = hash((original[(b + distance) % SIGNATURE_SIZE], distance))
+    return _SIGNATURE.pack(*[(value >> _BIN_BITS) & 0xFFFFFFFF for value in mins])
+
+
+def similarity(signature_a, signature_b):
+    """Доля совпавших значений двух подписей (оценка коэффициента Жаккара)."""
+    return sum(map(operator.eq, _SIGNATURE.unpack(signature_a), _SIGNATURE.unpack(signature_b))) / SIGNATURE_SIZE
+
+
+def _band_keys(chat_id, text_hash, signature):
+    """Ключи записи в индексе: точная копия и BANDS полос подписи."""
+    width = _ROWS * 4
+    keys = [hash((chat_id, _EXACT_BAND, text_hash))]
+    keys.extend(hash((chat_id, band, signature[band * width:(band + 1) * width])) for band in range(BANDS))
+    return keys
+
+
+class _Entry:
+    __slots__ = ('ts', 'chat_id', 'user_id', 'message_id', 'text_hash', 'signature', 'cluster')
+
+    def __init__(self, ts, chat_id, user_id, message_id, text_hash, signature):
+        self.ts = ts
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.message_id = message_id
+        self.text_hash = text_hash
+        self.signature = signature
+        self.cluster = None
+
+    def keys(self):
+        return _band_keys(self.chat_id, self.text_hash, self.signature)
+
+
+class _Cluster:
+    __slots__ = ('members', 'flagged')
+
+    def __init__(self):
+        self.members = [] # Живые записи группы в порядке поступления (у большинства групп - одна)
+        self.flagged = False
+
+
+class NearDuplicateIndex:
+    def __init__(self, window_seconds=600, max_messages=50000, min_similarity=0.6, min_length=30, stats_interval=60):
+        """min_similarity - какая доля значений подписи должна совпасть, чтобы тексты считались почти одинаковыми."""
+        self._window = window_seconds
+        self._max_messages = max_messages
+        self._min_matches = min_similarity * SIGNATURE_SIZE
+        self._min_length = min_length
+        self._lock = threading.Lock()
+        self._entries = collections.deque() # Все записи в порядке поступления (для удаления по времени)
+        # ключ полосы (или точной копии) -> запись или [записи в порядке поступления]. Почти все ключи встречаются
+        # у одной записи, поэтому список заводится только для второй - это заметно экономит память
+        self._buckets = {}
+        # Метрики
+        self.indexed = 0
+        self.skipped_short = 0
+        self.exact_matches = 0
+        self.near_matches = 0
+        self.flagged_clusters = 0
+        self.flagged_messages = 0
+        self.candidates_checked = 0
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="near-dup-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, chat_id, user_id, message_id, text, copies, now=None):
+        """
+        Добавляет сообщение в индекс. Возвращает список (user_id, message_id) сообщений, которые нужно удалить,
+        или None. copies - сколько копий в чате считать рейдом (0 - проверка отключена).
+        """
+        if not copies or not text:
+            return None
+        normalized = normalize(text)
+        if len(normalized) < self._min_length:
+            self.skipped_short += 1
+            return None
+        now = now or time.monotonic()
+        entry = _Entry(now, chat_id, user_id, message_id, hash(normalized), minhash(normalized))
+        keys = entry.keys()
+        with self._lock:
+            self._expire(now)
+            self.indexed += 1
+            cluster = self._find_cluster(entry, keys)
+            if cluster is None:
+                cluster = _Cluster()
+            entry.cluster = cluster
+            cluster.members.append(entry)
+            self._insert(entry, keys)
+            if cluster.flagged:
+                self.flagged_messages += 1
+                return [(user_id, message_id)]
+            if len(cluster.members) >= copies:
+                cluster.flagged = True
+                self.flagged_clusters += 1
+                self.flagged_messages += len(cluster.members)
+                return [(member.user_id, member.message_id) for member in cluster.members]
+        return None
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key, ())
+        return bucket if isinstance(bucket, list) else (bucket,) if bucket else ()
+
+    def _find_cluster(self, entry, keys):
+        exact = self._bucket(keys[0])
+        if exact and exact[-1].chat_id == entry.chat_id and exact[-1].text_hash == entry.text_hash:
+            self.exact_matches += 1
+            return exact[-1].cluster
+        signature = _SIGNATURE.unpack(entry.signature)
+        checked = 0
+        for key in keys[1:]:
+            for candidate in reversed(self._bucket(key)): # Сначала самые свежие
+                checked += 1
+                # Текст должен быть похож и на кандидата, и на первое сообщение его группы - иначе цепочка
+                # коротких сообщений с общим словом постепенно "дрейфует" и собирается в одну группу
+                if candidate.chat_id == entry.chat_id and self._similar(signature, candidate) and \
+                        self._similar(signature, candidate.cluster.members[0]):
+                    self.candidates_checked += checked
+                    self.near_matches += 1
+                    return candidate.cluster
+                if checked >= MAX_CANDIDATES:
+                    self.candidates_checked += checked
+                    return None
+        self.candidates_checked += checked
+        return None
+
+    def _similar(self, signature, other):
+        return sum(map(operator.eq, signature, _SIGNATURE.unpack(other.signature))) >= self._min_matches
+
+    def _insert(self, entry, keys):
+        self._entries.append(entry)
+        buckets = self._buckets
+        for key in keys:
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = entry
+            elif isinstance(bucket, list):
+                if bucket[-1] is not entry: # Две полосы могут дать один ключ
+                    bucket.append(entry)
+            elif bucket is not entry:
+                buckets[key] = [bucket, entry]
+
+    def _remove(self, entry):
+        # Записи удаляются в порядке поступления, поэтому обычно это первая запись каждого списка
+        buckets = self._buckets
+        for key in entry.keys():
+            bucket = buckets.get(key)
+            if bucket is entry:
+                del buckets[key]
+            elif isinstance(bucket, list):
+                if bucket[0] is entry:
+                    del bucket[0]
+                elif entry in bucket:
+                    bucket.remove(entry)
+                if len(bucket) == 1:
+                    buckets[key] = bucket[0]
+        members = entry.cluster.members
+        if members and members[0] is entry:
+            del members[0]
+        else:
+            members.remove(entry)
+        entry.cluster = None
+
+    def _expire(self, now):
+        entries = self._entries
+        while entries and (now - entries[0].ts > self._window or len(entries) >= self._max_messages):
+            self._remove(entries.popleft())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "indexed": self.indexed,
+                "skipped_short": self.skipped_short,
+                "exact_matches": self.exact_matches,
+                "near_matches": self.near_matches,
+                "flagged_clusters": self.flagged_clusters,
+                "flagged_messages": self.flagged_messages,
+                "candidates_checked": self.candidates_checked,
+            }
+
+    def _stats_reporter(self, interval):
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            if stats["indexed"]:
+                logger.info(f"Повторы сообщений: проиндексировано {stats['indexed']}, в окне {stats['entries']}, "
+                            f"точных совпадений {stats['exact_matches']}, похожих {stats['near_matches']}, "
+                            f"рейдов {stats['flagged_clusters']} ({stats['flagged_messages']} сообщений)")
@@ -0,0 +1,244 @@
+# storage.py - Хранилище данных модерации (предупреждения и муты) на SQLite
+#
+# База работает в режиме WAL: читатели не блокируют писателя, а каждая запись -
+# это короткая транзакция, затрагивающая только одну строку. Каждый поток
+# (polling, слушатель GUI, проверка мутов) получает собственное соединение.
+#
+# Данные разделены по чатам: ключ - пара (chat_id, user_id), поэтому выборки,
+# запись и снятие мутов одного чата не затрагивают строки других чатов.
+
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+
+from journal import ModerationJournal
+import metrics
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS warns (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    count   INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS mutes (
+    chat_id  INTEGER NOT NULL,
+    user_id  INTEGER NOT NULL,
+    end_time REAL NOT NULL,   -- Unix-время окончания мута
+    reason   TEXT,
+    admin_id TEXT,
+    PRIMARY KEY (chat_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_mutes_end_time ON mutes(end_time);
+CREATE INDEX IF NOT EXISTS idx_mutes_chat_end_time ON mutes(chat_id, end_time);
+CREATE TABLE IF NOT EXISTS usernames (
+    username TEXT PRIMARY KEY,   -- в нижнем регистре, без @
+    user_id  INTEGER NOT NULL,
+    seen_at  REAL NOT NULL       -- когда пользователь последний раз был замечен с этим username
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_usernames_seen_at ON usernames(seen_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ModerationStore:
+    """Небольшой API поверх SQLite: add_warn, reset_warns, set_mute, clear_mute, due_mutes."""
+
+    def __init__(self, db_path, default_chat_id):
+        """default_chat_id - чат, к которому относятся данные старых версий без разделения по чатам."""
+        self.db_path = db_path
+        self.default_chat_id = default_chat_id
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._conn()
+        self._upgrade_schema(conn)
+        with conn:
+            self._create_schema(conn)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # В режиме WAL это надежно и заметно быстрее FULL
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _create_schema(conn):
+        for statement in SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+
+    def _upgrade_schema(self, conn):
+        """Переводит базу первой версии (ключ - только user_id) на ключ (chat_id, user_id) одной транзакцией."""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(warns)")]
+        if not columns or 'chat_id' in columns:
+            return
+        conn.execute("BEGIN")
+        try:
+            conn.execute("ALTER TABLE warns RENAME TO warns_v1")
+            conn.execute("ALTER TABLE mutes RENAME TO mutes_v1")
+            conn.execute("DROP INDEX IF EXISTS idx_mutes_end_time")
+            self._create_schema(conn)
+            conn.execute("INSERT INTO warns (chat_id, user_id, count) SELECT ?, user_id, count FROM warns_v1", (self.default_chat_id,))
+            conn.execute("INSERT INTO mutes (chat_id, user_id, end_time, reason, admin_id) "
+                         "SELECT ?, user_id, end_time, reason, admin_id FROM mutes_v1", (self.default_chat_id,))
+            conn.execute("DROP TABLE warns_v1")
+            conn.execute("DROP TABLE mutes_v1")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"База {self.db_path} переведена на хранение по чатам; старые данные отнесены к чату {self.default_chat_id}.")
+
+    # --- Предупреждения ---
+    @timed(metrics.STORAGE_SECONDS, 'add_warn')
+    def add_warn(self, chat_id, user_id):
+        """Добавляет предупреждение и возвращает новое количество предупреждений пользователя в чате."""
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT INTO warns (chat_id, user_id, count) VALUES (?, ?, 1) "
+                         "ON CONFLICT(chat_id, user_id) DO UPDATE SET count = count + 1", (chat_id, user_id))
+            return conn.execute("SELECT count FROM warns WHERE chat_id = ? AND user_id = ?", (chat_id, user_id)).fetchone()[0]
+
+    def get_warns(self, chat_id, user_id):
+        row = self._conn().execute("SELECT count FROM warns WHERE chat_id = ? AND user_id = ?", (chat_id, user_id)).fetchone()
+        return row[0] if row else 0
+
+    @timed(metrics.STORAGE_SECONDS, 'reset_warns')
+    def reset_warns(self, chat_id, user_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM warns WHERE chat_id = ? AND user_id = ?", (chat_id, user_id))
+
+    # --- Муты ---
+    @timed(metrics.STORAGE_SECONDS, 'set_mute')
+    def set_mute(self, chat_id, user_id, end_time, reason, admin_id):
+        """Записывает (или перезаписывает) мут. end_time - Unix-время окончания."""
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO mutes (chat_id, user_id, end_time, reason, admin_id) VALUES (?, ?, ?, ?, ?)",
+                         (chat_id, user_id, end_time, reason, str(admin_id)))
+
+    @timed(metrics.STORAGE_SECONDS, 'set_mutes')
+    def set_mutes(self, rows):
+        """Записывает муты пачкой в одной транзакции. rows - (chat_id, user_id, end_time, reason, admin_id)."""
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO mutes (chat_id, user_id, end_time, reason, admin_id) VALUES (?, ?, ?, ?, ?)",
+                             [(chat_id, user_id, end_time, reason, str(admin_id)) for chat_id, user_id, end_time, reason, admin_id in rows])
+
+    @timed(metrics.STORAGE_SECONDS, 'clear_mute')
+    def clear_mute(self, chat_id, user_id):
+        """Удаляет мут. Возвращает True, если мут был."""
+        conn = self._conn()
+        with conn:
+            return conn.execute("DELETE FROM mutes WHERE chat_id = ? AND user_id = ?", (chat_id, user_id)).rowcount > 0
+
+    @timed(metrics.STORAGE_SECONDS, 'clear_mutes')
+    def clear_mutes(self, keys):
+        """Удаляет муты пачкой в одной транзакции. keys - пары (chat_id, user_id)."""
+        conn = self._conn()
+        with conn:
+            conn.executemany("DELETE FROM mutes WHERE chat_id = ? AND user_id = ?", list(keys))
+
+    def get_mute(self, chat_id, user_id):
+        row = self._conn().execute("SELECT end_time, reason, admin_id FROM mutes WHERE chat_id = ? AND user_id = ?",
+                                   (chat_id, user_id)).fetchone()
+        if row is None:
+            return None
+        return {"end_time": row[0], "reason": row[1], "admin_id": row[2]}
+
+    def due_mutes(self, now, chat_id=None):
+        """
+        Список (chat_id, user_id, end_time) мутов, истекших к моменту now.
+        С chat_id - только для одного чата (индекс по (chat_id, end_time)), иначе по всем (индекс по end_time).
+        """
+        if chat_id is None:
+            return self._conn().execute("SELECT chat_id, user_id, end_time FROM mutes WHERE end_time <= ? ORDER BY end_time",
+                                        (now,)).fetchall()
+        return self._conn().execute("SELECT chat_id, user_id, end_time FROM mutes WHERE chat_id = ? AND end_time <= ? ORDER BY end_time",
+                                    (chat_id, now)).fetchall()
+
+    def all_mutes(self, chat_id=None):
+        """Список (chat_id, user_id, end_time) мутов - для загрузки планировщика при старте."""
+        if chat_id is None:
+            return self._conn().execute("SELECT chat_id, user_id, end_time FROM mutes").fetchall()
+        return self._conn().execute("SELECT chat_id, user_id, end_time FROM mutes WHERE chat_id = ?", (chat_id,)).fetchall()
+
+    def mutes_count(self, chat_id=None):
+        if chat_id is None:
+            return self._conn().execute("SELECT COUNT(*) FROM mutes").fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM mutes WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+
+    # --- Кэш username -> user_id ---
+    def load_usernames(self, since, limit):
+        """Самые свежие (username, user_id, seen_at), замеченные не раньше since."""
+        return self._conn().execute("SELECT username, user_id, seen_at FROM usernames WHERE seen_at >= ? ORDER BY seen_at DESC LIMIT ?",
+                                    (since, limit)).fetchall()
+
+    @timed(metrics.STORAGE_SECONDS, 'save_usernames')
+    def save_usernames(self, rows, removed, prune_before):
+        """Сохраняет пачку (username, user_id, seen_at), удаляет removed и записи старше prune_before - одной транзакцией."""
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO usernames (username, user_id, seen_at) VALUES (?, ?, ?)", rows)
+            conn.executemany("DELETE FROM usernames WHERE username = ?", [(username,) for username in removed])
+            conn.execute("DELETE FROM usernames WHERE seen_at < ?", (prune_before,))
+
+    # --- Миграция со старого формата ---
+    def migrate_from_json(self, data_file):
+        """
+        Однократно переносит данные из DATA_FILE (JSON-снимок + журнал) в базу (в чат default_chat_id).
+        После переноса старые файлы переименовываются в *.migrated и повторно не читаются.
+        """
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return False
+        old_journal = ModerationJournal(data_file)
+        if not os.path.exists(data_file) and not os.path.exists(old_journal.journal_path):
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', '')")
+            return False
+
+        data = old_journal.load()
+        chat_id = self.default_chat_id
+        mutes = []
+        for user_id_str, mute_info in data["mutes"].items():
+            end_time = datetime.datetime.fromisoformat(mute_info["end_time"]).timestamp()
+            mutes.append((chat_id, int(user_id_str), end_time, mute_info.get("reason"), str(mute_info.get("admin_id"))))
+        warns = [(chat_id, int(user_id_str), count) for user_id_str, count in data["warns"].items() if count]
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO warns (chat_id, user_id, count) VALUES (?, ?, ?)", warns)
+            conn.executemany("INSERT OR REPLACE INTO mutes (chat_id, user_id, end_time, reason, admin_id) VALUES (?, ?, ?, ?, ?)", mutes)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                         (datetime.datetime.now().isoformat(),))
+        for path in (data_file, old_journal.journal_path):
+            if os.path.exists(path):
+                os.replace(path, path + '.migrated')
+        logger.info(f"Данные из {data_file} перенесены в {self.db_path}: предупреждений {len(warns)}, мутов {len(mutes)}.")
+        return True
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    pass # Соединение принадлежит другому потоку, оно закроется вместе с процессом
+            self._connections.clear()
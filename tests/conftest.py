@@ -0,0 +1,6 @@
+# conftest.py - Модули бота лежат в корне репозитория (как и для benchmarks/)
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,22 @@
+from bulk_actions import parse_user_ids, split_leading_ids
+
+
+def test_parse_user_ids_accepts_any_separators():
+    assert parse_user_ids("111, 222;333\n444  555") == ([111, 222, 333, 444, 555], [])
+
+
+def test_parse_user_ids_drops_duplicates_and_reports_invalid():
+    assert parse_user_ids(" 111 abc 222 111 -5 @user ") == ([111, 222], ["abc", "-5", "@user"])
+    assert parse_user_ids("") == ([], [])
+
+
+def test_split_leading_ids_comma_separated():
+    # /ban_ids 111,222,333 - ID через запятую без пробелов
+    assert split_leading_ids("111,222,333") == ([111, 222, 333], "")
+    assert split_leading_ids("111,222, 333 спам в чате") == ([111, 222, 333], "спам в чате")
+
+
+def test_split_leading_ids_stops_at_first_word():
+    assert split_leading_ids("111 222 спам 333") == ([111, 222], "спам 333")
+    assert split_leading_ids("111abc 222") == ([], "111abc 222")
+    assert split_leading_ids("причина без ID") == ([], "причина без ID")
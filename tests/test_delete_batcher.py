@@ -0,0 +1,190 @@
+import asyncio
+import threading
+
+import pytest
+
+import delete_batcher
+from delete_batcher import MAX_BATCH_SIZE, AsyncDeletionBatcher, DeletionBatcher
+
+CHAT_ID = -1001
+
+
+class FakeBot:
+    def __init__(self, batch_error=None, failing_ids=()):
+        self.calls = []
+        self.batch_error = batch_error
+        self.failing_ids = set(failing_ids)
+
+    def delete_messages(self, chat_id, message_ids):
+        self.calls.append(('delete_messages', chat_id, list(message_ids)))
+        if self.batch_error is not None:
+            raise self.batch_error
+
+    def delete_message(self, chat_id, message_id):
+        self.calls.append(('delete_message', chat_id, message_id))
+        if message_id in self.failing_ids:
+            raise RuntimeError("message can't be deleted")
+
+
+class OldBot(FakeBot):
+    """pyTelegramBotAPI без deleteMessages."""
+
+    def __getattribute__(self, name):
+        if name == 'delete_messages':
+            raise AttributeError(name)
+        return super().__getattribute__(name)
+
+
+class FakeTimer:
+    """Таймер, который срабатывает только по fire() из теста."""
+    created = []
+
+    def __init__(self, interval, function, args=()):
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.daemon = False
+        FakeTimer.created.append(self)
+
+    def start(self):
+        pass
+
+    def fire(self):
+        self.function(*self.args)
+
+
+@pytest.fixture(autouse=True)
+def fake_timers(monkeypatch):
+    FakeTimer.created = []
+    monkeypatch.setattr(delete_batcher.threading, 'Timer', FakeTimer)
+    return FakeTimer.created
+
+
+def test_timer_flushes_batch_in_one_call(fake_timers):
+    bot = FakeBot()
+    batcher = DeletionBatcher(bot, window=0.5, stats_interval=0)
+    for message_id in (1, 2, 3):
+        batcher.delete(CHAT_ID, message_id)
+    batcher.delete(CHAT_ID - 1, 10)
+    assert bot.calls == []
+    assert [timer.interval for timer in fake_timers] == [0.5, 0.5] # Один таймер на пачку каждого чата
+
+    fake_timers[0].fire()
+    assert bot.calls == [('delete_messages', CHAT_ID, [1, 2, 3])]
+    fake_timers[1].fire()
+    assert bot.calls[-1] == ('delete_message', CHAT_ID - 1, 10) # Одно сообщение - без deleteMessages
+    stats = batcher.stats()
+    assert (stats["requested"], stats["deleted"], stats["api_calls"], stats["pending"]) == (4, 4, 2, 0)
+
+
+def test_full_batch_is_flushed_immediately(fake_timers):
+    bot = FakeBot()
+    batcher = DeletionBatcher(bot, window=0.5, stats_interval=0)
+    for message_id in range(MAX_BATCH_SIZE + 1):
+        batcher.delete(CHAT_ID, message_id)
+    assert bot.calls == [('delete_messages', CHAT_ID, list(range(MAX_BATCH_SIZE)))]
+    assert batcher.stats()["pending"] == 1
+
+
+def test_stale_timer_does_not_flush_next_batch(fake_timers):
+    bot = FakeBot()
+    batcher = DeletionBatcher(bot, window=0.5, stats_interval=0)
+    for message_id in range(MAX_BATCH_SIZE): # Первая пачка уходит по размеру, ее таймер еще не сработал
+        batcher.delete(CHAT_ID, message_id)
+    batcher.delete(CHAT_ID, 1000)
+    first_timer, second_timer = fake_timers
+
+    first_timer.fire()
+    assert len(bot.calls) == 1 # Новая пачка ждет своего таймера
+    assert batcher.stats()["pending"] == 1
+    second_timer.fire()
+    assert bot.calls[-1] == ('delete_message', CHAT_ID, 1000)
+
+
+def test_flush_all(fake_timers):
+    bot = FakeBot()
+    batcher = DeletionBatcher(bot, window=0.5, stats_interval=0)
+    batcher.delete(CHAT_ID, 1)
+    batcher.delete(CHAT_ID, 2)
+    batcher.delete(CHAT_ID - 1, 3)
+    batcher.flush_all()
+    assert sorted(bot.calls) == [('delete_message', CHAT_ID - 1, 3), ('delete_messages', CHAT_ID, [1, 2])]
+    for timer in fake_timers: # Таймеры уже отправленных пачек ничего не делают
+        timer.fire()
+    assert len(bot.calls) == 2
+
+
+def test_zero_window_deletes_immediately(fake_timers):
+    bot = FakeBot()
+    batcher = DeletionBatcher(bot, window=0, stats_interval=0)
+    batcher.delete(CHAT_ID, 1)
+    assert bot.calls == [('delete_message', CHAT_ID, 1)]
+    assert fake_timers == []
+
+
+@pytest.mark.parametrize("bot", [FakeBot(batch_error=RuntimeError("Bad Request")), OldBot()])
+def test_fallback_to_single_deletes(fake_timers, bot):
+    bot.failing_ids = {2}
+    batcher = DeletionBatcher(bot, window=0.5, stats_interval=0)
+    for message_id in (1, 2, 3):
+        batcher.delete(CHAT_ID, message_id)
+    fake_timers[0].fire()
+    assert [call for call in bot.calls if call[0] == 'delete_message'] == \
+        [('delete_message', CHAT_ID, 1), ('delete_message', CHAT_ID, 2), ('delete_message', CHAT_ID, 3)]
+    stats = batcher.stats()
+    assert (stats["deleted"], stats["failed"], stats["fallbacks"]) == (2, 1, 1)
+
+
+def test_concurrent_deletes_are_all_flushed(fake_timers):
+    # Сообщения из нескольких потоков (пачки уходят по размеру и в flush_all) не теряются и не удаляются дважды
+    bot = FakeBot()
+    batcher = DeletionBatcher(bot, window=0.01, stats_interval=0)
+    threads = [threading.Thread(target=lambda start=start: [batcher.delete(CHAT_ID, i) for i in range(start, start + 250)])
+               for start in range(0, 1000, 250)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.flush_all()
+    deleted = [i for call in bot.calls for i in (call[2] if call[0] == 'delete_messages' else [call[2]])]
+    assert sorted(deleted) == list(range(1000))
+
+
+class AsyncFakeBot(FakeBot):
+    async def delete_messages(self, chat_id, message_ids):
+        FakeBot.delete_messages(self, chat_id, message_ids)
+
+    async def delete_message(self, chat_id, message_id):
+        FakeBot.delete_message(self, chat_id, message_id)
+
+
+def test_async_batch_is_sent_by_loop_timer():
+    bot = AsyncFakeBot()
+
+    async def scenario():
+        batcher = AsyncDeletionBatcher(bot, window=0.01, stats_interval=0)
+        for message_id in (1, 2, 3):
+            await batcher.delete(CHAT_ID, message_id)
+        assert bot.calls == []
+        await asyncio.sleep(0.05)
+        return batcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert bot.calls == [('delete_messages', CHAT_ID, [1, 2, 3])]
+    assert (stats["deleted"], stats["api_calls"], stats["pending"]) == (3, 1, 0)
+
+
+def test_async_flush_all_sends_pending_and_falls_back():
+    bot = AsyncFakeBot(batch_error=RuntimeError("Bad Request"), failing_ids={2})
+
+    async def scenario():
+        batcher = AsyncDeletionBatcher(bot, window=60, stats_interval=0)
+        for message_id in (1, 2, 3):
+            await batcher.delete(CHAT_ID, message_id)
+        await batcher.flush_all()
+        return batcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert [call for call in bot.calls if call[0] == 'delete_message'] == \
+        [('delete_message', CHAT_ID, 1), ('delete_message', CHAT_ID, 2), ('delete_message', CHAT_ID, 3)]
+    assert (stats["deleted"], stats["failed"], stats["fallbacks"]) == (2, 1, 1)
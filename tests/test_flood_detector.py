@@ -0,0 +1,60 @@
+import pytest
+
+from flood_detector import DUPLICATES, FLOOD, FloodDetector
+
+CHAT_ID = -1001
+LIMITS = dict(max_messages=3, window_seconds=10, max_duplicates=0, duplicate_window_seconds=0)
+DUPLICATE_LIMITS = dict(max_messages=0, window_seconds=0, max_duplicates=3, duplicate_window_seconds=60)
+
+
+@pytest.fixture
+def detector():
+    return FloodDetector(stats_interval=0)
+
+
+def test_flood_within_window(detector):
+    # now начинается с 1: now=0 означает "текущее время"
+    assert detector.check(CHAT_ID, 1, "a", now=1, **LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "b", now=2, **LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "c", now=3, **LIMITS) == FLOOD
+    # После срабатывания счетчики сброшены
+    assert detector.check(CHAT_ID, 1, "d", now=4, **LIMITS) is None
+
+
+def test_window_slides(detector):
+    for now in (1, 2, 12, 13):
+        assert detector.check(CHAT_ID, 1, "a", now=now, **LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "a", now=14, **LIMITS) == FLOOD
+
+
+def test_users_and_chats_are_counted_separately(detector):
+    assert detector.check(CHAT_ID, 1, "a", now=1, **LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "a", now=1, **LIMITS) is None
+    assert detector.check(CHAT_ID, 2, "a", now=1, **LIMITS) is None
+    assert detector.check(CHAT_ID - 1, 1, "a", now=1, **LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "a", now=1, **LIMITS) == FLOOD
+
+
+def test_duplicates_ignore_case_and_surrounding_spaces(detector):
+    assert detector.check(CHAT_ID, 1, "Купите", now=1, **DUPLICATE_LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "другое", now=2, **DUPLICATE_LIMITS) is None
+    assert detector.check(CHAT_ID, 1, " купите ", now=3, **DUPLICATE_LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "КУПИТЕ", now=4, **DUPLICATE_LIMITS) == DUPLICATES
+
+
+def test_duplicate_window_expires(detector):
+    assert detector.check(CHAT_ID, 1, "спам", now=1, **DUPLICATE_LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "спам", now=2, **DUPLICATE_LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "спам", now=100, **DUPLICATE_LIMITS) is None # Окно истекло, счет заново
+    assert detector.check(CHAT_ID, 1, "спам", now=101, **DUPLICATE_LIMITS) is None
+    assert detector.check(CHAT_ID, 1, "спам", now=102, **DUPLICATE_LIMITS) == DUPLICATES
+
+
+def test_idle_users_are_evicted():
+    detector = FloodDetector(max_users=2, idle_seconds=600, stats_interval=0)
+    for user_id in (1, 2, 3):
+        detector.check(CHAT_ID, user_id, "a", now=1, **LIMITS)
+    assert len(detector) == 2 # Сверх max_users вытесняется самый давний
+    detector.check(CHAT_ID, 4, "a", now=1000, **LIMITS)
+    assert len(detector) == 1 # Остальные молчат дольше idle_seconds
+    assert detector.stats()["evicted"] == 3
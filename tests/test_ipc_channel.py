@@ -0,0 +1,41 @@
+import asyncio
+from multiprocessing import Pipe
+
+import ipc_channel
+
+
+def test_async_server_replies_with_progress_and_stops_on_shutdown():
+    gui, bot_side = Pipe()
+    stopped = []
+
+    async def execute(command, progress):
+        if command == "/fail":
+            raise RuntimeError("нет прав")
+        await asyncio.to_thread(progress, 1, 2) # Ход выполнения приходит из потока, как у массовых действий
+        return True, f"выполнено: {command}"
+
+    gui.send({"id": 1, "command": "/bulk_ban 1,2"})
+    gui.send({"id": 2, "command": "/fail"})
+    gui.send({"id": 3, "command": ipc_channel.SHUTDOWN})
+    asyncio.run(ipc_channel.serve_commands_async(bot_side, execute, lambda: stopped.append(True)))
+
+    assert [gui.recv() for _ in range(4)] == [
+        {"id": 1, "progress": [1, 2]},
+        {"id": 1, "ok": True, "result": "выполнено: /bulk_ban 1,2"},
+        {"id": 2, "ok": False, "error": "нет прав"},
+        {"id": 3, "ok": True, "result": "Бот останавливается."},
+    ]
+    assert stopped == [True]
+
+
+def test_async_server_can_be_cancelled_while_idle():
+    gui, bot_side = Pipe()
+
+    async def scenario():
+        task = asyncio.create_task(ipc_channel.serve_commands_async(bot_side, None, None))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return task.cancelled()
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+
+import flood_detector
+import regex_filter
+from moderation_rules import ACTIONS, RulePipeline, RuleStatsRegistry, validate_rules
+from word_filter import BadWordMatcher
+
+CHAT_ID = -1001
+
+
+def make_settings(bad_words=("спам",)):
+    return SimpleNamespace(bad_word_matcher=BadWordMatcher(list(bad_words)), regex_time_budget_ms=20)
+
+
+def make_message(text, user_id=1, entities=()):
+    return SimpleNamespace(text=text, entities=[SimpleNamespace(type=kind) for kind in entities],
+                           chat=SimpleNamespace(id=CHAT_ID), from_user=SimpleNamespace(id=user_id))
+
+
+@pytest.fixture
+def registry():
+    return RuleStatsRegistry(stats_interval=0)
+
+
+def test_rules_are_ordered_by_cost_then_by_list(registry):
+    rules = [
+        {'name': 'words', 'match': 'bad_words', 'actions': ['delete']},
+        {'name': 'caps', 'match': 'caps', 'actions': ['delete']},
+        {'name': 'links', 'match': 'links', 'actions': ['delete']},
+        {'name': 'long', 'match': 'length', 'max_length': 100, 'actions': ['delete']},
+    ]
+    pipeline = RulePipeline(rules, make_settings(), registry)
+    assert [rule.name for rule in pipeline.rules] == ['links', 'long', 'caps', 'words']
+
+
+def test_first_matching_rule_stops_the_pipeline(registry):
+    rules = [
+        {'name': 'words', 'match': 'bad_words', 'actions': ['delete', 'warn']},
+        {'name': 'links', 'match': 'links', 'actions': ['delete']},
+    ]
+    pipeline = RulePipeline(rules, make_settings(), registry)
+    hit = pipeline.evaluate(make_message("спам по ссылке", entities=['url']))
+    assert hit.rule.name == 'links'
+    assert registry.get('words').snapshot()["evaluations"] == 0 # Дорогая проверка не выполнялась
+
+    hit = pipeline.evaluate(make_message("просто спам"))
+    assert hit.rule.name == 'words'
+    assert hit.detail == ["спам"]
+    assert pipeline.evaluate(make_message("обычное сообщение")) is None
+
+
+@pytest.mark.parametrize("rule, text, entities, expected", [
+    ({'match': 'links'}, "тут", ['text_link'], True),
+    ({'match': 'links'}, "тут", ['bold'], False),
+    ({'match': 'mentions'}, "@user", ['mention'], True),
+    ({'match': 'length', 'max_length': 5}, "123456", (), True),
+    ({'match': 'length', 'max_length': 5}, "12345", (), False),
+    ({'match': 'caps', 'min_length': 5, 'ratio': 0.8}, "КУПИТЕ СЕЙЧАС", (), True),
+    ({'match': 'caps', 'min_length': 5, 'ratio': 0.8}, "Купите сейчас", (), False),
+    ({'match': 'caps', 'min_length': 5, 'ratio': 0.8}, "ОК", (), False),
+])
+def test_matchers(registry, rule, text, entities, expected):
+    pipeline = RulePipeline([{'name': 'rule', 'actions': ['delete'], **rule}], make_settings(), registry)
+    assert (pipeline.evaluate(make_message(text, entities=entities)) is not None) == expected
+
+
+def test_count_in_window_is_per_user(registry, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(flood_detector, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    rules = [{'name': 'links', 'match': 'links', 'count': 3, 'window_seconds': 60, 'actions': ['delete', 'mute']}]
+    pipeline = RulePipeline(rules, make_settings(), registry)
+    link = dict(entities=['url'])
+
+    assert pipeline.evaluate(make_message("1", user_id=1, **link)) is None
+    assert pipeline.evaluate(make_message("2", user_id=1, **link)) is None
+    assert pipeline.evaluate(make_message("1", user_id=2, **link)) is None # Другой пользователь - свой счетчик
+    assert pipeline.evaluate(make_message("3", user_id=1, **link)).rule.name == 'links'
+
+    # Срабатывания, разнесенные дальше окна, не складываются
+    for _ in range(2):
+        assert pipeline.evaluate(make_message("x", user_id=3, **link)) is None
+    now[0] += 61
+    assert pipeline.evaluate(make_message("x", user_id=3, **link)) is None
+
+    stats = registry.get('links').snapshot()
+    assert stats["evaluations"] == 7
+    assert stats["matches"] == 7
+    assert stats["hits"] == 1
+
+
+def test_actions_and_defaults_reach_the_hit(registry):
+    rules = [{'name': 'all', 'match': 'mentions', 'actions': list(ACTIONS)},
+             {'name': 'custom', 'match': 'links', 'actions': ['mute'], 'mute_minutes': 5, 'reason': "Ссылки",
+              'notice': "{user}, без ссылок", 'notice_summary': "Ссылок: {count}"}]
+    pipeline = RulePipeline(rules, make_settings(), registry)
+
+    rule = pipeline.evaluate(make_message("@user", entities=['mention'])).rule
+    assert rule.actions == ('delete', 'notify', 'warn', 'mute', 'ban')
+    assert (rule.mute_minutes, rule.reason) == (60, "Правило all")
+    assert "{user}" in rule.notice and "{count}" in rule.notice_summary
+
+    rule = pipeline.evaluate(make_message("https://example.com", entities=['url'])).rule
+    assert (rule.actions, rule.mute_minutes, rule.reason) == (('mute',), 5, "Ссылки")
+    assert (rule.notice, rule.notice_summary) == ("{user}, без ссылок", "Ссылок: {count}")
+
+
+def test_stats_survive_reload(registry):
+    rules = [{'name': 'links', 'match': 'links', 'actions': ['delete']}]
+    RulePipeline(rules, make_settings(), registry).evaluate(make_message("a", entities=['url']))
+    RulePipeline(rules, make_settings(), registry).evaluate(make_message("b"))
+    stats = registry.snapshot()["links"]
+    assert (stats["evaluations"], stats["matches"], stats["hits"]) == (2, 1, 1)
+
+
+@pytest.mark.skipif(not regex_filter.available_engines(), reason="не установлен ни google-re2, ни regex")
+def test_regex_rule_records_pattern_hits(registry):
+    rules = [{'name': 'scam', 'match': 'regex', 'actions': ['delete'],
+              'patterns': {'casino': r'казино', 'bet': r'ставк[иа]'}}]
+    pipeline = RulePipeline(rules, make_settings(), registry)
+    hit = pipeline.evaluate(make_message("Казино и ставки"))
+    assert sorted(hit.detail) == ['bet', 'casino']
+    assert registry.get('scam').snapshot()["pattern_hits"] == {'casino': 1, 'bet': 1}
+
+
+@pytest.mark.parametrize("rule, error", [
+    ({'match': 'links', 'actions': ['delete']}, "не задано имя"),
+    ({'name': 'r', 'match': 'unknown', 'actions': ['delete']}, "неизвестная проверка"),
+    ({'name': 'r', 'match': 'links'}, "'actions'"),
+    ({'name': 'r', 'match': 'links', 'actions': []}, "'actions'"),
+    ({'name': 'r', 'match': 'links', 'actions': ['delete', 'kick']}, "'actions'"),
+    ({'name': 'r', 'match': 'length', 'actions': ['delete']}, "'max_length'"),
+    ({'name': 'r', 'match': 'regex', 'actions': ['delete']}, "'pattern'"),
+    ({'name': 'r', 'match': 'regex', 'actions': ['delete'], 'pattern': 'a', 'patterns': {'b': 'b'}}, "'pattern'"),
+    ({'name': 'r', 'match': 'regex', 'actions': ['delete'], 'patterns': {}}, "'pattern'"),
+    ({'name': 'r', 'match': 'regex', 'actions': ['delete'], 'pattern': '(unclosed'}, r"\[r\]"),
+])
+def test_invalid_rules_are_rejected(rule, error):
+    with pytest.raises(ValueError, match=error):
+        validate_rules([rule], where="CHAT_SETTINGS[-1001]")
+
+
+def test_duplicate_rule_names_are_rejected():
+    rule = {'name': 'links', 'match': 'links', 'actions': ['delete']}
+    with pytest.raises(ValueError, match="описано дважды"):
+        validate_rules([rule, dict(rule)])
@@ -0,0 +1,52 @@
+from mute_scheduler import MAX_SLEEP_SECONDS, _DeadlineHeap
+
+
+def test_pop_due_returns_expired_in_deadline_order():
+    heap = _DeadlineHeap()
+    heap.push_many([("c", 30.0), ("a", 10.0), ("b", 20.0)])
+    assert heap.pop_due(25.0) == ["a", "b"]
+    assert heap.pop_due(25.0) == []
+    assert heap.pop_due(30.0) == ["c"]
+
+
+def test_push_reports_new_earliest_deadline():
+    heap = _DeadlineHeap()
+    assert heap.push("a", 20.0)
+    assert not heap.push("b", 30.0)
+    assert heap.push("c", 10.0)
+
+
+def test_cancelled_mute_is_dropped_lazily():
+    heap = _DeadlineHeap()
+    heap.push("a", 10.0)
+    heap.push("b", 20.0)
+    heap.cancel("a")
+    assert len(heap.heap) == 2 # Запись остается в куче до ближайшего pop_due
+    assert heap.pop_due(15.0) == []
+    assert heap.heap == [(20.0, "b")]
+    heap.cancel("unknown") # Снятие неизвестного мута - не ошибка
+
+
+def test_rescheduled_mute_uses_latest_deadline():
+    heap = _DeadlineHeap()
+    heap.push("a", 10.0)
+    heap.push("a", 40.0) # Мут продлен
+    assert heap.pop_due(20.0) == []
+    assert heap.pop_due(40.0) == ["a"]
+    assert heap.pop_due(100.0) == [] # Старая запись не приводит к повторному размуту
+
+    heap.push("b", 40.0)
+    heap.push("b", 5.0) # Мут сокращен
+    assert heap.pop_due(10.0) == ["b"]
+    assert heap.pop_due(50.0) == []
+
+
+def test_sleep_time():
+    heap = _DeadlineHeap()
+    assert heap.sleep_time(0.0) == MAX_SLEEP_SECONDS
+    heap.push("a", 10.0)
+    assert heap.sleep_time(4.0) == 6.0
+    assert heap.sleep_time(20.0) == 0
+    heap.push("b", 10.0 + MAX_SLEEP_SECONDS * 10)
+    heap.pop_due(10.0)
+    assert heap.sleep_time(10.0) == MAX_SLEEP_SECONDS
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('telebot') # rate_limiter использует исключения telebot.apihelper
+
+from rate_limiter import TokenBucket # noqa: E402
+
+
+def make_bucket(rate, capacity, now=0.0):
+    bucket = TokenBucket(rate, capacity)
+    bucket.updated = now
+    return bucket
+
+
+def test_burst_passes_without_delay():
+    bucket = make_bucket(rate=1.0, capacity=3)
+    assert [bucket.reserve(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_reservations_beyond_burst_are_spaced_by_rate():
+    bucket = make_bucket(rate=2.0, capacity=1)
+    assert bucket.reserve(0.0) == 0.0
+    assert bucket.reserve(0.0) == pytest.approx(0.5)
+    assert bucket.reserve(0.0) == pytest.approx(1.0)
+    # Через секунду набежало два токена, но оба уже зарезервированы
+    assert bucket.reserve(1.0) == pytest.approx(0.5)
+
+
+def test_tokens_refill_up_to_capacity():
+    bucket = make_bucket(rate=1.0, capacity=2)
+    bucket.reserve(0.0)
+    bucket.reserve(0.0)
+    assert bucket.reserve(100.0) == 0.0
+    assert bucket.reserve(100.0) == 0.0
+    assert bucket.reserve(100.0) == pytest.approx(1.0)
+
+
+def test_retry_after_blocks_bucket():
+    bucket = make_bucket(rate=10.0, capacity=10)
+    bucket.blocked_until = 5.0
+    assert bucket.reserve(1.0) == pytest.approx(4.0)
+    assert bucket.reserve(6.0) == 0.0
+
+
+class AsyncFakeBot:
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def too_many_requests(retry_after):
+    from telebot.asyncio_helper import ApiTelegramException
+    return ApiTelegramException('sendMessage', None, {'error_code': 429, 'description': 'Too Many Requests',
+                                                      'parameters': {'retry_after': retry_after}})
+
+
+def test_async_bot_retries_after_429():
+    pytest.importorskip('telebot.asyncio_helper') # Нужен aiohttp
+    from rate_limiter import AsyncRateLimitedBot
+    fake = AsyncFakeBot(failures=[too_many_requests(0.01)])
+    bot = AsyncRateLimitedBot(fake, stats_interval=0)
+    asyncio.run(bot.send_message(1, "привет"))
+    assert fake.sent == [(1, "привет")]
+    assert bot.stats()["retry_after_hits"] == 1
+
+
+def test_async_bot_coalesces_notices():
+    pytest.importorskip('telebot.asyncio_helper')
+    from rate_limiter import AsyncRateLimitedBot
+    fake = AsyncFakeBot()
+    bot = AsyncRateLimitedBot(fake, coalesce_window=0.01, stats_interval=0)
+
+    async def scenario():
+        for user in ("a", "b", "a"):
+            await bot.send_coalesced(1, 'rule:spam', f"{user}: спам", user, "Спам: {count} ({items})")
+        await asyncio.sleep(0.05)
+        await bot.send_coalesced(2, 'rule:spam', "c: спам", "c", "Спам: {count} ({items})")
+        await bot.flush_notices()
+
+    asyncio.run(scenario())
+    assert fake.sent == [(1, "Спам: 3 (a, b)"), (2, "c: спам")]
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+import regex_filter
+from regex_filter import PatternSet
+
+PATTERNS = {
+    'invite': r'(?:t\.me|telegram\.me)/(?:\+|joinchat/)[\w-]{10,}',
+    'link': r'\b(?:https?://|www\.)\S+',
+    'phone': r'(?:\+7|\b8)[\s(-]*9\d{2}[\s)-]*\d{3}[\s-]*\d{2}[\s-]*\d{2}\b',
+}
+# Перекрывающиеся варианты: при неудаче стандартный re перебирает 2^n разбиений строки
+ALTERNATION_OVERLAP = r'(a|aa)+$'
+
+needs_engine = pytest.mark.skipif(not regex_filter.available_engines(), reason="не установлен ни google-re2, ни regex")
+
+
+@pytest.mark.skipif(bool(regex_filter.available_engines()), reason="установлен google-re2 или regex")
+@pytest.mark.parametrize("pattern", [r'\d+', ALTERNATION_OVERLAP])
+def test_patterns_are_refused_without_interruptible_engine(pattern):
+    with pytest.raises(ValueError, match="google-re2"):
+        PatternSet({'any': pattern})
+
+
+@needs_engine
+def test_alternation_overlap_stays_within_budget():
+    patterns = PatternSet({'bad': ALTERNATION_OVERLAP}, time_budget=0.01)
+    started = time.perf_counter()
+    names, over_budget = patterns.search("a" * 30 + "b")
+    assert time.perf_counter() - started < 0.5
+    assert names == []
+    # re2 находит ответ за линейное время, regex прерывает поиск по бюджету
+    assert over_budget == (patterns.engines == ['regex'])
+
+
+@needs_engine
+def test_finds_all_matching_patterns():
+    patterns = PatternSet(PATTERNS)
+    assert patterns.search("обычное сообщение") == ([], False)
+    names, over_budget = patterns.search("Вступайте: HTTPS://t.me/+AbCdEfGhIjKlM или звоните 8 912 345-67-89")
+    assert sorted(names) == ['invite', 'link', 'phone'] # Ссылка-приглашение - это и 'link', и 'invite'
+    assert not over_budget
+
+
+@needs_engine
+def test_case_sensitive_patterns():
+    patterns = PatternSet({'word': r'Спам'}, ignore_case=False)
+    assert patterns.search("спам") == ([], False)
+    assert patterns.search("Спам") == (['word'], False)
+
+
+@needs_engine
+def test_invalid_pattern_is_rejected_with_its_name():
+    with pytest.raises(ValueError, match="'broken'"):
+        PatternSet({'ok': r'\d+', 'broken': r'(unclosed'})
+
+
+@needs_engine
+def test_exhausted_budget_is_reported():
+    patterns = PatternSet(PATTERNS, time_budget=0)
+    names, over_budget = patterns.search("https://example.com")
+    assert over_budget
+    assert names == []
+
+
+@needs_engine
+def test_long_text_is_truncated():
+    patterns = PatternSet({'tail': r'хвост'})
+    assert patterns.search("а" * regex_filter.MAX_TEXT_LENGTH + "хвост") == ([], False)
@@ -0,0 +1,56 @@
+import pytest
+
+from spam_fingerprint import NearDuplicateIndex, minhash, normalize, similarity
+
+CHAT_ID = -1001
+SPAM = "Заработок от 5000 рублей в день без вложений, пишите в личку прямо сейчас"
+# Тот же текст с другими знаками, регистром и парой замененных букв
+SPAM_VARIANTS = [
+    "ЗАРАБОТОК от 5000 рублей в день без вложений!!! пишите в личку прямо сейчас",
+    "Заработок от 7000 рублей в день без вложений, пишите в личку прямо сейчас 🔥",
+    "Заработок от 5000 рублей в день без вложений, пишите в лс прямо сейчас",
+]
+OTHER = "Кто-нибудь знает, во сколько завтра начинается встреча в библиотеке?"
+
+
+@pytest.fixture
+def index():
+    return NearDuplicateIndex(window_seconds=600, stats_interval=0)
+
+
+def test_normalize_drops_case_and_punctuation():
+    assert normalize("  Привет,  МИР!!! 2024 ") == "привет мир 2024"
+
+
+def test_similarity_of_signatures():
+    spam = minhash(normalize(SPAM))
+    assert similarity(spam, spam) == 1.0
+    assert similarity(spam, minhash(normalize(SPAM_VARIANTS[1]))) >= 0.6
+    assert similarity(spam, minhash(normalize(OTHER))) < 0.3
+
+
+def test_cluster_is_returned_when_copies_reached(index):
+    assert index.add(CHAT_ID, 1, 101, SPAM, copies=3, now=1) is None
+    assert index.add(CHAT_ID, 2, 102, SPAM_VARIANTS[0], copies=3, now=2) is None
+    assert index.add(CHAT_ID, 9, 109, OTHER, copies=3, now=3) is None
+    assert index.add(CHAT_ID, 3, 103, SPAM_VARIANTS[1], copies=3, now=4) == [(1, 101), (2, 102), (3, 103)]
+    # Дальнейшие копии той же группы - по одной
+    assert index.add(CHAT_ID, 4, 104, SPAM_VARIANTS[2], copies=3, now=5) == [(4, 104)]
+
+
+def test_chats_are_separate(index):
+    assert index.add(CHAT_ID, 1, 101, SPAM, copies=2, now=1) is None
+    assert index.add(CHAT_ID - 1, 2, 201, SPAM, copies=2, now=2) is None
+    assert index.add(CHAT_ID, 3, 102, SPAM, copies=2, now=3) == [(1, 101), (3, 102)]
+
+
+def test_old_messages_expire(index):
+    assert index.add(CHAT_ID, 1, 101, SPAM, copies=2, now=1) is None
+    assert index.add(CHAT_ID, 2, 102, SPAM, copies=2, now=1000) is None
+    assert len(index) == 1
+
+
+def test_short_texts_and_disabled_check_are_skipped(index):
+    assert index.add(CHAT_ID, 1, 101, "+1", copies=1, now=1) is None
+    assert index.add(CHAT_ID, 1, 102, SPAM, copies=0, now=1) is None
+    assert len(index) == 0
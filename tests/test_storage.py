@@ -0,0 +1,90 @@
+import sqlite3
+
+import pytest
+
+from storage import SCHEMA_VERSION, ModerationStore
+
+# Схема первой версии: предупреждения и муты без разделения по чатам
+SCHEMA_V1 = """
+CREATE TABLE warns (user_id INTEGER PRIMARY KEY, count INTEGER NOT NULL);
+CREATE TABLE mutes (user_id INTEGER PRIMARY KEY, end_time REAL NOT NULL, reason TEXT, admin_id TEXT);
+CREATE INDEX idx_mutes_end_time ON mutes(end_time);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+CHAT_ID = -1001
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ModerationStore(str(tmp_path / "bot.db"), CHAT_ID)
+    yield store
+    store.close()
+
+
+def make_v1_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_V1)
+    conn.executemany("INSERT INTO warns (user_id, count) VALUES (?, ?)", [(1, 2), (2, 1)])
+    conn.execute("INSERT INTO mutes (user_id, end_time, reason, admin_id) VALUES (3, 100.0, 'спам', '42')")
+    conn.commit()
+    conn.close()
+
+
+def test_upgrade_from_v1_moves_data_to_default_chat(tmp_path):
+    path = str(tmp_path / "bot.db")
+    make_v1_database(path)
+
+    store = ModerationStore(path, CHAT_ID)
+    try:
+        assert store.get_warns(CHAT_ID, 1) == 2
+        assert store.get_warns(CHAT_ID, 2) == 1
+        assert store.get_warns(-2002, 1) == 0
+        assert store.get_mute(CHAT_ID, 3) == {"end_time": 100.0, "reason": "спам", "admin_id": "42"}
+        assert store.due_mutes(200.0) == [(CHAT_ID, 3, 100.0)]
+        assert store.due_mutes(200.0, chat_id=CHAT_ID) == [(CHAT_ID, 3, 100.0)]
+        # Новые записи идут уже по ключу (chat_id, user_id)
+        assert store.add_warn(-2002, 1) == 1
+        assert store.get_warns(CHAT_ID, 1) == 2
+    finally:
+        store.close()
+
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    version = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0]
+    conn.close()
+    assert not {"warns_v1", "mutes_v1"} & tables
+    assert version == str(SCHEMA_VERSION)
+
+
+def test_upgraded_database_opens_again_without_changes(tmp_path):
+    path = str(tmp_path / "bot.db")
+    make_v1_database(path)
+    ModerationStore(path, CHAT_ID).close()
+
+    store = ModerationStore(path, -2002) # Другой чат по умолчанию уже ни на что не влияет
+    try:
+        assert store.get_warns(CHAT_ID, 1) == 2
+        assert store.get_warns(-2002, 1) == 0
+        assert store.mutes_count() == 1
+    finally:
+        store.close()
+
+
+def test_warns_are_counted_per_chat(store):
+    assert store.add_warn(CHAT_ID, 1) == 1
+    assert store.add_warn(CHAT_ID, 1) == 2
+    assert store.add_warn(-2002, 1) == 1
+    store.reset_warns(CHAT_ID, 1)
+    assert store.get_warns(CHAT_ID, 1) == 0
+    assert store.get_warns(-2002, 1) == 1
+
+
+def test_mutes_batch_and_due(store):
+    store.set_mutes([(CHAT_ID, 1, 50.0, "флуд", "gui"), (CHAT_ID, 2, 150.0, "флуд", "gui"), (-2002, 1, 60.0, None, 7)])
+    assert store.due_mutes(100.0) == [(CHAT_ID, 1, 50.0), (-2002, 1, 60.0)]
+    assert store.due_mutes(100.0, chat_id=-2002) == [(-2002, 1, 60.0)]
+    store.clear_mutes([(CHAT_ID, 1), (-2002, 1)])
+    assert store.mutes_count() == 1
+    assert store.clear_mute(CHAT_ID, 2)
+    assert not store.clear_mute(CHAT_ID, 2)
@@ -0,0 +1,85 @@
+import pytest
+
+import text_normalizer
+from text_normalizer import normalize
+from word_filter import BadWordMatcher
+
+
+@pytest.mark.parametrize("text", [
+    "ДУРАК",
+    "дурaк",            # латинская "a"
+    "ду\u200bрак",      # пробел нулевой ширины
+    "д\u0336у\u0336р\u0336а\u0336к\u0336", # зачеркивание комбинируемыми знаками
+    "д у р а к",
+    "д.у.р.а.к",
+    "д у p а к",        # латинская "p" среди разделенных букв
+    "ду*рак",
+    "ду-рак",
+])
+def test_obfuscated_word_is_folded(text):
+    assert normalize(text) == "дурак"
+
+
+def test_long_letter_runs_are_shortened_to_two():
+    assert normalize("рассссылка") == "рассылка"
+    assert normalize("дуууурак") == "дуурак"
+
+
+@pytest.mark.parametrize("text", ["редиска вкусная", "касса", "ванна", "100500", "2000 рублей", "аа"])
+def test_ordinary_words_and_numbers_keep_letters(text):
+    assert normalize(text) == text
+
+
+def test_single_letters_do_not_match_doubled_bad_word():
+    # В BAD_WORDS по умолчанию есть "редискаа"
+    matcher = BadWordMatcher(["редискаа"], normalize=normalize)
+    assert matcher.find_first("редиска вкусная") is None
+    assert matcher.find_first("редискааааа!") == "редискаа"
+
+
+def test_compatibility_forms():
+    assert normalize("ｄｕｒａｋ") == "durak"
+    assert normalize("𝐝𝐮𝐫𝐚𝐤") == "durak"
+
+
+def test_digits_and_signs_in_cyrillic_words():
+    assert normalize("д0рак") == "дорак"
+    assert normalize("$уk@") == "сука"
+    assert normalize("с@ка") == "сака"
+
+
+@pytest.mark.parametrize("text", ["hop on top", "e-mail", "2023", "call me at 10:30", "price $5"])
+def test_text_without_cyrillic_keeps_latin_letters_and_digits(text):
+    folded = normalize(text)
+    assert not text_normalizer._CYRILLIC_RE.search(folded)
+
+
+@pytest.mark.parametrize("text", ["в 2 0 2 3 году", "код 1 2 3", "а 0 б 3 в"])
+def test_spaced_digits_are_not_joined(text):
+    assert normalize(text) == text
+
+
+def test_latin_words_next_to_cyrillic_are_not_rewritten():
+    assert normalize("привет hop 2023") == "привет hop 2023"
+
+
+def test_long_texts_are_not_cached():
+    text_normalizer.cache_clear()
+    short = "привет"
+    long = "привет " * (text_normalizer.CACHED_TEXT_LENGTH // 7 + 1)
+    assert len(long) > text_normalizer.CACHED_TEXT_LENGTH
+    normalize(short)
+    normalize(short)
+    normalize(long)
+    normalize(long)
+    assert text_normalizer.cache_stats() == {"hits": 1, "misses": 1, "size": 1}
+    text_normalizer.cache_clear()
+    assert text_normalizer.cache_stats()["size"] == 0
+
+
+def test_matcher_with_normalizer_reports_original_word():
+    # В списке слово записано с "@", в автомате - нормализованное "дурак"
+    matcher = BadWordMatcher(["Дур@к", "спам"], normalize=normalize)
+    assert matcher.find_first("ты д у p а к") == "дур@к"
+    assert matcher.find_first("СПАМ!") == "спам"
+    assert matcher.find_first("hop on top") is None
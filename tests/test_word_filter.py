@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from word_filter import MATCH_MODE_SUBSTRING, MATCH_MODE_WHOLE_WORD, BadWordMatcher
+
+
+def test_finds_substrings_case_insensitively():
+    matcher = BadWordMatcher(["спам", "реклама"])
+    assert matcher.find_first("Купите РЕКЛАМУ") is None
+    assert matcher.find_first("Это СпАм!") == "спам"
+    assert sorted(matcher.find_all("спам и реклама, снова спам")) == ["реклама", "спам"]
+
+
+def test_overlapping_words_are_all_found():
+    # Классический пример Ахо-Корасик: слова заканчиваются внутри друг друга
+    matcher = BadWordMatcher(["he", "she", "his", "hers"])
+    assert sorted(matcher.find_all("ushers")) == ["he", "hers", "she"]
+
+
+def test_whole_word_mode():
+    matcher = BadWordMatcher(["кот"], mode=MATCH_MODE_WHOLE_WORD)
+    assert matcher.find_first("котлета") is None
+    assert matcher.find_first("скот") is None
+    assert matcher.find_first("это кот!") == "кот"
+    assert matcher.find_first("кот") == "кот"
+
+
+def test_reload_replaces_words_and_mode():
+    matcher = BadWordMatcher(["старое"])
+    matcher.reload(["новое"], MATCH_MODE_WHOLE_WORD)
+    assert matcher.find_first("старое") is None
+    assert matcher.find_first("новое слово") == "новое"
+    assert matcher.mode == MATCH_MODE_WHOLE_WORD
+    assert matcher.words == ["новое"]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        BadWordMatcher(["слово"], mode="regex")
+
+
+def test_empty_word_list():
+    matcher = BadWordMatcher([])
+    assert matcher.find_first("что угодно") is None
+    assert matcher.find_all("что угодно") == []
+
+
+def test_matches_naive_substring_search():
+    # Результат автомата совпадает со старой проверкой "word in text.lower()"
+    rng = random.Random(1)
+    alphabet = "абвгд"
+    words = list({''.join(rng.choice(alphabet) for _ in range(rng.randint(2, 5))) for _ in range(50)})
+    matcher = BadWordMatcher(words, mode=MATCH_MODE_SUBSTRING)
+    for _ in range(300):
+        text = ''.join(rng.choice(alphabet + " ") for _ in range(rng.randint(0, 40)))
+        assert sorted(matcher.find_all(text)) == sorted(word for word in words if word in text.lower())
@@ -0,0 +1,117 @@
+# text_normalizer.py - Нормализация текста перед поиском плохих слов
+#
+# Обходы фильтра, которые ловит normalize():
+#   - "ДУРАК", "ｄｕｒａｋ", "𝐝𝐮𝐫𝐚𝐤"  - регистр и совместимые формы (NFKC + casefold);
+#   - "дурaк" с латинской "a", "д0рак" - латинские и греческие буквы, цифры и знаки, похожие на
+#                                     кириллицу, в словах, где уже есть кириллица;
+#   - "ду<U+200B>рак", "д̶у̶р̶а̶к̶"  - невидимые символы и комбинируемые знаки;
+#   - "д у р а к", "д.у.р.а.к"      - буквы (не цифры), разделенные пробелами или знаками;
+#   - "ду*рак", "ду-рак"            - знаки препинания внутри слова;
+#   - "рассссылка"                  - повтор буквы три раза и больше (сокращается до двух).
+# Список плохих слов проходит через ту же нормализацию, поэтому слова с цифрами
+# или удвоенными буквами по-прежнему совпадают сами с собой. Одиночные и двойные
+# буквы не меняются ("редиска" и "редискаа" - разные слова), цифры не сокращаются
+# ("100500"). Слова без кириллицы ("hop", "2023", "e-mail") похожими буквами не
+# заменяются: иначе обычный английский текст и числа превращались бы в русские
+# слова ("hop" -> "нор").
+#
+# Замены символов собраны в таблицы str.translate, регулярные выражения
+# компилируются один раз. Результат для коротких текстов (до CACHED_TEXT_LENGTH
+# символов) кэшируется (lru_cache): одинаковые сообщения (спам, "+1", "привет")
+# нормализуются один раз. Длинные тексты не кэшируются, так что кэш занимает не
+# больше CACHE_SIZE * CACHED_TEXT_LENGTH символов (с результатами - порядка 4 МБ).
+# Кэшируется только нормализация, поиск слов по автомату выполняется каждый раз.
+
+import functools
+import re
+import unicodedata
+
+CACHE_SIZE = 4096
+CACHED_TEXT_LENGTH = 256 # Тексты длиннее не кэшируются: повторяются в основном короткие сообщения
+
+# Невидимые символы: пробелы нулевой ширины, мягкий перенос, селекторы вариантов и т.п.
+_INVISIBLE = ['\u00ad', '\u034f', '\u061c', '\u115f', '\u1160', '\u17b4', '\u17b5', '\u180e', '\u3164', '\ufeff', '\uffa0']
+_INVISIBLE += [chr(code) for code in range(0x200b, 0x2010)]  # zero width space/joiners, LRM/RLM
+_INVISIBLE += [chr(code) for code in range(0x202a, 0x202f)]  # управление направлением текста
+_INVISIBLE += [chr(code) for code in range(0x2060, 0x2070)]  # word joiner, невидимые операторы
+_INVISIBLE += [chr(code) for code in range(0xfe00, 0xfe10)]  # селекторы вариантов
+
+# Комбинируемые знаки (ударения, зачеркивание "д̶у̶р̶а̶к̶" и т.п.); "й" и "ё" после NFKC уже составные
+_COMBINING = [chr(code) for code in range(0x0300, 0x0370)] + [chr(code) for code in range(0x1ab0, 0x1b00)] + \
+             [chr(code) for code in range(0x20d0, 0x2100)]
+
+# Похожие на кириллицу латинские и греческие буквы (после casefold), "цифры-буквы" и знаки. Заменяются только
+# в словах, где есть кириллица ("дурaк", "д0рак"), - в остальном тексте это обычные буквы и цифры
+_HOMOGLYPHS = {
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м', 'n': 'п', 'o': 'о', 'p': 'р',
+    'r': 'г', 't': 'т', 'u': 'и', 'x': 'х', 'y': 'у',
+    'α': 'а', 'β': 'в', 'γ': 'у', 'ε': 'е', 'η': 'п', 'κ': 'к', 'μ': 'м', 'ο': 'о',
+    'π': 'п', 'ρ': 'р', 'τ': 'т', 'υ': 'у', 'χ': 'х', 'ω': 'ш',
+    '0': 'о', '3': 'з', '6': 'б', '@': 'а', '$': 'с',
+}
+
+_TRANSLATION = str.maketrans({**dict.fromkeys(_INVISIBLE + _COMBINING), 'ё': 'е'})
+_HOMOGLYPH_TRANSLATION = str.maketrans(_HOMOGLYPHS)
+# translate с таблицей-словарем медленно идет по не-ASCII тексту, а заменять в обычном сообщении обычно нечего:
+# сначала ищем хотя бы один такой символ (класс символов в регулярном выражении проверяется в C)
+_NEEDS_TRANSLATION_RE = re.compile('[' + re.escape(''.join(chr(code) for code in _TRANSLATION)) + ']')
+_HOMOGLYPH_RE = re.compile('[' + re.escape(''.join(_HOMOGLYPHS)) + ']')
+_CYRILLIC_RE = re.compile('[\u0400-\u04ff]')
+_WORD_RE = re.compile(r'[\w@$]+') # "@" и "$" - тоже "буквы": "$уk@"
+
+_SPACED_LETTERS_RE = re.compile(r'(?<!\w)[^\W\d_](?:[\W_]+[^\W\d_](?!\w)){2,}') # "д у р а к", "д.у.р.а.к" (от трех букв, не цифр)
+_SEPARATOR_RE = re.compile(r'[\W_]+')
+_INNER_PUNCTUATION_RE = re.compile(r'(?<=\w)[^\w\s]+(?=\w)')        # "ду*рак", "ду-рак"
+_REPEATS_RE = re.compile(r'([^\W\d_])\1{2,}')                         # "рассссылка" -> "рассылка" (только буквы)
+
+
+def _join_spaced_letters(match):
+    return _SEPARATOR_RE.sub('', match.group(0))
+
+
+def _fold_mixed_word(match):
+    word = match.group(0)
+    if _CYRILLIC_RE.search(word) and _HOMOGLYPH_RE.search(word):
+        return word.translate(_HOMOGLYPH_TRANSLATION)
+    return word
+
+
+def _fold_homoglyphs(text):
+    # Пословно и только если в тексте есть и кириллица, и что заменять (обычное сообщение отсекается двумя проверками в C)
+    if _HOMOGLYPH_RE.search(text) and _CYRILLIC_RE.search(text):
+        return _WORD_RE.sub(_fold_mixed_word, text)
+    return text
+
+
+def normalize(text):
+    """Приводит текст к виду для поиска плохих слов (см. описание модуля). Результат для коротких текстов кэшируется."""
+    if len(text) <= CACHED_TEXT_LENGTH:
+        return _normalize_cached(text)
+    return _normalize(text)
+
+
+def _normalize(text):
+    if not text.isascii():
+        text = unicodedata.normalize('NFKC', text)
+    text = text.casefold()
+    if _NEEDS_TRANSLATION_RE.search(text):
+        text = text.translate(_TRANSLATION)
+    text = _fold_homoglyphs(text) # До склейки: "с@ка" ("@" внутри слова иначе удалится как знак)
+    text = _SPACED_LETTERS_RE.sub(_join_spaced_letters, text)
+    text = _INNER_PUNCTUATION_RE.sub('', text)
+    text = _fold_homoglyphs(text) # После склейки: "д у p а к", "ду*pак" стали одним словом
+    text = _REPEATS_RE.sub(r'\1\1', text)
+    return ' '.join(text.split())
+
+
+_normalize_cached = functools.lru_cache(maxsize=CACHE_SIZE)(_normalize)
+
+
+def cache_stats():
+    """Попадания и промахи кэша нормализации."""
+    info = _normalize_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+
+
+def cache_clear():
+    _normalize_cached.cache_clear()
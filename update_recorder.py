@@ -0,0 +1,181 @@
+# update_recorder.py - Запись входящих обновлений для последующего воспроизведения
+#
+# При RECORD_UPDATES = True каждое полученное обновление (polling или webhook)
+# записывается в сжатые файлы-сегменты <каталог>/updates.000001.jsonl.gz, ...
+# по одной строке {"ts": время получения, "update": JSON обновления от Telegram}.
+# Каждый запуск бота начинает новый сегмент; сегмент закрывается, когда в него
+# записано max_segment_bytes несжатых данных.
+#
+# Запись выполняет отдельный поток, как в event_log.py: обработчик обновлений
+# только кладет объекты в ограниченную очередь (при переполнении обновление не
+# записывается и учитывается в статистике), а JSON и сжатие - в потоке записи.
+#
+# read_updates() читает сегменты по порядку; воспроизведение через обработчики
+# бота с поддельным Bot API - benchmarks/replay_updates.py.
+
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'updates'
+WRITE_BATCH_SIZE = 500 # Сколько обновлений поток записи забирает из очереди за один раз
+
+_SEGMENT_RE = re.compile(re.escape(SEGMENT_PREFIX) + r'\.(\d{6})\.jsonl\.gz$')
+
+
+def _segment_path(directory, segment):
+    return os.path.join(directory, f"{SEGMENT_PREFIX}.{segment:06d}.jsonl.gz")
+
+
+def _list_segments(directory):
+    segments = []
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{SEGMENT_PREFIX}.*.jsonl.gz")):
+        match = _SEGMENT_RE.match(os.path.basename(path))
+        if match:
+            segments.append(int(match.group(1)))
+    return sorted(segments)
+
+
+def update_to_dict(update):
+    """
+    JSON обновления в формате Bot API. TeleBot хранит исходный JSON у сообщений (и части других объектов)
+    в атрибуте json; поля без него не восстанавливаются. Возвращает None, если восстановить нечего.
+    """
+    raw = {"update_id": update.update_id}
+    for field, value in vars(update).items():
+        if value is not None and isinstance(getattr(value, 'json', None), dict):
+            raw[field] = value.json
+    return raw if len(raw) > 1 else None
+
+
+class UpdateRecorder:
+    """Запись обновлений: record() из любого потока, сжатие и запись на диск - в потоке update-recorder."""
+
+    def __init__(self, directory, max_segment_bytes=50 * 1024 * 1024, queue_size=10000):
+        self.directory = directory
+        self._max_segment_bytes = max_segment_bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        # Метрики
+        self.recorded = 0
+        self.dropped = 0
+        self.unsupported = 0 # Обновления без исходного JSON (см. update_to_dict)
+
+    def record(self, updates):
+        """Ставит обновления в очередь на запись. Никогда не блокирует."""
+        now = time.time()
+        dropped = 0
+        for update in updates:
+            try:
+                self._queue.put_nowait((now, update))
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            with self._lock:
+                self.dropped += dropped
+
+    # --- Поток записи ---
+    def _open_segment(self):
+        segments = _list_segments(self.directory)
+        self._segment = segments[-1] + 1 if segments else 1
+        self._file = gzip.open(_segment_path(self.directory, self._segment), 'wb')
+        self._written = 0
+
+    def _write_batch(self, items):
+        lines = []
+        unsupported = 0
+        for ts, update in items:
+            raw = update_to_dict(update)
+            if raw is None:
+                unsupported += 1
+                continue
+            lines.append(json.dumps({"ts": ts, "update": raw}, ensure_ascii=False, separators=(',', ':')) + '\n')
+        data = ''.join(lines).encode('utf-8')
+        self._file.write(data)
+        self._file.flush() # Сжатые данные сбрасываются на диск пачкой: после сбоя теряется только недописанная пачка
+        self._written += len(data)
+        with self._lock:
+            self.recorded += len(lines)
+            self.unsupported += unsupported
+        if self._written >= self._max_segment_bytes:
+            self._file.close()
+            self._open_segment()
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._open_segment()
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                items = []
+                while item is not None:
+                    items.append(item)
+                    if len(items) >= WRITE_BATCH_SIZE:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stopping = True
+                if items:
+                    try:
+                        self._write_batch(items)
+                    except Exception as e:
+                        logger.error(f"Не удалось записать {len(items)} обновлений: {e}", exc_info=True)
+        finally:
+            self._file.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="update-recorder")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Запись входящих обновлений включена: {os.path.abspath(self.directory)}")
+
+    def stop(self):
+        """Дописывает обновления из очереди, закрывает сегмент и останавливает поток записи."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+        stats = self.stats()
+        logger.info(f"Запись обновлений остановлена: записано {stats['recorded']}, пропущено при переполнении очереди "
+                    f"{stats['dropped']}, без исходного JSON {stats['unsupported']}.")
+
+    def stats(self):
+        with self._lock:
+            return {"recorded": self.recorded, "dropped": self.dropped, "unsupported": self.unsupported,
+                    "backlog": self._queue.qsize()}
+
+
+def read_updates(path):
+    """
+    Генератор (ts, update) по записанным обновлениям. path - каталог записи (все сегменты по порядку) или один сегмент.
+    Недописанный после сбоя конец сегмента пропускается.
+    """
+    if os.path.isdir(path):
+        paths = [_segment_path(path, segment) for segment in _list_segments(path)]
+    else:
+        paths = [path]
+    for segment_path in paths:
+        try:
+            with gzip.open(segment_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    record = json.loads(line)
+                    yield record["ts"], record["update"]
+        except (EOFError, gzip.BadGzipFile, ValueError) as e:
+            logger.warning(f"Сегмент {segment_path} прочитан не полностью: {e}")
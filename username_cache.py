@@ -0,0 +1,165 @@
+# username_cache.py - Кэш @username -> user_id
+#
+# Telegram не дает боту найти пользователя по username, поэтому бот запоминает
+# пары username/ID из всех обновлений, которые видит (авторы сообщений, авторы
+# сообщений, на которые ответили, новые участники). Кэш ограничен по размеру
+# (LRU) и по давности (TTL); изменения сохраняются в хранилище пачками раз в
+# flush_interval секунд и загружаются при старте, так что /ban_id @user работает
+# и после перезапуска без дополнительных запросов к API.
+
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Повторно отмечать "пользователь снова виден" не чаще этого интервала: иначе каждое сообщение - запись в базу
+REFRESH_INTERVAL_SECONDS = 24 * 60 * 60
+
+
+def normalize_username(username):
+    return username.lstrip('@').lower()
+
+
+class UsernameCache:
+    def __init__(self, store, max_entries=100000, ttl_seconds=30 * 24 * 60 * 60, flush_interval=60, stats_interval=60):
+        self._store = store
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict() # username -> (user_id, seen_at), порядок - LRU
+        self._usernames_by_id = {}                # user_id -> username (чтобы забыть старый username при смене)
+        self._dirty = {}                          # username -> (user_id, seen_at), еще не сохранены
+        self._removed = set()                     # username, которые нужно удалить из хранилища
+        self._stop = threading.Event()
+        self._thread = None
+        # Метрики
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        if stats_interval:
+            reporter = threading.Thread(target=self._stats_reporter, args=(stats_interval,), name="username-cache-stats")
+            reporter.daemon = True
+            reporter.start()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Загружает сохраненные пары (самые свежие, не старше TTL)."""
+        rows = self._store.load_usernames(time.time() - self._ttl, self._max_entries)
+        with self._lock:
+            for username, user_id, seen_at in sorted(rows, key=lambda row: row[2]):
+                self._entries[username] = (user_id, seen_at)
+                self._usernames_by_id[user_id] = username
+        logger.info(f"Кэш username загружен: {len(rows)} записей.")
+        return len(rows)
+
+    def observe(self, user_id, username, now=None):
+        """Запоминает, что у пользователя user_id сейчас такой username."""
+        if not username:
+            return
+        username = normalize_username(username)
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and entry[0] == user_id and now - entry[1] < REFRESH_INTERVAL_SECONDS:
+                self._entries.move_to_end(username)
+                return
+            old_username = self._usernames_by_id.get(user_id)
+            if old_username is not None and old_username != username:
+                # Пользователь сменил username - старый больше на него не указывает
+                self._entries.pop(old_username, None)
+                self._dirty.pop(old_username, None)
+                self._removed.add(old_username)
+            if entry is not None and entry[0] != user_id:
+                self._usernames_by_id.pop(entry[0], None) # username перешел к другому пользователю
+            self._entries[username] = (user_id, now)
+            self._entries.move_to_end(username)
+            self._usernames_by_id[user_id] = username
+            self._dirty[username] = (user_id, now)
+            self._removed.discard(username)
+            while len(self._entries) > self._max_entries:
+                evicted_username, (evicted_id, _) = self._entries.popitem(last=False)
+                self._usernames_by_id.pop(evicted_id, None)
+                self.evicted += 1 # В хранилище запись остается до истечения TTL
+
+    def observe_user(self, user):
+        """observe() для объекта User из telebot (может быть None)."""
+        if user is not None and not getattr(user, 'is_bot', False):
+            self.observe(user.id, user.username)
+
+    def resolve(self, username, now=None):
+        """ID пользователя по username или None, если его нет в кэше или запись устарела."""
+        username = normalize_username(username)
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_id, seen_at = entry
+            if now - seen_at > self._ttl:
+                del self._entries[username]
+                self._usernames_by_id.pop(user_id, None)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return user_id
+
+    # --- Сохранение ---
+    def flush(self):
+        """Сохраняет накопленные изменения одной транзакцией и удаляет из хранилища записи старше TTL."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            removed, self._removed = self._removed, set()
+        if not dirty and not removed:
+            return 0
+        rows = [(username, user_id, seen_at) for username, (user_id, seen_at) in dirty.items()]
+        self._store.save_usernames(rows, removed, time.time() - self._ttl)
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self._flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Не удалось сохранить кэш username: {e}", exc_info=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="username-cache")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "unsaved": len(self._dirty),
+            }
+
+    def _stats_reporter(self, interval):
+        while True:
+            time.sleep(interval)
+            stats = self.stats()
+            if stats["hits"] or stats["misses"]:
+                logger.info(f"Кэш username: записей {stats['entries']}, попаданий {stats['hits']}, промахов {stats['misses']} "
+                            f"({stats['hit_rate']:.0%}), устарело {stats['expired']}, вытеснено {stats['evicted']}")
@@ -0,0 +1,105 @@
+# webhook_server.py - Прием обновлений Telegram через webhook (альтернатива bot.polling)
+#
+# Встроенный HTTP-сервер принимает POST-запросы от Telegram, проверяет заголовок
+# X-Telegram-Bot-Api-Secret-Token и передает обновления в те же обработчики,
+# что и polling (bot.process_new_updates). Telegram отправляет webhook только
+# на HTTPS, поэтому снаружи сервер обычно закрывают обратным прокси (nginx, caddy).
+
+import hmac
+import json
+import logging
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+MAX_BODY_BYTES = 1024 * 1024 # Обновления Telegram намного меньше; защищаемся от мусорных запросов
+
+
+class _WebhookRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TelegramBotWebhook/1.0"
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        webhook = self.server.webhook
+        if self.path != webhook.path:
+            self._reply(404)
+            return
+        token = self.headers.get(SECRET_TOKEN_HEADER, '')
+        if not hmac.compare_digest(token.encode('utf-8'), webhook.secret_token.encode('utf-8')):
+            webhook.rejected += 1
+            logger.warning(f"Webhook: отклонен запрос от {self.client_address[0]} с неверным секретным токеном.")
+            self._reply(403)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self._reply(400)
+            return
+        try:
+            update = types.Update.de_json(json.loads(self.rfile.read(length)))
+        except (ValueError, KeyError) as e:
+            logger.error(f"Webhook: не удалось разобрать обновление: {e}")
+            self._reply(400)
+            return
+        # Сначала отвечаем Telegram, затем обрабатываем: медленный обработчик не должен вызывать повторную доставку
+        self._reply(200)
+        webhook.received += 1
+        try:
+            webhook.bot.process_new_updates([update])
+        except Exception as e:
+            logger.error(f"Webhook: ошибка при обработке обновления {update.update_id}: {e}", exc_info=True)
+
+    def do_GET(self):
+        self._reply(405)
+
+    def log_message(self, format, *args):
+        pass # Не пишем строку в лог на каждый запрос, ошибки логируются отдельно
+
+
+class WebhookServer:
+    def __init__(self, bot, listen='127.0.0.1', port=8443, path='/telegram-webhook', secret_token=None):
+        self.bot = bot
+        self.path = path
+        # Если токен не задан, генерируем случайный: он все равно передается Telegram в set_webhook при каждом запуске
+        self.secret_token = secret_token or secrets.token_urlsafe(32)
+        self.received = 0
+        self.rejected = 0
+        self._httpd = ThreadingHTTPServer((listen, port), _WebhookRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.webhook = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def register(self, public_url):
+        """Сообщает Telegram адрес webhook и секретный токен."""
+        self.bot.remove_webhook()
+        self.bot.set_webhook(url=public_url, secret_token=self.secret_token)
+        logger.info(f"Webhook зарегистрирован: {public_url}")
+
+    def serve_forever(self):
+        logger.info(f"Webhook-сервер слушает {self.address[0]}:{self.address[1]}{self.path}")
+        self._httpd.serve_forever()
+
+    def start(self):
+        """Запускает сервер в фоновом потоке (для тестового стенда)."""
+        self._thread = threading.Thread(target=self.serve_forever, name="webhook-server")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,138 @@
+# word_filter.py - Быстрый поиск запрещенных слов (автомат Ахо-Корасик)
+
+import threading
+
+MATCH_MODE_SUBSTRING = 'substring'   # Слово ищется как подстрока (как раньше: word in text)
+MATCH_MODE_WHOLE_WORD = 'whole_word' # Слово должно стоять отдельно (по краям не буквы и не цифры)
+MATCH_MODES = (MATCH_MODE_SUBSTRING, MATCH_MODE_WHOLE_WORD)
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+class _Automaton:
+    """Неизменяемый автомат Ахо-Корасик, построенный по списку слов."""
+
+    def __init__(self, words, normalize=None):
+        # Убираем пустые строки и дубликаты, сохраняя порядок. Поиск идет по нормализованным словам,
+        # а в результатах возвращаются слова в том виде, в каком они записаны в списке
+        prepare = normalize or str.lower
+        originals = {}
+        for w in words:
+            key = prepare(w) if w else ''
+            if key and key not in originals:
+                originals[key] = w.lower()
+        self.words = list(originals)
+        self.originals = list(originals.values())
+        self.goto = [{}]  # Переходы: состояние -> {символ: состояние}
+        self.fail = [0]   # Суффиксные ссылки
+        self.out = [()]   # Индексы слов, которые заканчиваются в состоянии
+
+        for index, word in enumerate(self.words):
+            state = 0
+            for ch in word:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = next_state
+            self.out[state] = self.out[state] + (index,)
+
+        # Обход в ширину: строим суффиксные ссылки и объединяем выходы
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                if self.out[self.fail[child]]:
+                    self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def scan(self, text, whole_words, first_only):
+        """Один проход по тексту. Возвращает индексы найденных слов в порядке появления."""
+        goto, fail, out, words = self.goto, self.fail, self.out, self.words
+        found = []
+        seen = set()
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for index in out[state]:
+                if index in seen:
+                    continue
+                if whole_words:
+                    start = pos - len(words[index]) + 1
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if pos + 1 < len(text) and _is_word_char(text[pos + 1]):
+                        continue
+                seen.add(index)
+                found.append(index)
+                if first_only:
+                    return found
+        return found
+
+
+class BadWordMatcher:
+    """
+    Предкомпилированный поиск запрещенных слов за один проход по сообщению.
+    Автомат строится один раз; reload() собирает новый и атомарно подменяет старый,
+    поэтому поиск из других потоков во время перезагрузки безопасен.
+    normalize - функция, которая приводит к одному виду и слова, и текст сообщения
+    (например, text_normalizer.normalize); по умолчанию - только нижний регистр.
+    """
+
+    def __init__(self, words, mode=MATCH_MODE_SUBSTRING, normalize=None):
+        self._lock = threading.Lock()
+        self._automaton = None
+        self._mode = MATCH_MODE_SUBSTRING
+        self._normalize = normalize or str.lower
+        self.reload(words, mode)
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @property
+    def words(self):
+        return list(self._automaton.originals)
+
+    def __len__(self):
+        return len(self._automaton.words)
+
+    def reload(self, words, mode=None):
+        """Перестраивает автомат по новому списку слов (горячая перезагрузка)."""
+        if mode is None:
+            mode = self._mode
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Неизвестный режим поиска слов: {mode!r}. Допустимо: {', '.join(MATCH_MODES)}")
+        automaton = _Automaton(words, self._normalize)
+        with self._lock:
+            # Одно присваивание ссылки - читатели видят либо старый, либо новый автомат целиком
+            self._automaton = automaton
+            self._mode = mode
+
+    def find_all(self, text):
+        """Возвращает список всех найденных запрещенных слов (без повторов)."""
+        automaton = self._automaton
+        indexes = automaton.scan(self._normalize(text), self._mode == MATCH_MODE_WHOLE_WORD, first_only=False)
+        return [automaton.originals[i] for i in indexes]
+
+    def find_first(self, text):
+        """Возвращает первое найденное запрещенное слово или None."""
+        automaton = self._automaton
+        indexes = automaton.scan(self._normalize(text), self._mode == MATCH_MODE_WHOLE_WORD, first_only=True)
+        return automaton.originals[indexes[0]] if indexes else None